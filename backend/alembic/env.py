@@ -5,6 +5,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from app.models.models import Base
 from app.models import Base
+from app.models import features  # noqa: F401  (таблица clothing_item_features для autogenerate)
 
 from alembic import context
 
@@ -0,0 +1,64 @@
+"""add clothing_item_features table
+
+Revision ID: d4e5f6g7h8i9
+Revises: c3d4e5f6g7h8
+Create Date: 2026-10-16 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'd4e5f6g7h8i9'
+down_revision = 'c3d4e5f6g7h8'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 1000
+
+
+def upgrade() -> None:
+    # Предвычисленные признаки вещи для генератора образов
+    op.create_table(
+        'clothing_item_features',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.SmallInteger(), nullable=False, server_default='1'),
+        sa.Column('color_idx', sa.SmallInteger(), nullable=False),
+        sa.Column('style_idx', sa.SmallInteger(), nullable=False),
+        sa.Column('season_mask', sa.SmallInteger(), nullable=False),
+        sa.Column('occasion_mask', sa.SmallInteger(), nullable=False),
+        sa.Column('category_slot', sa.SmallInteger(), nullable=False),
+        sa.Column('temp_min', sa.Integer(), nullable=True),
+        sa.Column('temp_max', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['item_id'], ['clothing_items.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('item_id')
+    )
+    op.create_index(op.f('ix_clothing_item_features_owner_id'), 'clothing_item_features', ['owner_id'], unique=False)
+
+    # Признаки существующих вещей — сразу, а не при первой генерации
+    # (генерация всё равно досчитает, если вещь появится между шагами)
+    from types import SimpleNamespace
+    from app.services.item_features import feature_row
+
+    bind = op.get_bind()
+    features_table = sa.table(
+        'clothing_item_features',
+        *(sa.column(name) for name in (
+            'item_id', 'owner_id', 'version', 'color_idx', 'style_idx', 'season_mask',
+            'occasion_mask', 'category_slot', 'temp_min', 'temp_max',
+        ))
+    )
+    items = bind.execute(sa.text(
+        'SELECT id, owner_id, category, color, style, season, temp_min, temp_max FROM clothing_items'
+    )).mappings()
+    while True:
+        rows = items.fetchmany(BACKFILL_BATCH)
+        if not rows:
+            break
+        op.bulk_insert(features_table, [feature_row(SimpleNamespace(**row)) for row in rows])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_clothing_item_features_owner_id'), table_name='clothing_item_features')
+    op.drop_table('clothing_item_features')
@@ -8,7 +8,8 @@
 # =============================================================================
 
 # Импорт компонентов FastAPI
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import FileResponse, StreamingResponse
 
 # Асинхронная сессия SQLAlchemy
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -18,11 +19,12 @@ from sqlalchemy import select
 
 # Модули для работы с файловой системой
 import os      # Работа с путями и директориями
+import json
 import uuid    # Генерация уникальных имён файлов
-import shutil  # Копирование файлов
+from typing import List
 
 # Импорт зависимости для получения сессии БД
-from app.db.database import get_db
+from app.db.database import get_db, settings
 
 # Импорт моделей базы данных
 from app.models import models
@@ -33,6 +35,17 @@ from app.schemas import schemas
 # Импорт сервисов авторизации
 from app.services import services
 
+# Версия гардероба (сбрасывает кэш генерации образов)
+from app.services.generation_cache import bump_wardrobe_version
+from app.services.blob_store import blob_store
+from app.services.image_variants import (
+    generate_variants, pick_size, remove_variants, variant_path
+)
+from app.services.executors import cpu_pool, ml_pool
+from app.services.inference_client import inference_client
+from app.services.upload_jobs import analyze_upload, upload_jobs
+from app.services.upload_storage import MB, read_upload
+
 # =============================================================================
 # СОЗДАНИЕ РОУТЕРА
 # =============================================================================
@@ -55,18 +68,21 @@ async def upload_item(
     """
     Предобработка фотографии одежды БЕЗ сохранения в БД.
     
-    Алгоритм:
+    Алгоритм (app/services/upload_pipeline.py):
     1. Создаём папку uploads если её нет
     2. Генерируем уникальное имя файла
-    3. Сохраняем временный файл
-    4. Распознаем вещь через Fashion-MNIST CNN
-    5. Удаляем фон через RemBG
-    6. Извлекаем доминирующий цвет
+    3. Декодируем изображение один раз (в памяти, без временного файла)
+       (локально или в сервисе инференса — см. INFERENCE_SERVICE_URL)
+    4. Удаляем фон через RemBG
+    5. Распознаем вещь через MultiHeadResNet50 и
+    6. Извлекаем доминирующий цвет и палитру (параллельно)
     7. Возвращаем данные для подтверждения (БЕЗ записи в БД)
     
     После этого фронтенд показывает модальное окно редактирования.
     При нажатии "Сохранить" вызывается POST /clothing/confirm.
     При отмене вызывается DELETE /clothing/cancel/{file_id}.
+    
+    Без долгого ожидания — POST /clothing/upload/async.
     """
     import sys
     import logging
@@ -78,10 +94,10 @@ async def upload_item(
     logger.info(f"📥 Начало загрузки файла: {file.filename}")
     print(f"📥 [UPLOAD] Начало загрузки файла: {file.filename}", file=sys.stderr)
     
-    # Lazy import ML modules to speed up server startup
-    from app.ml.remover import get_remover
-    from app.ml.fashion_classifier import get_fashion_classifier
-    from app.ml.color_extractor import extract_dominant_color, extract_color_palette, suggest_color_variants
+    if not inference_client.enabled:
+        # Пулы переполнены — отвечаем 429 сразу, до обработки
+        ml_pool.check_capacity()
+        cpu_pool.check_capacity()
     
     # Шаг 1: Создаём директорию для загрузок
     upload_dir = "uploads"
@@ -89,127 +105,19 @@ async def upload_item(
     
     # Шаг 2: Генерируем уникальное имя (UUID)
     file_id = str(uuid.uuid4())
-    temp_path = f"{upload_dir}/temp_{file_id}_{file.filename}"
-    
-    # Шаг 3: Сохраняем временный файл для обработки
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    logger.info(f"📁 Файл сохранён: {temp_path}")
-    print(f"📁 [UPLOAD] Файл сохранён: {temp_path}", file=sys.stderr)
-    
-    import asyncio
-    from functools import partial
-    loop = asyncio.get_running_loop()
     
     try:
-        # Шаг 4: Удаление фона через RemBG (делаем СНАЧАЛА!)
-        logger.info("🖼️ Удаление фона...")
-        print("🖼️ [UPLOAD] Удаление фона...", file=sys.stderr)
-        
-        final_filename = f"{file_id}.png" # Всегда PNG для прозрачности
-        final_path = f"{upload_dir}/{final_filename}"
-        
-        # Fallback: если RemBG не готов/не доступен, используем оригинальный файл
-        try:
-            # Получаем ремувер (может блокировать если еще инициализируется)
-            remover = await loop.run_in_executor(None, get_remover)
-            
-            # Запускаем удаление фона в пуле потоков
-            removed = await loop.run_in_executor(
-                None, 
-                remover.remove_background, 
-                temp_path, 
-                final_path
-            )
-            
-            if not removed or not os.path.exists(final_path):
-                raise RuntimeError('Background removal failed or output not created')
-            logger.info(f'BG removed: {final_path}')
-            print(f'[UPLOAD] BG removed: {final_path}', file=sys.stderr)
-        except Exception as bg_error:
-            logger.warning(f'RemBG fallback, using original file: {bg_error}')
-            print(f'[UPLOAD] RemBG fallback: {bg_error}', file=sys.stderr)
-            shutil.copyfile(temp_path, final_path)
-        
-        # Шаг 5: Распознавание через MultiHeadResNet50 (категория + стиль)
-        logger.info("🤖 Запуск классификатора...")
-        print("🤖 [UPLOAD] Запуск классификатора...", file=sys.stderr)
-        
-        try:
-            classifier = await loop.run_in_executor(None, get_fashion_classifier)
-            prediction = await loop.run_in_executor(None, classifier.predict, final_path)
-        except Exception as clf_error:
-            logger.warning(f'Classifier fallback: {clf_error}')
-            print(f'[UPLOAD] Classifier fallback: {clf_error}', file=sys.stderr)
-            prediction = {'id': 'tee', 'name': 'Футболка', 'confidence': 0.0,
-                          'style': 'casual', 'style_confidence': 0.0,
-                          'seasons': ['spring', 'summer', 'fall'],
-                          'temp_min': 15, 'temp_max': 35, 'waterproof_level': 0}
-        
-        category = prediction.get("id", "tee")
-        confidence = prediction.get("confidence", 0.0)
-        
-        logger.info(f"🎯 Классификация: {prediction.get('name')} ({category}) - {confidence*100:.1f}%")
-        print(f"🎯 [UPLOAD] Классификация: {prediction.get('name')} ({category}) - {confidence*100:.1f}%", file=sys.stderr)
-        
-        # Шаг 6: Извлечение цвета и палитры через K-means
-        logger.info("🎨 Извлечение цвета...")
-        print("🎨 [UPLOAD] Извлечение цвета...", file=sys.stderr)
-        
-        try:
-            color_info = await loop.run_in_executor(None, extract_dominant_color, final_path)
-        except Exception as color_error:
-            logger.warning(f'Color extraction fallback: {color_error}')
-            print(f'[UPLOAD] Color fallback: {color_error}', file=sys.stderr)
-            color_info = {'name_en': 'gray', 'hex': '#808080'}
-        
-        color_id = color_info.get("name_en", "gray")
-        color_hex = color_info.get("hex", "#808080")
-        
-        # Извлекаем палитру цветов
-        try:
-            palette = await loop.run_in_executor(
-                None, 
-                partial(extract_color_palette, k=4), 
-                final_path
-            )
-            palette_hexes = [c.get('hex', '#808080') for c in palette]
-            is_multicolor = len(set(c.get('name_en') for c in palette)) >= 3
-        except Exception:
-            palette_hexes = [color_hex]
-            is_multicolor = False
-        
-        logger.info(f"🎨 Цвет: {color_id} ({color_hex}), палитра: {palette_hexes}")
-        print(f"🎨 [UPLOAD] Цвет: {color_id} ({color_hex})", file=sys.stderr)
-        
-        # Шаг 7: Генерация 5 вариантов цвета для выбора пользователем
-        try:
-            color_rgb = tuple(color_info.get("rgb", [128, 128, 128]))
-            color_suggestions = await loop.run_in_executor(
-                None,
-                partial(suggest_color_variants, count=5),
-                color_rgb
-            )
-        except Exception:
-            color_suggestions = [{"id": color_id, "name_ru": color_id, "name_en": color_id, "label": "Определённый", "hex": color_hex, "rgb": [128, 128, 128]}]
+        # Шаги 3-6: один раз читаем файл (кусками, с проверкой типа и
+        # размера) и обрабатываем его в памяти
+        upload = await read_upload(file, settings.UPLOAD_MAX_MB * MB)
+        plan = current_user.subscription_plan or "free"
+        # Локально или в сервисе инференса (INFERENCE_SERVICE_URL)
+        analysis = await analyze_upload(upload.data, file_id, plan, digest=upload.sha256)
         
         result = {
             "file_id": file_id,
             "filename": file.filename,
-            "image_path": final_path,
-            "category": category,
-            "color": color_id,
-            "confidence": confidence,
-            "style": prediction.get("style", "casual"),
-            "style_confidence": prediction.get("style_confidence", 0.0),
-            "seasons": prediction.get("seasons", []),
-            "temp_min": prediction.get("temp_min"),
-            "temp_max": prediction.get("temp_max"),
-            "waterproof_level": prediction.get("waterproof_level", 0),
-            "is_multicolor": is_multicolor,
-            "color_palette": palette_hexes,
-            "color_suggestions": color_suggestions,
+            **analysis,
             "pending": True
         }
         
@@ -220,17 +128,154 @@ async def upload_item(
         # НЕ сохраняем в БД - это произойдёт при подтверждении
         return result
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки: {e}")
         print(f"❌ [UPLOAD] Ошибка: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# =============================================================================
+# ЭНДПОИНТЫ: ФОНОВАЯ ОБРАБОТКА ЗАГРУЗКИ
+# =============================================================================
+# Тот же результат, что у /upload, но без удержания соединения:
+# POST /upload/async сразу возвращает file_id, результат — в
+# GET /upload/{file_id}/status (с ?wait=N — долгий опрос).
+@router.post("/upload/async", status_code=202)
+async def upload_item_async(
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(services.get_current_user)
+):
+    """
+    Ставит фото в очередь на обработку и сразу возвращает file_id.
+    
+    Raises:
+        HTTPException 413/415: Файл слишком большой / не изображение
+        HTTPException 429: Очередь переполнена
+    """
+    upload = await read_upload(file, settings.UPLOAD_MAX_MB * MB)
+    
+    plan = current_user.subscription_plan or "free"
+    job = await upload_jobs.enqueue(current_user.id, file.filename, upload.data, plan,
+                                    digest=upload.sha256)
+    job["status_url"] = f"/api/clothing/upload/{job['file_id']}/status"
+    return job
+
+
+@router.get("/upload/queue")
+async def upload_queue_stats(
+    current_user: models.User = Depends(services.get_current_user)
+):
+    """Глубина очереди, воркеры и средние тайминги этапов (этот процесс)."""
+    return upload_jobs.stats()
+
+
+@router.get("/upload/{file_id}/status")
+async def upload_status(
+    file_id: str,
+    wait: float = Query(0, ge=0, description="Долгий опрос: ждать смены статуса/этапа, секунд"),
+    current_user: models.User = Depends(services.get_current_user)
+):
+    """
+    Статус фоновой загрузки: queued | processing | done | failed | cancelled.
+    
+    Для done в поле result — те же данные, что возвращает /upload.
+    """
+    return await upload_jobs.get_status(file_id, current_user.id, wait=wait)
+
+
+# =============================================================================
+# ЭНДПОИНТ: МАССОВЫЙ ИМПОРТ (несколько фото или zip)
+# =============================================================================
+# Ответ — NDJSON-поток (app/services/bulk_import.py). События:
+#   item  {"type": "item", "index": i, "result": {...как у /upload...}}
+#   error {"type": "error", "index": i, "filename", "status_code", "detail"}
+#   saved {"type": "saved", "items": [{"index": i, "item_id": id}, ...]}  (auto_confirm)
+# в конце — done {"type": "done", "count", "processed", "failed", "saved"}.
+@router.post("/bulk")
+async def bulk_import(
+    files: List[UploadFile] = File(...),
+    auto_confirm: bool = Query(False, description="Сразу сохранить все распознанные вещи"),
+    current_user: models.User = Depends(services.get_current_user)
+):
+    """
+    Импорт гардероба: много фото одним запросом (multipart или один zip).
+    
+    Результаты приходят по мере готовности, в порядке обработки (index —
+    позиция фото в запросе/архиве). Без auto_confirm вещи, как и после
+    /upload, ждут /confirm или /cancel.
+    
+    Raises:
+        HTTPException 400: Нет изображений / битый zip
+        HTTPException 413: Слишком много фото или слишком большой файл
+        HTTPException 415: Файл не изображение
+    """
+    from app.services.bulk_import import (
+        check_file_count, files_from_uploads, files_from_zip,
+        iter_bulk_results, remove_temp_files, save_bulk_items
+    )
+    
+    if len(files) == 1 and (files[0].filename or "").lower().endswith(".zip"):
+        # Число фото проверяется по оглавлению архива
+        items = await files_from_zip(files[0])
+    else:
+        # Число файлов — до чтения: лишние не сохраняются
+        check_file_count(len(files))
+        items = await files_from_uploads(files)
+    
+    plan = current_user.subscription_plan or "free"
+    user_id = current_user.id
+
+    async def event_stream():
+        try:
+            processed = []
+            failed = 0
+            async for event in iter_bulk_results(items, plan):
+                if event["type"] == "item":
+                    processed.append(event)
+                else:
+                    failed += 1
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        
+            saved = 0
+            if auto_confirm and processed:
+                try:
+                    item_ids = await save_bulk_items(user_id, [event["result"] for event in processed])
+                except Exception as e:
+                    print(f"❌ [BULK] Ошибка сохранения: {e}")
+                    yield json.dumps({"type": "error", "index": None, "status_code": 500,
+                                      "detail": "Не удалось сохранить вещи"}, ensure_ascii=False) + "\n"
+                else:
+                    saved = len(item_ids)
+                    yield json.dumps({
+                        "type": "saved",
+                        "items": [
+                            {"index": event["index"], "item_id": item_id}
+                            for event, item_id in zip(processed, item_ids)
+                        ]
+                    }) + "\n"
         
-    finally:
-        # Удаляем временный файл (но НЕ final_path - он нужен!)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+            yield json.dumps({
+                "type": "done",
+                "count": len(items),
+                "processed": len(processed),
+                "failed": failed,
+                "saved": saved
+            }) + "\n"
+        finally:
+            # Временные файлы запроса (фото / архив на диске)
+            await remove_temp_files(items)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        # Отключаем буферизацию в nginx, чтобы строки доходили сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # =============================================================================
@@ -252,12 +297,17 @@ async def confirm_item(
     if not os.path.exists(item_data.image_path):
         raise HTTPException(status_code=400, detail="Image file not found")
     
+    # Неподтверждённый uploads/{file_id}.png -> хранилище по SHA-256
+    # (одинаковые фото хранятся один раз)
+    image_path = await blob_store.put_pending(item_data.image_path)
+    await _generate_variants(image_path)
+    
     # Создаём запись в базе данных
     new_item = models.ClothingItem(
         owner_id=current_user.id,
         filename=item_data.name or item_data.filename,
         name=item_data.name,
-        image_path=item_data.image_path,
+        image_path=image_path,
         category=item_data.category,
         color=json.dumps(item_data.color) if isinstance(item_data.color, list) else item_data.color,
         season=json.dumps(item_data.season) if isinstance(item_data.season, list) else item_data.season,
@@ -274,6 +324,10 @@ async def confirm_item(
     await db.commit()
     await db.refresh(new_item)
     
+    # Признаки для генератора образов (нужен ID вещи)
+    from app.services.item_features import save_item_features
+    await save_item_features(db, new_item)
+    
     # Лог аудита
     log = models.AuditLog(
         user_id=current_user.id, 
@@ -282,12 +336,61 @@ async def confirm_item(
     )
     db.add(log)
     await db.commit()
+    await bump_wardrobe_version(current_user.id)
     
     print(f"✅ Вещь сохранена в БД: {new_item.filename} (ID: {new_item.id})")
     
     return new_item
 
 
+async def _generate_variants(image_path: str) -> None:
+    """WebP-варианты для сетки; ошибка не мешает сохранить вещь (создадутся по запросу)."""
+    if not blob_store.is_blob(image_path):
+        return
+    try:
+        await generate_variants(image_path)
+    except Exception as e:
+        print(f"⚠️ Не удалось создать варианты {image_path}: {e}")
+
+
+# =============================================================================
+# ЭНДПОИНТ: УМЕНЬШЕННАЯ КОПИЯ ФОТО ВЕЩИ
+# =============================================================================
+@router.get("/{item_id}/image")
+async def get_item_image(
+    item_id: int,
+    size: int = Query(256, ge=1, description="Большая сторона, px (округляется вверх до IMAGE_VARIANT_SIZES)"),
+    current_user: models.User = Depends(services.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    WebP-вариант фото вещи (image_variants.py).
+    
+    Для новых вещей варианты уже лежат рядом с оригиналом и доступны
+    статикой (поле image_variants); здесь — старые вещи и отсутствующие
+    варианты: создаются при первом запросе.
+    """
+    result = await db.execute(
+        select(models.ClothingItem.image_path).filter(
+            models.ClothingItem.id == item_id,
+            models.ClothingItem.owner_id == current_user.id
+        )
+    )
+    image_path = result.scalar_one_or_none()
+    if not image_path or not os.path.exists(image_path):
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    size = pick_size(size)
+    path = variant_path(image_path, size)
+    if not os.path.exists(path):
+        await generate_variants(image_path, [size])
+    
+    # Оригинал в хранилище неизменяем — вариант можно кэшировать навсегда
+    max_age = 31536000 if blob_store.is_blob(image_path) else 86400
+    return FileResponse(path, media_type="image/webp",
+                        headers={"Cache-Control": f"private, max-age={max_age}"})
+
+
 # =============================================================================
 # ЭНДПОИНТ: ОТМЕНА ЗАГРУЗКИ (удаление файла без сохранения)
 # =============================================================================
@@ -303,6 +406,12 @@ async def cancel_upload(
     upload_dir = "uploads"
     file_path = f"{upload_dir}/{file_id}.png"
     
+    # Фоновая загрузка ещё в очереди/обработке — воркер её пропустит
+    # или удалит результат сам
+    if await upload_jobs.cancel(file_id, current_user.id):
+        print(f"🗑️ Отменена фоновая загрузка: {file_id}")
+        return {"message": "Upload cancelled", "deleted": True}
+    
     if os.path.exists(file_path):
         os.remove(file_path)
         print(f"🗑️ Отменена загрузка: {file_id}")
@@ -426,8 +535,13 @@ async def update_item(
     if item_data.is_favorite is not None:
         item.is_favorite = item_data.is_favorite
     
+    # Пересчитываем признаки для генератора образов
+    from app.services.item_features import save_item_features
+    await save_item_features(db, item)
+    
     await db.commit()
     await db.refresh(item)
+    await bump_wardrobe_version(current_user.id)
     
     return item
 
@@ -446,8 +560,8 @@ async def delete_item(
     Алгоритм:
     1. Находим вещь по ID
     2. Проверяем что вещь принадлежит текущему пользователю
-    3. Удаляем файл изображения с диска
-    4. Удаляем запись из базы данных
+    3. Удаляем запись из базы данных
+    4. Удаляем файл изображения, если на него больше никто не ссылается
     
     Args:
         item_id: ID вещи для удаления
@@ -477,12 +591,19 @@ async def delete_item(
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    # Шаг 3: Удаляем файл изображения с диска
-    if os.path.exists(item.image_path):
-        os.remove(item.image_path)
+    image_path = item.image_path
     
-    # Шаг 4: Удаляем запись из базы данных
+    # Шаг 3: Удаляем запись из базы данных
     await db.delete(item)
     await db.commit()
+    await bump_wardrobe_version(current_user.id)
+    
+    # Шаг 4: Файл из хранилища — по счётчику ссылок (одно фото может быть
+    # у нескольких вещей); старые пути uploads/{uuid}.png — как раньше
+    if blob_store.is_blob(image_path):
+        await blob_store.release(db, image_path)
+    elif os.path.exists(image_path):
+        os.remove(image_path)
+        await remove_variants(image_path)
     
     return {"message": "Item deleted"}
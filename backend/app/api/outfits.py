@@ -11,7 +11,8 @@
 # =============================================================================
 
 # Импорт компонентов FastAPI
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
 # Асинхронная сессия SQLAlchemy
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -22,8 +23,12 @@ from sqlalchemy import select, delete
 # Типизация для списков
 from typing import List
 
-# Импорт зависимости для получения сессии БД
-from app.db.database import get_db
+# Потоковая выдача сгенерированных образов
+import json
+from itertools import islice
+
+# Импорт зависимости для получения сессии БД и настроек
+from app.db.database import async_session_maker, get_db, settings
 
 # Импорт моделей базы данных
 from app.models import models
@@ -561,28 +566,71 @@ async def delete_outfit(
 # =============================================================================
 # ЭНДПОИНТ: AI ГЕНЕРАЦИЯ ОБРАЗОВ (ГЕНЕРАТОР)
 # =============================================================================
-import random
-import itertools
 from app.services.plan_limits import (
     get_max_outfits, check_generation_allowed, increment_generation_count, get_plan_limits
 )
+from app.services.generation_cache import outfit_pool_cache, get_wardrobe_version
+from app.services.executors import cpu_pool
 
-@router.post("/generate")
-async def generate_outfits(
-    current_user: models.User = Depends(services.get_current_user),
-    db: AsyncSession = Depends(get_db),
-    occasion: str = "casual",
-    weather_category: str = "warm",
-    count: int = 5
-):
+
+async def _build_outfit_pool(
+    db: AsyncSession,
+    user_id: int,
+    occasion: str,
+    weather_category: str,
+    count: int
+) -> List[dict]:
     """
-    Генерирует умные образы из гардероба пользователя.
-    Лимиты зависят от тарифного плана (free/basic/premium).
+    Ранжированный пул кандидатов для шага разнообразия.
+
+    Не зависит от случайности, поэтому кэшируется
+    (см. app/services/generation_cache.py). Сам перебор выполняется
+    в пуле процессов (cpu_pool), чтобы не блокировать event loop;
+    при переполненной очереди пул отвечает 429.
     """
     # Lazy import ML modules
-    from app.ml.outfit_scorer import score_outfit, filter_items_by_weather, parse_json_field
+    from app.ml.outfit_engine import build_outfit_pool, OutfitEngineError
+    from app.services.item_features import load_wardrobe_features
+    from app.services.image_variants import image_variants_for
     
-    # ─── Проверка лимитов тарифного плана ─────────────────────────────────
+    # Получаем все вещи пользователя вместе с предвычисленными признаками
+    wardrobe = await load_wardrobe_features(db, user_id)
+    
+    items = [
+        {
+            "id": item.id,
+            "filename": item.filename,
+            "image_path": item.image_path,
+            "image_variants": image_variants_for(item.id, item.image_path),
+            "category": item.category,
+            "color": item.color,
+            "style": item.style,
+            "season": item.season
+        }
+        for item, _ in wardrobe
+    ]
+    features = [item_features for _, item_features in wardrobe]
+    
+    try:
+        return await cpu_pool.run(
+            build_outfit_pool,
+            items, features, occasion, weather_category, count,
+            search_mode=settings.OUTFIT_SEARCH_MODE
+        )
+    except OutfitEngineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _check_generation_limits(current_user: models.User, count: int) -> tuple:
+    """
+    Проверяет лимиты тарифного плана.
+
+    Returns:
+        (plan, count): план пользователя и count, ограниченный планом
+
+    Raises:
+        HTTPException 429: Дневной лимит генераций исчерпан
+    """
     plan = current_user.subscription_plan or "free"
     max_count = get_max_outfits(plan)
     count = min(count, max_count)
@@ -601,285 +649,84 @@ async def generate_outfits(
                 "used_today": gen_check["used_today"],
             }
         )
-    
-    # Получаем все вещи пользователя
-    result = await db.execute(
-        select(models.ClothingItem).filter(
-            models.ClothingItem.owner_id == current_user.id
-        )
-    )
-    all_items = result.scalars().all()
-    
-    if len(all_items) < 2:
-        raise HTTPException(
-            status_code=400, 
-            detail="Недостаточно вещей в гардеробе. Загрузите минимум 2 вещи."
+    return plan, count
+
+
+async def _get_outfit_pool(
+    db: AsyncSession,
+    user_id: int,
+    occasion: str,
+    weather_category: str,
+    count: int
+) -> List[dict]:
+    """Пул кандидатов: из кэша, если гардероб не менялся."""
+    wardrobe_version = await get_wardrobe_version(user_id)
+    cache_key = (user_id, wardrobe_version, occasion, weather_category, count)
+    unique_outfits = outfit_pool_cache.get(cache_key)
+    if unique_outfits is None:
+        unique_outfits = await _build_outfit_pool(
+            db, user_id, occasion, weather_category, count
         )
-    
-    # Конвертируем в словари для scorer
-    items_dict = [
-        {
-            "id": item.id,
-            "filename": item.filename,
-            "image_path": item.image_path,
-            "category": item.category,
-            "color": item.color,
-            "style": item.style,
-            "season": item.season
-        }
-        for item in all_items
-    ]
-    
-    # Фильтруем вещи по погоде/сезону (если нет подходящих — возвращает все)
-    filtered_items = filter_items_by_weather(items_dict, weather_category)
-
-    if weather_category in ["warm", "hot"]:
-        restricted_categories = {"pullover", "coat"}
-        warm_items = [i for i in filtered_items if i["category"] not in restricted_categories]
-        if warm_items:
-            filtered_items = warm_items
-        else:
-            filtered_items = [i for i in items_dict if i["category"] not in restricted_categories]
-            if not filtered_items:
-                raise HTTPException(
-                    status_code=400,
-                    detail="not enoght items"
-                )
-
+        outfit_pool_cache.set(cache_key, unique_outfits)
+    return unique_outfits
 
 
-    # Group items by type
-    top_categories = {"t-shirt", "shirt", "pullover"}
-    outer_categories = {"coat"}
-    bottom_categories = {"trouser"}
-    full_categories = {"dress"}
-    shoe_categories = {"sneaker", "sandal", "ankle-boot"}
-    accessory_categories = {"bag"}
-
-    tops = [i for i in filtered_items if i["category"] in top_categories]
-    outerwear = [i for i in filtered_items if i["category"] in outer_categories]
-    bottoms = [i for i in filtered_items if i["category"] in bottom_categories]
-    fulls = [i for i in filtered_items if i["category"] in full_categories]
-    shoes = [i for i in filtered_items if i["category"] in shoe_categories]
-    accessories = [i for i in filtered_items if i["category"] in accessory_categories]
-
-    # Fallbacks if wardrobe is sparse
-    non_layer_categories = shoe_categories | accessory_categories | full_categories
-    if not tops:
-        fallback_tops = [i for i in filtered_items if i["category"] not in (non_layer_categories | bottom_categories | outer_categories)]
-        tops = fallback_tops or [i for i in filtered_items if i["category"] not in (non_layer_categories | outer_categories)]
-    if not bottoms:
-        fallback_bottoms = [i for i in filtered_items if i["category"] not in (non_layer_categories | top_categories | outer_categories)]
-        bottoms = fallback_bottoms or [i for i in filtered_items if i["category"] not in non_layer_categories]
-
-    def is_winter_item(item):
-        seasons = [s.lower() for s in parse_json_field(item.get("season", []))]
-        return (
-            "winter" in seasons
-            or "зима" in seasons
-            or "all" in seasons
-            or "всесезонный" in seasons
-        )
+def _generated_outfit_response(outfit: dict, index: int, occasion: str, weather_category: str) -> dict:
+    """Образ из пула -> элемент ответа /generate (не сохранён в БД)."""
+    return {
+        "id": None,  # Не сохранён
+        "name": f"AI образ #{index + 1}",
+        "occasion": occasion,
+        "weather": weather_category,
+        "items": [
+            {
+                "id": item["id"],
+                "filename": item["filename"],
+                "image_path": item["image_path"],
+                "image_variants": item.get("image_variants"),
+                "category": item["category"],
+                "color": item["color"]
+            }
+            for item in outfit["items"]
+        ],
+        "score": outfit["scores"]["total"],
+        "score_breakdown": outfit["scores"]["breakdown"],
+        "color_score": outfit["scores"]["color"],
+        "style_score": outfit["scores"]["style"],
+        "weather_score": outfit["scores"]["weather"]
+    }
 
 
-    def is_transitional_item(item):
-        seasons = [s.lower() for s in parse_json_field(item.get("season", []))]
-        if not seasons:
-            return False
-        for value in seasons:
-            if (
-                "spring" in value
-                or "autumn" in value
-                or "fall" in value
-                or "весна" in value
-                or "осень" in value
-                or "all" in value
-                or "демисезон" in value
-            ):
-                return True
-        return False
-
-    winter_coats = [c for c in outerwear if is_winter_item(c)]
-    coat_candidates = winter_coats or outerwear
-
-    transitional_coats = [c for c in outerwear if is_transitional_item(c)]
-    coat_candidates_cool = transitional_coats or outerwear
-
-    def add_with_shoes_and_accessories(base_items, combinations):
-        if shoes:
-            for shoe in shoes:
-                outfit = base_items + [shoe]
-                if accessories:
-                    for acc in accessories:
-                        combinations.append(outfit + [acc])
-                else:
-                    combinations.append(outfit)
-        else:
-            combinations.append(base_items)
-            if accessories:
-                for acc in accessories:
-                    combinations.append(base_items + [acc])
-
-    # Build combinations
-    all_combinations = []
-    weather_is_cold = weather_category == "cold"
-
-    # Cold weather: coat required when available, plus top + bottom.
-    if weather_is_cold:
-        coat_required = bool(coat_candidates)
-        coat_variants = coat_candidates if coat_required else [None]
-
-        for bottom in bottoms:
-            for top in tops:
-                if top["id"] == bottom["id"]:
-                    continue
-                for coat in coat_variants:
-                    base_outfit = []
-                    if coat:
-                        base_outfit.append(coat)
-                    base_outfit.extend([top, bottom])
-                    add_with_shoes_and_accessories(base_outfit, all_combinations)
-
-        shirts = [i for i in tops if i["category"] == "shirt"]
-        pullovers = [i for i in tops if i["category"] == "pullover"]
-        if shirts and pullovers:
-            for bottom in bottoms:
-                for shirt in shirts:
-                    for pullover in pullovers:
-                        if len({shirt["id"], pullover["id"], bottom["id"]}) < 3:
-                            continue
-                        for coat in coat_variants:
-                            base_outfit = []
-                            if coat:
-                                base_outfit.append(coat)
-                            base_outfit.extend([shirt, pullover, bottom])
-                            add_with_shoes_and_accessories(base_outfit, all_combinations)
-
-    # Non-cold weather: top + bottom, coat optional.
-    if not weather_is_cold:
-        coat_variants = coat_candidates_cool if weather_category == "cool" else outerwear
-        for top in tops:
-            for bottom in bottoms:
-                if top["id"] == bottom["id"]:
-                    continue
-                base_outfit = [top, bottom]
-                add_with_shoes_and_accessories(base_outfit, all_combinations)
-                for coat in coat_variants:
-                    base_outfit = [coat, top, bottom]
-                    add_with_shoes_and_accessories(base_outfit, all_combinations)
-
-    # Dresses: only with shirt/coat (or alone). Skip in cold unless nothing else.
-    allow_dress_outfits = not weather_is_cold
-    if weather_is_cold and not all_combinations:
-        allow_dress_outfits = True
-
-    if allow_dress_outfits:
-        shirts = [i for i in tops if i["category"] == "shirt"]
-        for dress in fulls:
-            add_with_shoes_and_accessories([dress], all_combinations)
-            if weather_category not in ["warm", "hot"]:
-                for shirt in shirts:
-                    add_with_shoes_and_accessories([dress, shirt], all_combinations)
-            coat_variants = coat_candidates_cool if weather_category == "cool" else outerwear
-            for coat in coat_variants:
-                add_with_shoes_and_accessories([dress, coat], all_combinations)
-            if weather_category not in ["warm", "hot"]:
-                for shirt in shirts:
-                    for coat in coat_variants:
-                        add_with_shoes_and_accessories([dress, shirt, coat], all_combinations)
-    if not all_combinations:
-        all_combinations.append(items_dict[:min(3, len(items_dict))])
-    
-    # Оцениваем каждую комбинацию
-    scored_outfits = []
-    for combo in all_combinations:
-        scores = score_outfit(combo, occasion, weather_category)
-        scored_outfits.append({
-            "items": combo,
-            "scores": scores
-        })
-    
-    # Сортируем по score (лучшие первые)
-    scored_outfits.sort(key=lambda x: x["scores"]["total"], reverse=True)
-    
-    # Фильтруем только хорошие образы (score > 0.5)
-    # Filter by score
-    good_outfits = [o for o in scored_outfits if o["scores"]["total"] > 0.5]
-
-    # If there are no good outfits, fall back to the best ones
-    if not good_outfits:
-        good_outfits = scored_outfits[:max(count, 1)]
-
-    # Pick a wider pool for diversity when needed
-    def unique_item_count(outfits):
-        return len({item["id"] for outfit in outfits for item in outfit["items"]})
-
-    candidate_outfits = good_outfits
-    if unique_item_count(candidate_outfits) < unique_item_count(scored_outfits):
-        candidate_outfits = scored_outfits
-    elif len(candidate_outfits) < count * 2:
-        candidate_outfits = scored_outfits
-
-    # Remove duplicates (same set of item IDs)
-    seen_combos = set()
-    unique_outfits = []
-    for outfit in candidate_outfits:
-        combo_ids = tuple(sorted(item["id"] for item in outfit["items"]))
-        if combo_ids not in seen_combos:
-            seen_combos.add(combo_ids)
-            unique_outfits.append(outfit)
-
-    def select_diverse(outfits, target_count):
-        selected = []
-        usage = {}
-        remaining = outfits[:]
-        random.shuffle(remaining)
-
-        while remaining and len(selected) < target_count:
-            best = None
-            best_score = None
-            for outfit in remaining:
-                item_ids = [item["id"] for item in outfit["items"]]
-                reuse = sum(usage.get(item_id, 0) for item_id in item_ids)
-                novelty = sum(1 for item_id in item_ids if usage.get(item_id, 0) == 0)
-                adjusted = outfit["scores"]["total"] + (novelty * 0.02) - (reuse * 0.03)
-                if best_score is None or adjusted > best_score:
-                    best = outfit
-                    best_score = adjusted
-            selected.append(best)
-            for item_id in [item["id"] for item in best["items"]]:
-                usage[item_id] = usage.get(item_id, 0) + 1
-            remaining.remove(best)
-
-        return selected
+@router.post("/generate")
+async def generate_outfits(
+    current_user: models.User = Depends(services.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    count: int = 5
+):
+    """
+    Генерирует умные образы из гардероба пользователя.
+    Лимиты зависят от тарифного плана (free/basic/premium).
+    """
+    # Lazy import ML modules
+    from app.ml.outfit_engine import select_diverse_outfits
+    
+    # ─── Проверка лимитов тарифного плана ─────────────────────────────────
+    plan, count = await _check_generation_limits(current_user, count)
+    
+    unique_outfits = await _get_outfit_pool(
+        db, current_user.id, occasion, weather_category, count
+    )
 
     # Select diverse outfits (count already capped by plan)
-    final_outfits = select_diverse(unique_outfits, count)
+    final_outfits = select_diverse_outfits(unique_outfits, count)
     
     # Формируем ответ
-    generated_outfits = []
-    for i, outfit in enumerate(final_outfits):
-        generated_outfits.append({
-            "id": None,  # Не сохранён
-            "name": f"AI образ #{i + 1}",
-            "occasion": occasion,
-            "weather": weather_category,
-            "items": [
-                {
-                    "id": item["id"],
-                    "filename": item["filename"],
-                    "image_path": item["image_path"],
-                    "category": item["category"],
-                    "color": item["color"]
-                }
-                for item in outfit["items"]
-            ],
-            "score": outfit["scores"]["total"],
-            "score_breakdown": outfit["scores"]["breakdown"],
-            "color_score": outfit["scores"]["color"],
-            "style_score": outfit["scores"]["style"],
-            "weather_score": outfit["scores"]["weather"]
-        })
+    generated_outfits = [
+        _generated_outfit_response(outfit, i, occasion, weather_category)
+        for i, outfit in enumerate(final_outfits)
+    ]
     
     # Инкрементируем счётчик генераций для free-пользователей
     if plan == "free":
@@ -888,6 +735,91 @@ async def generate_outfits(
     return generated_outfits
 
 
+# =============================================================================
+# ЭНДПОИНТ: ПОТОКОВАЯ ГЕНЕРАЦИЯ ОБРАЗОВ (NDJSON / SSE)
+# =============================================================================
+# Те же образы и поля, что у /generate, но каждый образ отправляется,
+# как только выбран шагом разнообразия. Формат:
+#   ndjson: по одному JSON-объекту на строку
+#   sse:    "event: <type>\ndata: <json>\n\n"
+# События: сразу started {"type": "started", "count": n} (пул образов
+# строится уже после него), затем outfit {"type": "outfit", "index": i,
+# "outfit": {...}}, в конце — done {"type": "done", "count": n}.
+# Ошибка построения пула — error {"type": "error", "status_code", "detail"}.
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _stream_event(event: dict, stream_format: str) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+@router.post("/generate/stream")
+async def generate_outfits_stream(
+    current_user: models.User = Depends(services.get_current_user),
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    count: int = 5,
+    stream_format: str = Query("ndjson", alias="format")
+):
+    """
+    Потоковая версия /generate: образы отдаются по одному (NDJSON или SSE).
+
+    Формат и лимиты проверяются до начала потока и возвращаются обычными
+    HTTP-ошибками; пул образов строится уже внутри потока (после события
+    started), а генерация засчитывается после первого отправленного образа.
+    """
+    # Lazy import ML modules
+    from app.ml.outfit_engine import iter_diverse_outfits
+    
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown stream format: {stream_format}. Use: {', '.join(STREAM_MEDIA_TYPES)}"
+        )
+    
+    plan, count = await _check_generation_limits(current_user, count)
+    user_id = current_user.id
+
+    async def event_stream():
+        yield _stream_event({"type": "started", "count": count}, stream_format)
+
+        # Своя сессия: зависимость get_db закрывается до начала потока ответа
+        try:
+            async with async_session_maker() as stream_db:
+                unique_outfits = await _get_outfit_pool(
+                    stream_db, user_id, occasion, weather_category, count
+                )
+        except HTTPException as e:
+            yield _stream_event({"type": "error", "status_code": e.status_code, "detail": e.detail}, stream_format)
+            return
+
+        sent = 0
+        for outfit in islice(iter_diverse_outfits(unique_outfits), max(count, 0)):
+            yield _stream_event({
+                "type": "outfit",
+                "index": sent,
+                "outfit": _generated_outfit_response(outfit, sent, occasion, weather_category)
+            }, stream_format)
+            sent += 1
+            # Генерация засчитывается, только когда клиент получил образ
+            if sent == 1 and plan == "free":
+                await increment_generation_count(user_id)
+        yield _stream_event({"type": "done", "count": sent}, stream_format)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        # Отключаем буферизацию в nginx, чтобы образы доходили сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # =============================================================================
 # ЭНДПОИНТ: ОБРАТНАЯ СВЯЗЬ (ЛАЙК/ДИЗЛАЙК/ИЗБРАННОЕ/СОХРАНЕНИЕ)
 # =============================================================================
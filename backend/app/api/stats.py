@@ -11,12 +11,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case, distinct
 
-from ..db.database import get_db
+from ..db.database import get_db, settings
 from ..models import models
 from ..services import services
 from ..services.plan_limits import get_plan_info, get_plan_limits
+from ..services.wardrobe_stats import aggregate_wardrobe_items
+from ..services.executors import cpu_pool
 
-import json
 from datetime import datetime, timezone, timedelta
 
 router = APIRouter(prefix="/stats", tags=["stats"])
@@ -62,12 +63,18 @@ async def get_wardrobe_overview(
         )
 
     # ─── Общие числа ─────────────────────────────────────────────────────
+    # Берём только нужные колонки — без загрузки ORM-объектов целиком
     items_result = await db.execute(
-        select(models.ClothingItem).filter(
+        select(
+            models.ClothingItem.category,
+            models.ClothingItem.color,
+            models.ClothingItem.style,
+            models.ClothingItem.price
+        ).filter(
             models.ClothingItem.owner_id == current_user.id
         )
     )
-    all_items = items_result.scalars().all()
+    item_rows = [tuple(row) for row in items_result]
 
     outfits_count = await db.execute(
         select(func.count(models.Outfit.id)).filter(
@@ -76,34 +83,12 @@ async def get_wardrobe_overview(
     )
     total_outfits = outfits_count.scalar() or 0
 
-    # ─── Распределение по категориям ─────────────────────────────────────
-    category_counts = {}
-    color_counts = {}
-    style_counts = {}
-    total_price = 0.0
-    items_with_price = 0
-
-    for item in all_items:
-        # Категории
-        cat = item.category or "unknown"
-        category_counts[cat] = category_counts.get(cat, 0) + 1
-
-        # Цвета
-        color = item.color or "unknown"
-        color_counts[color] = color_counts.get(color, 0) + 1
-
-        # Стили (JSON массив)
-        try:
-            styles = json.loads(item.style) if item.style else []
-        except (json.JSONDecodeError, TypeError):
-            styles = [item.style] if item.style else []
-        for s in styles:
-            style_counts[s] = style_counts.get(s, 0) + 1
-
-        # Стоимость
-        if item.price is not None:
-            total_price += item.price
-            items_with_price += 1
+    # ─── Распределение по категориям/цветам/стилям ───────────────────────
+    # Большие гардеробы считаем в пуле процессов, маленькие — на месте
+    if len(item_rows) >= settings.STATS_OFFLOAD_MIN_ITEMS:
+        aggregated = await cpu_pool.run(aggregate_wardrobe_items, item_rows)
+    else:
+        aggregated = aggregate_wardrobe_items(item_rows)
 
     # ─── Топ-5 самых используемых вещей ──────────────────────────────────
     top_items_result = await db.execute(
@@ -170,13 +155,13 @@ async def get_wardrobe_overview(
     ]
 
     return {
-        "total_items": len(all_items),
+        "total_items": len(item_rows),
         "total_outfits": total_outfits,
-        "total_price": round(total_price, 2),
-        "items_with_price": items_with_price,
-        "categories": category_counts,
-        "colors": color_counts,
-        "styles": style_counts,
+        "total_price": round(aggregated["total_price"], 2),
+        "items_with_price": aggregated["items_with_price"],
+        "categories": aggregated["categories"],
+        "colors": aggregated["colors"],
+        "styles": aggregated["styles"],
         "top_items": top_items,
         "forgotten_items": forgotten_items,
     }
@@ -328,8 +328,10 @@ async def delete_account(
 # =============================================================================
 from fastapi import UploadFile, File
 import uuid
-import shutil
 import os
+import aiofiles.os
+from app.db.database import settings
+from app.services.upload_storage import MB, save_upload
 
 @router.post("/me/avatar", response_model=schemas.UserResponse)
 async def upload_avatar(
@@ -341,29 +343,29 @@ async def upload_avatar(
     Загрузка аватарки пользователя.
     
     Сохраняет изображение в папку uploads/avatars/ и обновляет путь в БД.
+    Расширение файла — по его реальному типу, а не по имени.
+    
+    Raises:
+        HTTPException 413: Файл больше AVATAR_MAX_MB
+        HTTPException 415: Файл не изображение
     """
-    # Создаём папку для аватарок
     avatar_dir = "uploads/avatars"
-    os.makedirs(avatar_dir, exist_ok=True)
     
-    # Генерируем уникальное имя файла
-    file_ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    avatar_filename = f"{current_user.id}_{uuid.uuid4().hex[:8]}.{file_ext}"
-    avatar_path = f"{avatar_dir}/{avatar_filename}"
+    # Сохраняем файл (кусками, без блокировки event loop)
+    stored = await save_upload(
+        file, avatar_dir, f"{current_user.id}_{uuid.uuid4().hex[:8]}",
+        settings.AVATAR_MAX_MB * MB
+    )
     
-    # Удаляем старую аватарку если есть
+    # Удаляем старую аватарку — только после успешного сохранения новой
     if current_user.avatar_path and os.path.exists(current_user.avatar_path):
         try:
-            os.remove(current_user.avatar_path)
-        except:
+            await aiofiles.os.remove(current_user.avatar_path)
+        except OSError:
             pass
     
-    # Сохраняем файл
-    with open(avatar_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
     # Обновляем путь в БД
-    current_user.avatar_path = avatar_path
+    current_user.avatar_path = stored.path
     await db.commit()
     await db.refresh(current_user)
     
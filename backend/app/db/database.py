@@ -16,7 +16,7 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.ext.declarative import declarative_base
 
 # Типизация для генераторов (используется в get_db)
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List
 
 # Pydantic Settings для загрузки переменных окружения из .env
 from pydantic_settings import BaseSettings
@@ -56,6 +56,96 @@ class Settings(BaseSettings):
 
     # MongoDB connection URL
     MONGO_URL: str = "mongodb://localhost:27017"
+
+    # Поиск лучших образов: auto | exhaustive | branch_and_bound
+    OUTFIT_SEARCH_MODE: str = "auto"
+
+    # Кэш пулов генерации образов (в памяти процесса)
+    GENERATION_CACHE_SIZE: int = 512   # Максимум записей (LRU)
+    GENERATION_CACHE_TTL: int = 600    # Время жизни записи, секунд
+
+    # Пулы для тяжёлых задач (app/services/executors.py)
+    CPU_POOL_WORKERS: int = 2          # Процессы для CPU-задач (0 — потоки вместо процессов)
+    CPU_POOL_MAX_QUEUE: int = 32       # Сколько задач может ждать, дальше — 429
+    ML_POOL_WORKERS: int = 2           # Потоки для инференса моделей
+    ML_POOL_MAX_QUEUE: int = 16
+    POOL_RETRY_AFTER: int = 5          # Значение заголовка Retry-After, секунд
+    STATS_OFFLOAD_MIN_ITEMS: int = 500 # Статистику меньших гардеробов считаем на месте
+
+    # Микро-батчинг классификатора (app/services/inference_batcher.py)
+    CLASSIFIER_BATCH_SIZE: int = 8         # Максимум изображений в одном прогоне
+    CLASSIFIER_BATCH_WAIT_MS: int = 10     # Сколько ждать добора батча после первого запроса
+    CLASSIFIER_BATCH_MAX_PENDING: int = 64 # Очередь длиннее — 429
+
+    # Бэкенд классификатора: torch | onnx (app/ml/classifier_backend.py)
+    CLASSIFIER_BACKEND: str = "torch"
+    CLASSIFIER_ONNX_PATH: str = ""         # Пусто — app/ml/weights/fashion_resnet50.onnx
+    # torch: веса через mmap — воркеры на одном хосте делят страницы весов
+    CLASSIFIER_MMAP_WEIGHTS: bool = True
+
+    # Отдельный сервис инференса (backend/inference_service.py).
+    # Пусто — модели грузятся в самом веб-процессе
+    INFERENCE_SERVICE_URL: str = ""        # Например http://127.0.0.1:8001
+    INFERENCE_SERVICE_UDS: str = ""        # Unix socket вместо TCP
+    INFERENCE_SERVICE_TIMEOUT: float = 60.0
+    INFERENCE_SERVICE_MAX_CONNECTIONS: int = 32
+
+    # Удаление фона с уменьшением (app/ml/remover.py): маска считается по копии
+    # с большей стороной REMBG_WORK_EDGE и растягивается на итоговое фото,
+    # большая сторона которого не больше REMBG_MAX_OUTPUT_EDGE.
+    # По умолчанию выключено (rembg на полном кадре, как раньше): края маски
+    # после растяжения мягче. Включать после сравнения качества на своих
+    # фото — benchmark_rembg.py
+    REMBG_DOWNSCALE: bool = False
+    REMBG_WORK_EDGE: int = 1024
+    REMBG_MAX_OUTPUT_EDGE: int = 2048
+
+    # Пул сессий rembg (app/ml/remover.py): до REMBG_POOL_SIZE сессий на модель,
+    # потоки onnxruntime на сессию (0 — по умолчанию onnxruntime)
+    REMBG_POOL_SIZE: int = 2
+    REMBG_INTRA_OP_THREADS: int = 2
+    REMBG_INTER_OP_THREADS: int = 1
+    # Модель по плану — PLAN_LIMITS["rembg_model"]; под нагрузкой (задач в
+    # ml_pool >= REMBG_FALLBACK_QUEUE_DEPTH) — лёгкая модель. 0 — без отката
+    REMBG_LIGHT_MODEL: str = "u2netp"
+    REMBG_FALLBACK_QUEUE_DEPTH: int = 8
+
+    # Кэш удаления фона по SHA-256 загрузки (app/services/bg_cache.py)
+    BG_CACHE_ENABLED: bool = True
+    BG_CACHE_DIR: str = "uploads/.bg_cache"
+    BG_CACHE_MAX_MB: int = 512             # Дальше — вытеснение LRU
+
+    # Фоновая обработка загрузок (app/services/upload_jobs.py)
+    UPLOAD_JOB_WORKERS: int = 2            # Одновременно обрабатываемых загрузок на процесс
+    UPLOAD_JOB_MAX_QUEUE: int = 32         # Очередь длиннее — 429
+    UPLOAD_JOB_MAX_WAIT: int = 30          # Максимум ?wait= для долгого опроса статуса, секунд
+    UPLOAD_JOB_STALE_SECONDS: int = 300    # Без обновлений дольше — задача считается прерванной
+    UPLOAD_JOB_TTL: int = 86400            # Записи о задачах в MongoDB живут сутки
+
+    # Приём загрузок (app/services/upload_storage.py)
+    UPLOAD_MAX_MB: int = 20                # Фото вещи
+    AVATAR_MAX_MB: int = 5                 # Аватарка
+
+    # Хранилище фото вещей по SHA-256 (app/services/blob_store.py).
+    # Должно лежать внутри uploads/ (раздаётся как /uploads, перенос — rename)
+    BLOB_STORE_DIR: str = "uploads/blobs"
+    BLOB_GC_INTERVAL: int = 3600           # Сборка мусора раз в N секунд (0 — выключена)
+    BLOB_GC_GRACE_SECONDS: int = 3600      # Файлы моложе не удаляются
+    PENDING_UPLOAD_TTL: int = 86400        # Неподтверждённые загрузки живут сутки
+
+    # Уменьшенные копии фото вещей (app/services/image_variants.py):
+    # WebP с альфа-каналом, большая сторона в пикселях
+    IMAGE_VARIANT_SIZES: List[int] = [128, 256, 512]
+    IMAGE_VARIANT_QUALITY: int = 80
+
+    # Массовый импорт (POST /clothing/bulk, app/services/bulk_import.py)
+    BULK_IMPORT_MAX_FILES: int = 100       # Фото за один запрос
+    BULK_IMPORT_MAX_FILE_MB: int = 20      # Размер одного фото (в т.ч. внутри zip)
+    BULK_IMPORT_CONCURRENCY: int = 4       # Фото в обработке одновременно (не больше ML_POOL_MAX_QUEUE)
+
+    # Анализ цвета при загрузке: kmeans | minibatch | median_cut
+    # (точность бэкендов относительно прежнего способа — benchmark_colors.py)
+    COLOR_ANALYSIS_BACKEND: str = "kmeans"
     
     class Config:
         # Указываем файл с переменными окружения
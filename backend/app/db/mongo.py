@@ -10,6 +10,16 @@ client = AsyncIOMotorClient(MONGO_URL)
 # Выбираем базу данных
 db = client.wardrobe_logs
 
+# База приложения (счётчики генераций, кэш образов, задачи загрузки) —
+# отдельно от логов
+app_db = client.wardrobe_ai
+
+
+def get_app_mongo_db():
+    """База MongoDB приложения (wardrobe_ai) для сервисов."""
+    return app_db
+
+
 async def get_mongo_db():
     """
     Dependency for getting MongoDB database instance.
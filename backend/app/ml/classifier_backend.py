@@ -0,0 +1,61 @@
+# =============================================================================
+# ВЫБОР БЭКЕНДА КЛАССИФИКАТОРА (classifier_backend.py)
+# =============================================================================
+# settings.CLASSIFIER_BACKEND:
+#   torch — FashionClassifier (PyTorch, fashion_classifier.py)
+#   onnx  — OnnxFashionClassifier (onnxruntime, onnx_classifier.py);
+#           torch в процесс API не импортируется
+#
+# Если ONNX-модели нет или onnxruntime не установлен — откат на torch.
+# Модель для onnx готовится командой: python -m app.ml.onnx_export export
+# =============================================================================
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_BACKENDS = ("torch", "onnx")
+
+DEFAULT_ONNX_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "weights", "fashion_resnet50.onnx"
+)
+
+_classifier_instance = None
+_classifier_lock = threading.Lock()
+
+
+def _create_classifier():
+    from app.db.database import settings
+
+    backend = settings.CLASSIFIER_BACKEND
+    if backend not in CLASSIFIER_BACKENDS:
+        logger.warning(f"⚠️ Unknown CLASSIFIER_BACKEND={backend!r}, using torch")
+        backend = "torch"
+
+    if backend == "onnx":
+        model_path = settings.CLASSIFIER_ONNX_PATH or DEFAULT_ONNX_PATH
+        try:
+            from app.ml.onnx_classifier import OnnxFashionClassifier
+            return OnnxFashionClassifier(model_path)
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX classifier unavailable ({e}), falling back to torch")
+
+    from app.ml.fashion_classifier import get_fashion_classifier
+    return get_fashion_classifier(mmap_weights=settings.CLASSIFIER_MMAP_WEIGHTS)
+
+
+def get_classifier():
+    """
+    Возвращает singleton классификатора выбранного бэкенда (thread-safe).
+
+    Оба бэкенда реализуют predict / predict_image / predict_batch /
+    predict_top_k с одинаковым форматом ответа.
+    """
+    global _classifier_instance
+    if _classifier_instance is None:
+        with _classifier_lock:
+            if _classifier_instance is None:
+                _classifier_instance = _create_classifier()
+    return _classifier_instance
@@ -0,0 +1,86 @@
+# =============================================================================
+# КЛАССЫ И ФОРМАТ ОТВЕТА КЛАССИФИКАТОРА (classifier_labels.py)
+# =============================================================================
+# Общее для PyTorch (fashion_classifier.py) и ONNX (onnx_classifier.py)
+# реализаций: классы голов, параметры предобработки и сборка результата.
+# Модуль не импортирует torch — ONNX-путь работает без него.
+# =============================================================================
+
+from app.ml.attribute_mappings import (
+    DEEPFASHION_CATEGORIES,
+    CATEGORY_NAME_RU,
+    get_attributes_for_category,
+)
+
+# Количество классов
+NUM_CATEGORY_CLASSES = 46   # DeepFashion категории
+NUM_STYLE_CLASSES = 7       # Kaggle: casual, formal, sport, party, ethnic, street, vintage
+
+STYLE_CLASSES = {
+    0: "casual",
+    1: "formal",
+    2: "sport",
+    3: "party",
+    4: "ethnic",
+    5: "street",
+    6: "vintage",
+}
+
+# Предобработка (как TRANSFORM_INFERENCE): Resize(256) -> CenterCrop(224) -> Normalize
+RESIZE_SIZE = 256
+INPUT_SIZE = 224
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+def build_prediction(cat_idx: int, cat_conf: float, style_idx: int, style_conf: float) -> dict:
+    """Результат классификации + атрибуты из справочника."""
+    category_id = DEEPFASHION_CATEGORIES.get(cat_idx, "tee")
+    style_id = STYLE_CLASSES.get(style_idx, "casual")
+
+    # Атрибуты из справочника
+    attrs = get_attributes_for_category(category_id)
+
+    return {
+        "id": category_id,
+        "name": CATEGORY_NAME_RU.get(category_id, category_id),
+        "type": attrs["type"],
+        "confidence": round(cat_conf, 4),
+        "style": style_id,
+        "style_confidence": round(style_conf, 4),
+        "seasons": attrs["seasons"],
+        "temp_min": attrs["temp_min"],
+        "temp_max": attrs["temp_max"],
+        "waterproof_level": attrs["waterproof_level"],
+    }
+
+
+def build_top_k(indices, confidences) -> list:
+    """Топ-K категорий (для predict_top_k)."""
+    results = []
+    for idx, conf in zip(indices, confidences):
+        cat_id = DEEPFASHION_CATEGORIES.get(idx, "tee")
+        attrs = get_attributes_for_category(cat_id)
+        results.append({
+            "id": cat_id,
+            "name": CATEGORY_NAME_RU.get(cat_id, cat_id),
+            "type": attrs["type"],
+            "confidence": round(conf, 4),
+        })
+    return results
+
+
+def fallback_prediction() -> dict:
+    """Результат по умолчанию при ошибке."""
+    return {
+        "id": "tee",
+        "name": "Футболка",
+        "type": "top",
+        "confidence": 0.0,
+        "style": "casual",
+        "style_confidence": 0.0,
+        "seasons": ["spring", "summer", "fall"],
+        "temp_min": 15,
+        "temp_max": 35,
+        "waterproof_level": 0,
+    }
@@ -7,8 +7,10 @@
 
 import numpy as np
 from PIL import Image
-from sklearn.cluster import KMeans
-from typing import Tuple, Dict, List
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from typing import Tuple, Dict, List, Union
+
+from app.ml.image_context import COLOR_THUMBNAIL_SIZE, ImageContext
 
 # =============================================================================
 # МАППИНГ ЦВЕТОВ RGB -> НАЗВАНИЕ
@@ -63,9 +65,41 @@ COLOR_MAP = {
 }
 
 
-def _color_distance(c1: Tuple[int, int, int], c2: Tuple[int, int, int]) -> float:
-    """Вычисляет евклидово расстояние между двумя цветами в RGB."""
-    return np.sqrt(sum((a - b) ** 2 for a, b in zip(c1, c2)))
+# Таблица COLOR_MAP в виде массивов для векторного поиска ближайшего цвета
+COLOR_MAP_RGB = np.array(list(COLOR_MAP.keys()), dtype=np.int64)
+COLOR_MAP_NAMES: List[Tuple[str, str]] = list(COLOR_MAP.values())
+# ||c||² эталонов — постоянная часть расстояния
+_COLOR_MAP_NORMS = (COLOR_MAP_RGB ** 2).sum(axis=1)
+
+
+def find_closest_color_indices(colors) -> np.ndarray:
+    """
+    Индексы ближайших цветов COLOR_MAP для массива цветов (N×3).
+    
+    Евклидово расстояние в RGB, как и раньше:
+    argmin ||p - c||² = argmin (||c||² - 2·p·c) — одно матричное умножение
+    на весь батч. Для целых RGB вычисление точное (int64), при равных
+    расстояниях выигрывает цвет, записанный в COLOR_MAP раньше.
+    """
+    colors = np.asarray(colors).reshape(-1, 3)
+    if np.issubdtype(colors.dtype, np.integer):
+        colors = colors.astype(np.int64)
+        norms, refs = _COLOR_MAP_NORMS, COLOR_MAP_RGB
+    else:
+        colors = colors.astype(np.float64)
+        norms, refs = _COLOR_MAP_NORMS.astype(np.float64), COLOR_MAP_RGB.astype(np.float64)
+    scores = norms[None, :] - 2 * (colors @ refs.T)
+    return scores.argmin(axis=1)
+
+
+def find_closest_color_names(colors) -> List[Tuple[str, str]]:
+    """
+    Названия ближайших цветов для массива цветов (N×3).
+    
+    Returns:
+        List[Tuple[str, str]]: [(название_ru, название_en), ...]
+    """
+    return [COLOR_MAP_NAMES[i] for i in find_closest_color_indices(colors)]
 
 
 def find_closest_color_name(rgb: Tuple[int, int, int]) -> Tuple[str, str]:
@@ -78,19 +112,42 @@ def find_closest_color_name(rgb: Tuple[int, int, int]) -> Tuple[str, str]:
     Returns:
         Tuple[str, str]: (название_ru, название_en)
     """
-    min_distance = float('inf')
-    closest_name = ("неизвестный", "unknown")
+    return COLOR_MAP_NAMES[find_closest_color_indices(rgb)[0]]
+
+
+def _load_opaque_pixels(image: Union[str, ImageContext]) -> np.ndarray:
+    """
+    RGB непрозрачных пикселей уменьшенной копии изображения.
+    
+    ImageContext уже декодирован — берём его кэшированную уменьшенную
+    копию; путь к файлу открываем как раньше.
+    """
+    if isinstance(image, ImageContext):
+        return image.thumbnail(COLOR_THUMBNAIL_SIZE).opaque_pixels()
+    
+    # Загружаем изображение
+    img = Image.open(image)
+    
+    # Уменьшаем для скорости обработки
+    img.thumbnail(COLOR_THUMBNAIL_SIZE)
+    
+    # Конвертируем в RGBA если нужно
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
     
-    for color_rgb, names in COLOR_MAP.items():
-        distance = _color_distance(rgb, color_rgb)
-        if distance < min_distance:
-            min_distance = distance
-            closest_name = names
+    # Получаем пиксели
+    pixels = np.array(img)
     
-    return closest_name
+    # Удаляем прозрачные пиксели (alpha < 128)
+    # Reshape в (N, 4) - RGBA
+    flat_pixels = pixels.reshape(-1, 4)
+    
+    # Фильтруем непрозрачные пиксели
+    opaque_mask = flat_pixels[:, 3] > 128
+    return flat_pixels[opaque_mask][:, :3]
 
 
-def extract_dominant_color(image_path: str, k: int = 3) -> Dict:
+def extract_dominant_color(image: Union[str, ImageContext], k: int = 3) -> Dict:
     """
     Извлекает доминирующий цвет из изображения с помощью K-means кластеризации.
     
@@ -102,7 +159,7 @@ def extract_dominant_color(image_path: str, k: int = 3) -> Dict:
     5. Находим ближайшее название цвета
     
     Args:
-        image_path: Путь к изображению
+        image: Путь к изображению или ImageContext
         k: Количество кластеров (по умолчанию 3)
         
     Returns:
@@ -114,26 +171,7 @@ def extract_dominant_color(image_path: str, k: int = 3) -> Dict:
         }
     """
     try:
-        # Загружаем изображение
-        img = Image.open(image_path)
-        
-        # Уменьшаем для скорости обработки
-        img.thumbnail((150, 150))
-        
-        # Конвертируем в RGBA если нужно
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        # Получаем пиксели
-        pixels = np.array(img)
-        
-        # Удаляем прозрачные пиксели (alpha < 128)
-        # Reshape в (N, 4) - RGBA
-        flat_pixels = pixels.reshape(-1, 4)
-        
-        # Фильтруем непрозрачные пиксели
-        opaque_mask = flat_pixels[:, 3] > 128
-        rgb_pixels = flat_pixels[opaque_mask][:, :3]
+        rgb_pixels = _load_opaque_pixels(image)
         
         if len(rgb_pixels) < k:
             # Недостаточно пикселей
@@ -178,28 +216,19 @@ def extract_dominant_color(image_path: str, k: int = 3) -> Dict:
         }
 
 
-def extract_color_palette(image_path: str, k: int = 5) -> List[Dict]:
+def extract_color_palette(image: Union[str, ImageContext], k: int = 5) -> List[Dict]:
     """
     Извлекает палитру из k цветов изображения.
     
     Args:
-        image_path: Путь к изображению
+        image: Путь к изображению или ImageContext
         k: Количество цветов в палитре
         
     Returns:
         List[Dict]: Список цветов отсортированных по частоте
     """
     try:
-        img = Image.open(image_path)
-        img.thumbnail((150, 150))
-        
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        pixels = np.array(img)
-        flat_pixels = pixels.reshape(-1, 4)
-        opaque_mask = flat_pixels[:, 3] > 128
-        rgb_pixels = flat_pixels[opaque_mask][:, :3]
+        rgb_pixels = _load_opaque_pixels(image)
         
         if len(rgb_pixels) < k:
             return []
@@ -213,10 +242,12 @@ def extract_color_palette(image_path: str, k: int = 5) -> List[Dict]:
         # Сортируем по частоте
         sorted_indices = np.argsort(-counts)
         
+        # Названия всех цветов палитры — одним батчем
+        palette_rgb = kmeans.cluster_centers_[sorted_indices].astype(int)
+        palette_names = find_closest_color_names(palette_rgb)
+        
         palette = []
-        for idx in sorted_indices:
-            rgb = kmeans.cluster_centers_[idx].astype(int)
-            name_ru, name_en = find_closest_color_name(tuple(rgb))
+        for idx, rgb, (name_ru, name_en) in zip(sorted_indices, palette_rgb, palette_names):
             percentage = counts[idx] / len(rgb_pixels) * 100
             
             palette.append({
@@ -234,6 +265,178 @@ def extract_color_palette(image_path: str, k: int = 5) -> List[Dict]:
         return []
 
 
+# =============================================================================
+# ЕДИНЫЙ АНАЛИЗ ЦВЕТА — ОДНА КЛАСТЕРИЗАЦИЯ
+# =============================================================================
+# extract_dominant_color (k=3) и extract_color_palette (k=4) по отдельности
+# дают два KMeans(n_init=10) — 20 запусков на одно фото. analyze_colors()
+# кластеризует один раз (k=4) и выводит из результата палитру, доминирующий
+# цвет и is_multicolor.
+#
+# Доминирующий цвет прежде искался отдельным KMeans с k=3. Здесь k=3
+# получается из готовых k=4 кластеров: два ближайших (по Уорду) сливаются,
+# затем несколько итераций Ллойда уточняют центры на тех же пикселях —
+# это доли миллисекунды против полного KMeans(n_init=10).
+#
+# Бэкенды кластеризации:
+#   kmeans      — KMeans(n_init=10), как раньше
+#   minibatch   — MiniBatchKMeans, быстрее на больших картинках
+#   median_cut  — квантование Pillow (median cut), без итераций
+# Совпадение с прежними функциями проверяет benchmark_colors.py.
+
+COLOR_BACKENDS = ("kmeans", "minibatch", "median_cut")
+
+# Палитра из стольких разных названий цветов считается многоцветной
+MULTICOLOR_MIN_NAMES = 3
+
+# Кластеров для доминирующего цвета (как в extract_dominant_color)
+DOMINANT_CLUSTERS = 3
+
+# Итерации Ллойда при уточнении центров после слияния
+REFINE_MAX_ITER = 30
+
+FALLBACK_DOMINANT = {
+    "rgb": [128, 128, 128],
+    "hex": "#808080",
+    "name_ru": "серый",
+    "name_en": "gray"
+}
+
+
+def _cluster_pixels(rgb_pixels: np.ndarray, k: int, backend: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Кластеризует пиксели. Возвращает (центры k×3, число пикселей в кластере)."""
+    if backend == "kmeans":
+        model = KMeans(n_clusters=k, n_init=10, random_state=42).fit(rgb_pixels)
+        return model.cluster_centers_, np.bincount(model.labels_, minlength=k)
+    
+    if backend == "minibatch":
+        model = MiniBatchKMeans(
+            n_clusters=k, n_init=3, batch_size=1024, random_state=42
+        ).fit(rgb_pixels)
+        return model.cluster_centers_, np.bincount(model.labels_, minlength=k)
+    
+    if backend == "median_cut":
+        strip = Image.fromarray(np.ascontiguousarray(rgb_pixels, dtype=np.uint8).reshape(-1, 1, 3), "RGB")
+        quantized = strip.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+        labels = np.asarray(quantized).reshape(-1)
+        palette = np.asarray(quantized.getpalette()[:3 * k], dtype=np.float64).reshape(-1, 3)
+        counts = np.bincount(labels, minlength=len(palette))
+        return palette, counts
+    
+    raise ValueError(f"Unknown color backend: {backend}. Use one of {COLOR_BACKENDS}")
+
+
+def _merge_to_clusters(centers: np.ndarray, counts: np.ndarray, n_clusters: int) -> np.ndarray:
+    """Сливает ближайшие кластеры (критерий Уорда), пока их больше n_clusters."""
+    centers = [c.astype(np.float64) for c in centers]
+    counts = [float(n) for n in counts]
+    while len(centers) > n_clusters:
+        best = None
+        for i in range(len(centers)):
+            for j in range(i + 1, len(centers)):
+                cost = counts[i] * counts[j] / (counts[i] + counts[j]) * np.sum((centers[i] - centers[j]) ** 2)
+                if best is None or cost < best[0]:
+                    best = (cost, i, j)
+        _, i, j = best
+        merged = (centers[i] * counts[i] + centers[j] * counts[j]) / (counts[i] + counts[j])
+        centers[i], counts[i] = merged, counts[i] + counts[j]
+        del centers[j], counts[j]
+    return np.array(centers)
+
+
+def _refine_clusters(pixels: np.ndarray, centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Итерации Ллойда от заданных центров. Возвращает (центры, число пикселей)."""
+    pixels = pixels.astype(np.float64)
+    labels = None
+    for _ in range(REFINE_MAX_ITER):
+        # argmin ||p - c||² = argmin (||c||² - 2 p·c)
+        scores = (centers ** 2).sum(axis=1) - 2.0 * (pixels @ centers.T)
+        new_labels = scores.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sizes = np.bincount(labels, minlength=len(centers))
+        nonempty = sizes > 0
+        sums = np.stack(
+            [np.bincount(labels, weights=pixels[:, ch], minlength=len(centers)) for ch in range(3)],
+            axis=1
+        )
+        centers = centers.copy()
+        centers[nonempty] = sums[nonempty] / sizes[nonempty, None]
+    return centers, np.bincount(labels, minlength=len(centers))
+
+
+def _dominant_from_clusters(pixels: np.ndarray, centers: np.ndarray, counts: np.ndarray) -> Dict:
+    """Доминирующий цвет из кластеров палитры (k=3 через слияние + уточнение)."""
+    centers, counts = centers[counts > 0], counts[counts > 0]
+    if len(centers) > DOMINANT_CLUSTERS:
+        centers, counts = _refine_clusters(pixels, _merge_to_clusters(centers, counts, DOMINANT_CLUSTERS))
+    
+    dominant_rgb = centers[np.argmax(counts)].astype(int)
+    name_ru, name_en = find_closest_color_name(tuple(dominant_rgb))
+    return {
+        "rgb": dominant_rgb.tolist(),
+        "hex": "#{:02x}{:02x}{:02x}".format(*dominant_rgb),
+        "name_ru": name_ru,
+        "name_en": name_en
+    }
+
+
+def analyze_colors(
+    image: Union[str, ImageContext],
+    k: int = 4,
+    backend: str = "kmeans"
+) -> Dict:
+    """
+    Доминирующий цвет, палитра и многоцветность за одну кластеризацию.
+    
+    Args:
+        image: Путь к изображению или ImageContext
+        k: Количество цветов в палитре
+        backend: kmeans | minibatch | median_cut
+        
+    Returns:
+        dict: {
+            "dominant": {"rgb", "hex", "name_ru", "name_en"},
+            "palette": [{"rgb", "hex", "name_ru", "name_en", "percentage"}, ...],
+            "is_multicolor": bool
+        }
+        dominant["rgb"] — вход для suggest_color_variants.
+    """
+    if backend not in COLOR_BACKENDS:
+        raise ValueError(f"Unknown color backend: {backend}. Use one of {COLOR_BACKENDS}")
+    
+    empty = {"dominant": dict(FALLBACK_DOMINANT), "palette": [], "is_multicolor": False}
+    try:
+        rgb_pixels = _load_opaque_pixels(image)
+        if len(rgb_pixels) < k:
+            return empty
+        
+        centers, counts = _cluster_pixels(rgb_pixels, k, backend)
+    except Exception as e:
+        print(f"❌ Ошибка анализа цвета: {e}")
+        return empty
+    
+    total = counts.sum()
+    order = [idx for idx in np.argsort(-counts, kind="stable") if counts[idx] > 0]
+    palette_rgb = centers[order].astype(int)
+    palette = []
+    for idx, rgb, (name_ru, name_en) in zip(order, palette_rgb, find_closest_color_names(palette_rgb)):
+        palette.append({
+            "rgb": rgb.tolist(),
+            "hex": "#{:02x}{:02x}{:02x}".format(*rgb),
+            "name_ru": name_ru,
+            "name_en": name_en,
+            "percentage": round(counts[idx] / total * 100, 1)
+        })
+    
+    return {
+        "dominant": _dominant_from_clusters(rgb_pixels, centers, counts),
+        "palette": palette,
+        "is_multicolor": len({c["name_en"] for c in palette}) >= MULTICOLOR_MIN_NAMES
+    }
+
+
 # =============================================================================
 # УМНЫЙ ВЫБОР ЦВЕТА — 5 ВАРИАНТОВ (Smart Color Suggestions)
 # =============================================================================
@@ -274,9 +477,11 @@ def suggest_color_variants(rgb: Tuple[int, int, int], count: int = 5) -> List[Di
         (_hsl_variant(rgb, ds=-0.20), "Приглушённый"),
     ]
     
+    variants_config = variants_config[:count]
+    names = find_closest_color_names([variant_rgb for variant_rgb, _ in variants_config])
+    
     result = []
-    for i, (variant_rgb, label) in enumerate(variants_config[:count]):
-        name_ru, name_en = find_closest_color_name(variant_rgb)
+    for (variant_rgb, label), (name_ru, name_en) in zip(variants_config, names):
         hex_color = "#{:02x}{:02x}{:02x}".format(*variant_rgb)
         result.append({
             "id": name_en,
@@ -300,6 +505,7 @@ def get_color_extractor():
     return {
         "extract_dominant_color": extract_dominant_color,
         "extract_color_palette": extract_color_palette,
+        "analyze_colors": analyze_colors,
         "suggest_color_variants": suggest_color_variants
     }
 
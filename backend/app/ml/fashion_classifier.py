@@ -18,29 +18,21 @@ import torch.nn as nn
 from torchvision import transforms, models
 from PIL import Image
 
-from app.ml.attribute_mappings import (
-    DEEPFASHION_CATEGORIES,
-    CATEGORY_NAME_RU,
-    CATEGORY_TYPE,
-    get_attributes_for_category,
+from app.ml.classifier_labels import (
+    NUM_CATEGORY_CLASSES,
+    NUM_STYLE_CLASSES,
+    STYLE_CLASSES,
+    RESIZE_SIZE,
+    INPUT_SIZE,
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    build_prediction,
+    build_top_k,
+    fallback_prediction,
 )
 
 logger = logging.getLogger(__name__)
 
-# Количество классов
-NUM_CATEGORY_CLASSES = 46   # DeepFashion категории
-NUM_STYLE_CLASSES = 7       # Kaggle: casual, formal, sport, party, ethnic, street, vintage
-
-STYLE_CLASSES = {
-    0: "casual",
-    1: "formal",
-    2: "sport",
-    3: "party",
-    4: "ethnic",
-    5: "street",
-    6: "vintage",
-}
-
 
 # =============================================================================
 # АРХИТЕКТУРА: MultiHeadResNet50
@@ -115,12 +107,12 @@ class MultiHeadResNet50(nn.Module):
 # ПРЕДОБРАБОТКА ИЗОБРАЖЕНИЙ
 # =============================================================================
 TRANSFORM_INFERENCE = transforms.Compose([
-    transforms.Resize(256),
-    transforms.CenterCrop(224),
+    transforms.Resize(RESIZE_SIZE),
+    transforms.CenterCrop(INPUT_SIZE),
     transforms.ToTensor(),
     transforms.Normalize(
-        mean=[0.485, 0.456, 0.406],
-        std=[0.229, 0.224, 0.225],
+        mean=IMAGENET_MEAN,
+        std=IMAGENET_STD,
     ),
 ])
 
@@ -149,10 +141,11 @@ class FashionClassifier:
         # }
     """
     
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, mmap_weights: bool = True):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = None
         self.model_loaded = False
+        self.weights_mmapped = False
         
         # Пути к весам (приоритет: аргумент -> стандартный путь)
         if model_path is None:
@@ -160,10 +153,19 @@ class FashionClassifier:
             model_path = os.path.join(base_dir, "weights", "fashion_resnet50.pth")
         
         self.model_path = model_path
+        # mmap имеет смысл только на CPU: .to("cuda") всё равно копирует веса
+        self.mmap_weights = mmap_weights and self.device.type == "cpu"
         self._load_model()
     
     def _load_model(self):
         """Загружает модель. Если весов нет — работает в ImageNet-only режиме."""
+        if self.mmap_weights and os.path.exists(self.model_path):
+            try:
+                self._load_model_mmap()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ mmap loading failed: {e}. Loading weights into memory.")
+        
         self.model = MultiHeadResNet50(pretrained=True)
         
         if os.path.exists(self.model_path):
@@ -185,6 +187,29 @@ class FashionClassifier:
         self.model.to(self.device)
         self.model.eval()
     
+    def _load_model_mmap(self):
+        """
+        Веса отображаются в память из файла, а не копируются в кучу процесса.
+        
+        Модель создаётся на meta-устройстве (без выделения памяти и без
+        загрузки ImageNet-весов, которые всё равно перезапишутся), затем
+        load_state_dict(assign=True) делает параметры видами на mmap-страницы.
+        Страницы только читаются, поэтому несколько воркеров/реплик на одном
+        хосте делят их через page cache вместо N копий ResNet-50.
+        """
+        state_dict = torch.load(self.model_path, map_location="cpu", weights_only=True, mmap=True)
+        
+        with torch.device("meta"):
+            model = MultiHeadResNet50(pretrained=False)
+        # strict: если каких-то весов нет, на meta остались бы пустые тензоры
+        model.load_state_dict(state_dict, assign=True)
+        model.eval()
+        
+        self.model = model
+        self.model_loaded = True
+        self.weights_mmapped = True
+        logger.info(f"✅ Fashion ResNet-50 weights memory-mapped from {self.model_path}")
+    
     def predict(self, image_path: str) -> dict:
         """
         Классифицирует изображение одежды.
@@ -198,38 +223,53 @@ class FashionClassifier:
             logger.error(f"Cannot open image {image_path}: {e}")
             return self._fallback_result()
         
-        input_tensor = TRANSFORM_INFERENCE(img).unsqueeze(0).to(self.device)
+        return self.predict_image(img)
+    
+    def predict_image(self, img: Image.Image) -> dict:
+        """
+        Классифицирует уже декодированное изображение (RGB).
+        
+        Используется пайплайном загрузки (ImageContext.image("RGB")),
+        чтобы не читать файл с диска повторно.
+        """
+        return self.predict_batch([img])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[dict]:
+        """
+        Классифицирует несколько изображений (RGB) одним прогоном модели.
+        
+        Накладные расходы на вызов ResNet-50 делятся на весь батч —
+        см. app/services/inference_batcher.py.
+        
+        Returns:
+            List[dict]: результаты в порядке images (формат как у predict)
+        """
+        if not images:
+            return []
+        
+        input_tensor = torch.stack([TRANSFORM_INFERENCE(img) for img in images]).to(self.device)
         
         with torch.no_grad():
             cat_logits, style_logits = self.model(input_tensor)
         
-        # Категория
-        cat_probs = torch.softmax(cat_logits, dim=1)[0]
-        cat_idx = cat_probs.argmax().item()
-        cat_conf = cat_probs[cat_idx].item()
-        category_id = DEEPFASHION_CATEGORIES.get(cat_idx, "tee")
-        
-        # Стиль
-        style_probs = torch.softmax(style_logits, dim=1)[0]
-        style_idx = style_probs.argmax().item()
-        style_conf = style_probs[style_idx].item()
-        style_id = STYLE_CLASSES.get(style_idx, "casual")
+        cat_probs = torch.softmax(cat_logits, dim=1)
+        style_probs = torch.softmax(style_logits, dim=1)
         
-        # Атрибуты из справочника
-        attrs = get_attributes_for_category(category_id)
+        # Категория и стиль: argmax и уверенность по всему батчу
+        cat_conf, cat_idx = cat_probs.max(dim=1)
+        style_conf, style_idx = style_probs.max(dim=1)
         
-        return {
-            "id": category_id,
-            "name": CATEGORY_NAME_RU.get(category_id, category_id),
-            "type": attrs["type"],
-            "confidence": round(cat_conf, 4),
-            "style": style_id,
-            "style_confidence": round(style_conf, 4),
-            "seasons": attrs["seasons"],
-            "temp_min": attrs["temp_min"],
-            "temp_max": attrs["temp_max"],
-            "waterproof_level": attrs["waterproof_level"],
-        }
+        return [
+            self._build_result(c_idx, c_conf, s_idx, s_conf)
+            for c_idx, c_conf, s_idx, s_conf in zip(
+                cat_idx.tolist(), cat_conf.tolist(), style_idx.tolist(), style_conf.tolist()
+            )
+        ]
+    
+    @staticmethod
+    def _build_result(cat_idx: int, cat_conf: float, style_idx: int, style_conf: float) -> dict:
+        """Результат классификации + атрибуты из справочника."""
+        return build_prediction(cat_idx, cat_conf, style_idx, style_conf)
     
     def predict_top_k(self, image_path: str, k: int = 5) -> List[dict]:
         """Возвращает топ-K предсказаний категории."""
@@ -246,34 +286,12 @@ class FashionClassifier:
         cat_probs = torch.softmax(cat_logits, dim=1)[0]
         top_k = torch.topk(cat_probs, min(k, len(cat_probs)))
         
-        results = []
-        for idx, conf in zip(top_k.indices.tolist(), top_k.values.tolist()):
-            cat_id = DEEPFASHION_CATEGORIES.get(idx, "tee")
-            attrs = get_attributes_for_category(cat_id)
-            results.append({
-                "id": cat_id,
-                "name": CATEGORY_NAME_RU.get(cat_id, cat_id),
-                "type": attrs["type"],
-                "confidence": round(conf, 4),
-            })
-        
-        return results
+        return build_top_k(top_k.indices.tolist(), top_k.values.tolist())
     
     @staticmethod
     def _fallback_result() -> dict:
         """Результат по умолчанию при ошибке."""
-        return {
-            "id": "tee",
-            "name": "Футболка",
-            "type": "top",
-            "confidence": 0.0,
-            "style": "casual",
-            "style_confidence": 0.0,
-            "seasons": ["spring", "summer", "fall"],
-            "temp_min": 15,
-            "temp_max": 35,
-            "waterproof_level": 0,
-        }
+        return fallback_prediction()
 
 
 # =============================================================================
@@ -285,11 +303,15 @@ _fashion_classifier_instance = None
 _fashion_classifier_lock = threading.Lock()
 
 
-def get_fashion_classifier() -> FashionClassifier:
-    """Возвращает singleton экземпляр FashionClassifier (thread-safe)."""
+def get_fashion_classifier(mmap_weights: bool = True) -> FashionClassifier:
+    """
+    Возвращает singleton экземпляр FashionClassifier (thread-safe).
+    
+    mmap_weights учитывается только при первом вызове (создании модели).
+    """
     global _fashion_classifier_instance
     if _fashion_classifier_instance is None:
         with _fashion_classifier_lock:
             if _fashion_classifier_instance is None:
-                _fashion_classifier_instance = FashionClassifier()
+                _fashion_classifier_instance = FashionClassifier(mmap_weights=mmap_weights)
     return _fashion_classifier_instance
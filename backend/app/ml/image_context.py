@@ -0,0 +1,139 @@
+# =============================================================================
+# ИЗОБРАЖЕНИЕ, ДЕКОДИРОВАННОЕ ОДИН РАЗ (image_context.py)
+# =============================================================================
+# Раньше каждый этап загрузки заново открывал файл с диска: rembg читал
+# байты, классификатор делал Image.open, извлечение цвета и палитры —
+# Image.open + thumbnail ещё по разу.
+#
+# ImageContext держит декодированную картинку (RGBA ndarray) и кэширует
+# производные: PIL-изображения и уменьшенные копии. Этапы принимают его
+# вместо пути к файлу.
+# =============================================================================
+
+import io
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Размер уменьшенной копии для извлечения цвета (K-means)
+COLOR_THUMBNAIL_SIZE = (150, 150)
+
+
+class ImageContext:
+    """
+    Декодированное изображение + кэш производных.
+
+    Неизменяемое: этап, меняющий картинку (удаление фона), возвращает
+    новый контекст. Сериализуется (pickle) без кэшей — в пул процессов
+    лучше передавать уменьшенную копию (thumbnail()).
+    """
+
+    def __init__(self, rgba: np.ndarray, source_bytes: Optional[bytes] = None):
+        if rgba.ndim != 3 or rgba.shape[2] != 4 or rgba.dtype != np.uint8:
+            raise ValueError(f"Expected HxWx4 uint8 array, got {rgba.shape} {rgba.dtype}")
+        self.rgba = rgba
+        # Исходные байты файла (для фолбэка «сохранить как есть»)
+        self.source_bytes = source_bytes
+        self._images: Dict[str, Image.Image] = {}
+        self._thumbnails: Dict[Tuple[int, int], "ImageContext"] = {}
+
+    # ─── Создание ────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_edge: int = 0) -> "ImageContext":
+        """
+        Декодирует байты файла (любой формат, который понимает Pillow).
+
+        Ориентация из EXIF применяется сразу (как это делал rembg),
+        дальше все этапы видят уже повёрнутую картинку.
+
+        max_edge > 0 ограничивает большую сторону результата. JPEG при этом
+        декодируется сразу в уменьшенном масштабе (draft: DCT-scaling
+        1/2..1/8), и 12 Мп фото с телефона не разворачивается в полный
+        RGBA-массив.
+        """
+        with Image.open(io.BytesIO(data)) as img:
+            if max_edge > 0 and max(img.size) > max_edge:
+                # draft выбирает наименьший масштаб, при котором обе стороны
+                # не меньше запрошенных — просим пропорционально уменьшенный
+                # размер (поворот по EXIF на пропорции не влияет)
+                scale = max_edge / max(img.size)
+                img.draft("RGB", (int(img.width * scale) + 1, int(img.height * scale) + 1))
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((max_edge, max_edge))
+            else:
+                img = ImageOps.exif_transpose(img)
+            return cls.from_image(img, source_bytes=data)
+
+    @classmethod
+    def from_path(cls, path: str) -> "ImageContext":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def from_image(cls, img: Image.Image, source_bytes: Optional[bytes] = None) -> "ImageContext":
+        rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+        ctx = cls(np.asarray(rgba, dtype=np.uint8), source_bytes)
+        ctx._images["RGBA"] = rgba
+        return ctx
+
+    # ─── Свойства ────────────────────────────────────────────────────────
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(ширина, высота), как у PIL."""
+        return self.rgba.shape[1], self.rgba.shape[0]
+
+    def image(self, mode: str = "RGBA") -> Image.Image:
+        """
+        PIL-изображение в нужном режиме (кэшируется, не изменять на месте).
+
+        RGB получается отбрасыванием альфа-канала — как Image.open(png).convert("RGB").
+        """
+        img = self._images.get(mode)
+        if img is None:
+            base = self._images.get("RGBA")
+            if base is None:
+                base = self._images["RGBA"] = Image.fromarray(self.rgba, "RGBA")
+            img = base if mode == "RGBA" else base.convert(mode)
+            self._images[mode] = img
+        return img
+
+    def thumbnail(self, size: Tuple[int, int] = COLOR_THUMBNAIL_SIZE) -> "ImageContext":
+        """Уменьшенная копия (как Image.thumbnail: с сохранением пропорций, без увеличения)."""
+        size = tuple(size)
+        thumb = self._thumbnails.get(size)
+        if thumb is None:
+            width, height = self.size
+            if width <= size[0] and height <= size[1]:
+                thumb = self
+            else:
+                img = self.image("RGBA").copy()
+                img.thumbnail(size)
+                thumb = ImageContext.from_image(img)
+            self._thumbnails[size] = thumb
+        return thumb
+
+    def opaque_pixels(self, min_alpha: int = 128) -> np.ndarray:
+        """RGB непрозрачных пикселей (alpha > min_alpha), форма (N, 3)."""
+        flat = self.rgba.reshape(-1, 4)
+        return flat[flat[:, 3] > min_alpha][:, :3]
+
+    # ─── Сохранение ──────────────────────────────────────────────────────
+
+    def to_png_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.image("RGBA").save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def save_png(self, path: str) -> None:
+        self.image("RGBA").save(path, format="PNG")
+
+    # ─── Pickle (пул процессов) ──────────────────────────────────────────
+
+    def __getstate__(self):
+        return {"rgba": self.rgba, "source_bytes": None}
+
+    def __setstate__(self, state):
+        self.__init__(state["rgba"], state["source_bytes"])
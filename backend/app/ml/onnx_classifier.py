@@ -0,0 +1,147 @@
+# =============================================================================
+# ONNX RUNTIME КЛАССИФИКАТОР (onnx_classifier.py)
+# =============================================================================
+# Тот же MultiHeadResNet50, экспортированный в ONNX (app/ml/onnx_export.py),
+# но без PyTorch: процесс API не импортирует torch/torchvision и не держит
+# их в памяти, инференс идёт через onnxruntime (в т.ч. INT8-вариант модели).
+#
+# Предобработка повторяет TRANSFORM_INFERENCE из fashion_classifier.py
+# (Resize(256) -> CenterCrop(224) -> ToTensor -> Normalize) на PIL + numpy,
+# формат ответа — тот же, что у FashionClassifier.
+# =============================================================================
+
+import os
+import logging
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from app.ml.classifier_labels import (
+    RESIZE_SIZE,
+    INPUT_SIZE,
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    build_prediction,
+    build_top_k,
+    fallback_prediction,
+)
+
+logger = logging.getLogger(__name__)
+
+_MEAN = np.asarray(IMAGENET_MEAN, dtype=np.float32).reshape(3, 1, 1)
+_STD = np.asarray(IMAGENET_STD, dtype=np.float32).reshape(3, 1, 1)
+
+
+# =============================================================================
+# ПРЕДОБРАБОТКА (без torchvision)
+# =============================================================================
+def preprocess_image(img: Image.Image) -> np.ndarray:
+    """
+    RGB-изображение -> массив (3, 224, 224) float32.
+
+    Размеры считаются так же, как в torchvision: короткая сторона -> 256
+    (длинная — int(256 * long / short)), bilinear, затем центральный кроп
+    224 с округлением отступов.
+    """
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    w, h = img.size
+    if w <= h:
+        new_w, new_h = RESIZE_SIZE, int(RESIZE_SIZE * h / w)
+    else:
+        new_w, new_h = int(RESIZE_SIZE * w / h), RESIZE_SIZE
+    if (new_w, new_h) != (w, h):
+        img = img.resize((new_w, new_h), Image.BILINEAR)
+
+    top = int(round((new_h - INPUT_SIZE) / 2.0))
+    left = int(round((new_w - INPUT_SIZE) / 2.0))
+    img = img.crop((left, top, left + INPUT_SIZE, top + INPUT_SIZE))
+
+    array = np.asarray(img, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return (array - _MEAN) / _STD
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# =============================================================================
+# КЛАССИФИКАТОР
+# =============================================================================
+class OnnxFashionClassifier:
+    """
+    Классификатор одежды на onnxruntime (API как у FashionClassifier).
+
+    Использование:
+        classifier = OnnxFashionClassifier("app/ml/weights/fashion_resnet50.onnx")
+        result = classifier.predict_image(img)
+    """
+
+    def __init__(self, model_path: str):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found: {model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.model_loaded = True
+        logger.info(f"✅ Fashion ResNet-50 (ONNX) loaded from {model_path}")
+
+    def _run(self, images: List[Image.Image]):
+        batch = np.stack([preprocess_image(img) for img in images])
+        cat_logits, style_logits = self.session.run(None, {self.input_name: batch})
+        return _softmax(cat_logits), _softmax(style_logits)
+
+    def predict(self, image_path: str) -> dict:
+        """Классифицирует изображение одежды по пути к файлу."""
+        try:
+            img = Image.open(image_path).convert("RGB")
+        except Exception as e:
+            logger.error(f"Cannot open image {image_path}: {e}")
+            return fallback_prediction()
+
+        return self.predict_image(img)
+
+    def predict_image(self, img: Image.Image) -> dict:
+        """Классифицирует уже декодированное изображение (RGB)."""
+        return self.predict_batch([img])[0]
+
+    def predict_batch(self, images: List[Image.Image]) -> List[dict]:
+        """Классифицирует несколько изображений одним прогоном сессии."""
+        if not images:
+            return []
+
+        cat_probs, style_probs = self._run(images)
+        cat_idx = cat_probs.argmax(axis=1)
+        style_idx = style_probs.argmax(axis=1)
+
+        return [
+            build_prediction(
+                int(c_idx), float(cat_probs[row, c_idx]),
+                int(s_idx), float(style_probs[row, s_idx])
+            )
+            for row, (c_idx, s_idx) in enumerate(zip(cat_idx, style_idx))
+        ]
+
+    def predict_top_k(self, image_path: str, k: int = 5) -> List[dict]:
+        """Возвращает топ-K предсказаний категории."""
+        try:
+            img = Image.open(image_path).convert("RGB")
+        except Exception:
+            return [fallback_prediction()]
+
+        cat_probs, _ = self._run([img])
+        probs = cat_probs[0]
+        top = np.argsort(-probs, kind="stable")[:min(k, len(probs))]
+        return build_top_k(top.tolist(), probs[top].tolist())
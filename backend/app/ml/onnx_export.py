@@ -0,0 +1,195 @@
+# =============================================================================
+# ЭКСПОРТ MULTI-HEAD RESNET-50 В ONNX (onnx_export.py)
+# =============================================================================
+# export — PyTorch-веса (weights/fashion_resnet50.pth) -> ONNX с динамической
+#          размерностью батча; --quantize дополнительно сохраняет
+#          INT8-вариант (динамическая квантизация onnxruntime)
+# parity — сравнение top-1 категории/стиля и скорости torch vs onnx
+#          на реальных фото (по умолчанию uploads/)
+#
+# Запуск (из backend/):
+#   python -m app.ml.onnx_export export
+#   python -m app.ml.onnx_export export --quantize
+#   python -m app.ml.onnx_export parity --onnx app/ml/weights/fashion_resnet50.int8.onnx
+#
+# Для export нужны torch и onnx (requirements.txt), для --quantize и
+# parity — ещё onnxruntime. Автотест паритета: tests/test_onnx_parity.py
+#
+# Затем в .env: CLASSIFIER_BACKEND=onnx и, при необходимости, CLASSIFIER_ONNX_PATH
+# =============================================================================
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+
+import numpy as np
+from PIL import Image
+
+from app.ml.classifier_backend import DEFAULT_ONNX_PATH
+from app.ml.classifier_labels import INPUT_SIZE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s')
+logger = logging.getLogger(__name__)
+
+OPSET_VERSION = 17
+INPUT_NAME = "image"
+OUTPUT_NAMES = ["category_logits", "style_logits"]
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
+
+
+def quantized_path(onnx_path: str) -> str:
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}.int8{ext}"
+
+
+# =============================================================================
+# ЭКСПОРТ
+# =============================================================================
+def export_onnx(weights_path: str, onnx_path: str, quantize: bool = False) -> list:
+    """
+    Экспортирует MultiHeadResNet50 в ONNX.
+
+    Returns:
+        list: пути созданных моделей (fp32 и, если quantize, int8)
+    """
+    import torch
+    from app.ml.fashion_classifier import FashionClassifier
+
+    classifier = FashionClassifier(model_path=weights_path)
+    if not classifier.model_loaded:
+        raise RuntimeError(f"Fine-tuned weights not loaded from {weights_path}")
+
+    model = classifier.model.to("cpu").eval()
+    dummy = torch.randn(1, 3, INPUT_SIZE, INPUT_SIZE)
+
+    os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+    torch.onnx.export(
+        model,
+        dummy,
+        onnx_path,
+        input_names=[INPUT_NAME],
+        output_names=OUTPUT_NAMES,
+        dynamic_axes={INPUT_NAME: {0: "batch"}, **{name: {0: "batch"} for name in OUTPUT_NAMES}},
+        opset_version=OPSET_VERSION,
+        do_constant_folding=True,
+    )
+    logger.info(f"✅ ONNX model saved: {onnx_path} ({os.path.getsize(onnx_path) / 1e6:.1f} MB)")
+    created = [onnx_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = quantized_path(onnx_path)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        logger.info(f"✅ INT8 model saved: {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+        created.append(int8_path)
+
+    return created
+
+
+# =============================================================================
+# ПРОВЕРКА СОВПАДЕНИЯ С PYTORCH
+# =============================================================================
+def _timed_batches(predict_batch, images: list, batch_size: int):
+    results, elapsed = [], 0.0
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        t0 = time.perf_counter()
+        results.extend(predict_batch(chunk))
+        elapsed += time.perf_counter() - t0
+    return results, elapsed * 1000 / len(images)
+
+
+def check_parity(weights_path: str, onnx_path: str, image_paths: list, batch_size: int = 8) -> dict:
+    """Top-1 категория/стиль и скорость: FashionClassifier vs OnnxFashionClassifier."""
+    from app.ml.fashion_classifier import FashionClassifier
+    from app.ml.onnx_classifier import OnnxFashionClassifier
+
+    images = [Image.open(path).convert("RGB") for path in image_paths]
+    torch_clf = FashionClassifier(model_path=weights_path)
+    onnx_clf = OnnxFashionClassifier(onnx_path)
+
+    torch_results, torch_ms = _timed_batches(torch_clf.predict_batch, images, batch_size)
+    onnx_results, onnx_ms = _timed_batches(onnx_clf.predict_batch, images, batch_size)
+
+    mismatches = []
+    for path, ref, cand in zip(image_paths, torch_results, onnx_results):
+        if ref["id"] != cand["id"] or ref["style"] != cand["style"]:
+            mismatches.append({
+                "image": os.path.basename(path),
+                "torch": [ref["id"], ref["style"]],
+                "onnx": [cand["id"], cand["style"]],
+            })
+
+    return {
+        "onnx_model": onnx_path,
+        "images": len(images),
+        "category_top1_match": float(np.mean([r["id"] == c["id"] for r, c in zip(torch_results, onnx_results)])),
+        "style_top1_match": float(np.mean([r["style"] == c["style"] for r, c in zip(torch_results, onnx_results)])),
+        "confidence_max_delta": float(max(
+            abs(r["confidence"] - c["confidence"]) for r, c in zip(torch_results, onnx_results)
+        )),
+        "torch_ms_per_image": round(torch_ms, 2),
+        "onnx_ms_per_image": round(onnx_ms, 2),
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    default_weights = os.path.join(os.path.dirname(DEFAULT_ONNX_PATH), "fashion_resnet50.pth")
+
+    parser = argparse.ArgumentParser(description="Export Multi-Head ResNet-50 to ONNX")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="PyTorch -> ONNX")
+    export_parser.add_argument("--weights", default=default_weights)
+    export_parser.add_argument("--output", default=DEFAULT_ONNX_PATH)
+    export_parser.add_argument("--quantize", action="store_true", help="Также сохранить INT8-модель")
+
+    parity_parser = sub.add_parser("parity", help="Сравнение torch vs onnx")
+    parity_parser.add_argument("images", nargs="*", help="Изображения (по умолчанию uploads/)")
+    parity_parser.add_argument("--weights", default=default_weights)
+    parity_parser.add_argument("--onnx", default=DEFAULT_ONNX_PATH)
+    parity_parser.add_argument("--batch-size", type=int, default=8)
+    parity_parser.add_argument("--output", default=None, help="Сохранить отчёт в JSON")
+    parity_parser.add_argument("--min-match", type=float, default=0.99,
+                               help="Минимальная доля совпадений top-1 (INT8 может слегка расходиться)")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.weights, args.output, quantize=args.quantize)
+        return
+
+    paths = args.images or sorted(
+        path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join("uploads", pattern))
+    )
+    if not paths:
+        parser.error("Нет изображений: передайте пути или положите файлы в uploads/")
+
+    report = check_parity(args.weights, args.onnx, paths, batch_size=args.batch_size)
+    logger.info(
+        f"Изображений: {report['images']}, категория top-1: {report['category_top1_match']:.1%}, "
+        f"стиль top-1: {report['style_top1_match']:.1%}, "
+        f"Δconfidence max: {report['confidence_max_delta']:.4f}"
+    )
+    logger.info(f"torch: {report['torch_ms_per_image']:.1f} ms/фото, onnx: {report['onnx_ms_per_image']:.1f} ms/фото")
+    for mismatch in report["mismatches"]:
+        logger.info(f"  ≠ {mismatch['image']}: torch={mismatch['torch']} onnx={mismatch['onnx']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Результаты: {args.output}")
+
+    # Ненулевой код, если модели расходятся (удобно для CI после переэкспорта)
+    if min(report["category_top1_match"], report["style_top1_match"]) < args.min_match:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# =============================================================================
+# OUTFIT ENGINE - Генерация образов из гардероба
+# =============================================================================
+# - generator.py — шаблоны перебора по слотам и отбор top-K
+# - search.py    — поиск top-K с отсечениями (branch-and-bound)
+# - diversity.py — выбор разнообразных образов из пула
+# - engine.py    — чистый API: вещи + признаки -> пул / готовые образы
+# =============================================================================
+
+from app.ml.outfit_engine.generator import (
+    CATEGORY_SLOTS,
+    SLOT_ACCESSORY,
+    SLOT_BOTTOM,
+    SLOT_FULL,
+    SLOT_OTHER,
+    SLOT_OUTER,
+    SLOT_SHOES,
+    SLOT_TOP,
+    category_slot,
+    get_pool_size,
+    iter_outfit_candidates,
+    iter_outfit_templates,
+    select_top_outfits,
+    select_top_outfits_batched,
+)
+from app.ml.outfit_engine.search import search_top_outfits, select_top_outfits_bnb
+from app.ml.outfit_engine.diversity import iter_diverse_outfits, select_diverse_outfits
+from app.ml.outfit_engine.engine import (
+    OutfitEngineError,
+    SlotGroups,
+    build_outfit_pool,
+    generate_outfits,
+    group_items_by_slot,
+)
+
+__all__ = [
+    "CATEGORY_SLOTS",
+    "SLOT_ACCESSORY",
+    "SLOT_BOTTOM",
+    "SLOT_FULL",
+    "SLOT_OTHER",
+    "SLOT_OUTER",
+    "SLOT_SHOES",
+    "SLOT_TOP",
+    "OutfitEngineError",
+    "SlotGroups",
+    "build_outfit_pool",
+    "category_slot",
+    "generate_outfits",
+    "get_pool_size",
+    "group_items_by_slot",
+    "iter_diverse_outfits",
+    "iter_outfit_candidates",
+    "iter_outfit_templates",
+    "search_top_outfits",
+    "select_diverse_outfits",
+    "select_top_outfits",
+    "select_top_outfits_batched",
+    "select_top_outfits_bnb",
+]
@@ -0,0 +1,115 @@
+# =============================================================================
+# OUTFIT DIVERSITY - Выбор разнообразных образов из пула лучших
+# =============================================================================
+# Жадный выбор: на каждом шаге берём образ с максимальным
+#   total + novelty * NOVELTY_BONUS - reuse * REUSE_PENALTY,
+# где novelty — сколько вещей образа ещё не встречалось в выбранных,
+# reuse — сколько раз его вещи уже использованы.
+#
+# Раньше на каждом шаге пересчитывались все оставшиеся образы
+# (O(count × N) плюс remaining.remove). Здесь:
+# - reuse/novelty обновляются только у образов с вещами выбранного образа
+#   (индекс вещь -> образы)
+# - скорректированная оценка со временем только уменьшается, поэтому
+#   достаточно ленивой кучи: устаревшую запись пересчитываем, когда она
+#   оказалась наверху (lazy greedy)
+# =============================================================================
+
+import heapq
+import random
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+# Бонус за каждую ещё не использованную вещь образа
+NOVELTY_BONUS = 0.02
+
+# Штраф за каждое повторное использование вещи
+REUSE_PENALTY = 0.03
+
+
+def iter_diverse_outfits(
+    outfits: List[Dict],
+    rng: Optional[random.Random] = None,
+    novelty_bonus: float = NOVELTY_BONUS,
+    reuse_penalty: float = REUSE_PENALTY
+) -> Iterator[Dict]:
+    """
+    Отдаёт образы по одному в порядке выбора, поощряя новые вещи
+    и штрафуя повторы. Каждый следующий образ считается только по запросу —
+    для потоковой выдачи (первый образ готов сразу).
+
+    Порядок кандидатов перемешивается (rng.shuffle), при равной
+    скорректированной оценке выигрывает образ, оказавшийся раньше —
+    как в прежнем select_diverse из generate_outfits.
+
+    Args:
+        outfits: Пул образов [{"items": [...], "scores": {"total": ...}}, ...]
+        rng: Источник случайности (по умолчанию модуль random)
+        novelty_bonus: Бонус за новую вещь
+        reuse_penalty: Штраф за повтор вещи
+
+    Yields:
+        Dict: Очередной выбранный образ (пока пул не исчерпан)
+    """
+    rng = rng or random
+    order = list(range(len(outfits)))
+    rng.shuffle(order)
+
+    totals = []
+    item_ids = []
+    # Индекс: вещь -> позиции образов (с кратностью)
+    outfits_by_item: Dict[int, List[int]] = {}
+    for pos, index in enumerate(order):
+        outfit = outfits[index]
+        ids = [item["id"] for item in outfit["items"]]
+        totals.append(outfit["scores"]["total"])
+        item_ids.append(ids)
+        for item_id in ids:
+            outfits_by_item.setdefault(item_id, []).append(pos)
+
+    novelty = [len(ids) for ids in item_ids]
+    reuse = [0] * len(order)
+    usage: Dict[int, int] = {}
+
+    def adjusted(pos):
+        return totals[pos] + (novelty[pos] * novelty_bonus) - (reuse[pos] * reuse_penalty)
+
+    # Куча: (-оценка, позиция, шаг, на котором оценка посчитана)
+    heap = [(-adjusted(pos), pos, 0) for pos in range(len(order))]
+    heapq.heapify(heap)
+
+    step = 0
+    while heap:
+        neg_score, pos, computed_at = heapq.heappop(heap)
+        if computed_at != step:
+            # Оценка устарела (могла только уменьшиться) — пересчитываем
+            heapq.heappush(heap, (-adjusted(pos), pos, step))
+            continue
+
+        yield outfits[order[pos]]
+        step += 1
+        for item_id in item_ids[pos]:
+            first_use = usage.get(item_id, 0) == 0
+            usage[item_id] = usage.get(item_id, 0) + 1
+            for other in outfits_by_item[item_id]:
+                reuse[other] += 1
+                if first_use:
+                    novelty[other] -= 1
+
+
+def select_diverse_outfits(
+    outfits: List[Dict],
+    count: int,
+    rng: Optional[random.Random] = None,
+    novelty_bonus: float = NOVELTY_BONUS,
+    reuse_penalty: float = REUSE_PENALTY
+) -> List[Dict]:
+    """
+    Выбирает count разнообразных образов (см. iter_diverse_outfits).
+
+    Returns:
+        List[Dict]: Выбранные образы в порядке выбора
+    """
+    if count <= 0:
+        return []
+    return list(islice(iter_diverse_outfits(outfits, rng, novelty_bonus, reuse_penalty), count))
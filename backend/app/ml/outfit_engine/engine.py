@@ -0,0 +1,228 @@
+# =============================================================================
+# OUTFIT ENGINE - Генерация образов без привязки к API и БД
+# =============================================================================
+# Чистые функции над списком вещей и их предвычисленными признаками
+# (app/services/item_features.py):
+# - group_items_by_slot() — фильтр по погоде и раскладка вещей по слотам
+# - build_outfit_pool()   — ранжированный пул кандидатов (детерминирован)
+# - generate_outfits()    — пул + случайный шаг разнообразия
+#
+# Ничего не знает о FastAPI/SQLAlchemy, поэтому его можно профилировать,
+# гонять в бенчмарках и запускать в пуле потоков/процессов.
+# =============================================================================
+
+import random
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from app.ml.outfit_scorer import (
+    SEASON_TRANSITIONAL,
+    SEASON_WINTER_READY,
+    filter_items_by_season_mask,
+    make_batch_scorer,
+)
+from app.ml.outfit_engine.generator import (
+    SLOT_ACCESSORY,
+    SLOT_BOTTOM,
+    SLOT_FULL,
+    SLOT_OUTER,
+    SLOT_SHOES,
+    SLOT_TOP,
+    get_pool_size,
+    iter_outfit_templates,
+)
+from app.ml.outfit_engine.search import search_top_outfits
+from app.ml.outfit_engine.diversity import select_diverse_outfits
+
+# Минимальный score «хорошего» образа
+GOOD_OUTFIT_SCORE = 0.5
+
+# Категории, которые не берём в тёплую погоду
+WARM_WEATHER_EXCLUDED = {"pullover", "coat"}
+
+
+class OutfitEngineError(ValueError):
+    """Из гардероба нельзя собрать образ (сообщение — для пользователя)."""
+
+
+class SlotGroups(NamedTuple):
+    """Вещи, разложенные по слотам генератора."""
+    tops: List[Dict]
+    bottoms: List[Dict]
+    fulls: List[Dict]
+    shoes: List[Dict]
+    accessories: List[Dict]
+    outerwear: List[Dict]
+    coat_candidates: List[Dict]
+    coat_candidates_cool: List[Dict]
+
+
+def group_items_by_slot(
+    items: Sequence[Dict],
+    features: Sequence[Dict[str, int]],
+    weather_category: str
+) -> SlotGroups:
+    """
+    Фильтрует вещи по погоде и раскладывает по слотам.
+
+    Args:
+        items: Вещи (словари с id и category)
+        features: Признаки вещей в том же порядке (category_slot, season_mask, ...)
+        weather_category: Категория погоды (cold, cool, warm, hot)
+
+    Raises:
+        OutfitEngineError: В тёплую погоду не осталось подходящих вещей
+    """
+    items = list(items)
+    features_by_id = {item["id"]: f for item, f in zip(items, features)}
+
+    def slot_of(item):
+        return features_by_id[item["id"]]["category_slot"]
+
+    def season_mask_of(item):
+        return features_by_id[item["id"]]["season_mask"]
+
+    # Фильтруем вещи по погоде/сезону (если нет подходящих — возвращает все)
+    filtered_items = filter_items_by_season_mask(
+        items, [f["season_mask"] for f in features], weather_category
+    )
+
+    if weather_category in ["warm", "hot"]:
+        warm_items = [i for i in filtered_items if i["category"] not in WARM_WEATHER_EXCLUDED]
+        if warm_items:
+            filtered_items = warm_items
+        else:
+            filtered_items = [i for i in items if i["category"] not in WARM_WEATHER_EXCLUDED]
+            if not filtered_items:
+                raise OutfitEngineError("not enoght items")
+
+    # Group items by slot
+    tops = [i for i in filtered_items if slot_of(i) == SLOT_TOP]
+    outerwear = [i for i in filtered_items if slot_of(i) == SLOT_OUTER]
+    bottoms = [i for i in filtered_items if slot_of(i) == SLOT_BOTTOM]
+    fulls = [i for i in filtered_items if slot_of(i) == SLOT_FULL]
+    shoes = [i for i in filtered_items if slot_of(i) == SLOT_SHOES]
+    accessories = [i for i in filtered_items if slot_of(i) == SLOT_ACCESSORY]
+
+    # Fallbacks if wardrobe is sparse
+    non_layer_slots = {SLOT_SHOES, SLOT_ACCESSORY, SLOT_FULL}
+    if not tops:
+        fallback_tops = [i for i in filtered_items if slot_of(i) not in (non_layer_slots | {SLOT_BOTTOM, SLOT_OUTER})]
+        tops = fallback_tops or [i for i in filtered_items if slot_of(i) not in (non_layer_slots | {SLOT_OUTER})]
+    if not bottoms:
+        fallback_bottoms = [i for i in filtered_items if slot_of(i) not in (non_layer_slots | {SLOT_TOP, SLOT_OUTER})]
+        bottoms = fallback_bottoms or [i for i in filtered_items if slot_of(i) not in non_layer_slots]
+
+    # Верхняя одежда: в холод — зимняя, в прохладу — демисезонная (если есть)
+    winter_coats = [c for c in outerwear if season_mask_of(c) & SEASON_WINTER_READY]
+    transitional_coats = [c for c in outerwear if season_mask_of(c) & SEASON_TRANSITIONAL]
+
+    return SlotGroups(
+        tops=tops,
+        bottoms=bottoms,
+        fulls=fulls,
+        shoes=shoes,
+        accessories=accessories,
+        outerwear=outerwear,
+        coat_candidates=winter_coats or outerwear,
+        coat_candidates_cool=transitional_coats or outerwear,
+    )
+
+
+def build_outfit_pool(
+    items: Sequence[Dict],
+    features: Sequence[Dict[str, int]],
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    count: int = 5,
+    search_mode: str = "auto",
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Ранжированный пул кандидатов для шага разнообразия.
+
+    Результат не зависит от случайности, поэтому его можно кэшировать.
+
+    Args:
+        items: Вещи пользователя (словари с id, category и полями для ответа)
+        features: Признаки вещей в том же порядке
+        occasion: Повод
+        weather_category: Категория погоды
+        count: Сколько образов будет выбрано из пула
+        search_mode: Способ поиска (см. search.search_top_outfits)
+        stats: Необязательный словарь для статистики поиска
+
+    Returns:
+        List[Dict]: [{"items": [...], "scores": {...}}, ...]
+
+    Raises:
+        OutfitEngineError: Вещей недостаточно для генерации
+    """
+    items = list(items)
+    features = list(features)
+
+    if len(items) < 2:
+        raise OutfitEngineError("Недостаточно вещей в гардеробе. Загрузите минимум 2 вещи.")
+
+    groups = group_items_by_slot(items, features, weather_category)
+
+    # Перебираем комбинации (с отсечениями для больших гардеробов)
+    # и держим в памяти только лучшие (top-K)
+    templates = list(iter_outfit_templates(
+        groups.tops, groups.bottoms, groups.fulls, groups.shoes, groups.accessories,
+        groups.outerwear, groups.coat_candidates, groups.coat_candidates_cool,
+        weather_category
+    ))
+    scored_outfits = search_top_outfits(
+        templates,
+        items,
+        occasion,
+        weather_category,
+        k=get_pool_size(count),
+        item_features=features,
+        mode=search_mode,
+        stats=stats
+    )
+
+    if not scored_outfits:
+        fallback_combo = items[:min(3, len(items))]
+        _, scores_at = make_batch_scorer(items, occasion, weather_category, features)([fallback_combo])
+        scored_outfits = [{"items": fallback_combo, "scores": scores_at(0)}]
+
+    # Фильтруем только хорошие образы
+    good_outfits = [o for o in scored_outfits if o["scores"]["total"] > GOOD_OUTFIT_SCORE]
+
+    # If there are no good outfits, fall back to the best ones
+    if not good_outfits:
+        good_outfits = scored_outfits[:max(count, 1)]
+
+    # Pick a wider pool for diversity when needed
+    def unique_item_count(outfits):
+        return len({item["id"] for outfit in outfits for item in outfit["items"]})
+
+    # Пул уже без повторов (одинаковый набор ID отбрасывается при отборе)
+    unique_outfits = good_outfits
+    if unique_item_count(unique_outfits) < unique_item_count(scored_outfits):
+        unique_outfits = scored_outfits
+    elif len(unique_outfits) < count * 2:
+        unique_outfits = scored_outfits
+
+    return unique_outfits
+
+
+def generate_outfits(
+    items: Sequence[Dict],
+    features: Sequence[Dict[str, int]],
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    count: int = 5,
+    search_mode: str = "auto",
+    rng: Optional[random.Random] = None
+) -> List[Dict]:
+    """
+    Полная генерация: пул кандидатов + выбор count разнообразных образов.
+
+    Аргументы — как у build_outfit_pool; rng — источник случайности
+    для шага разнообразия.
+    """
+    pool = build_outfit_pool(items, features, occasion, weather_category, count, search_mode)
+    return select_diverse_outfits(pool, count, rng=rng)
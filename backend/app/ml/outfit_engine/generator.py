@@ -0,0 +1,364 @@
+# =============================================================================
+# OUTFIT GENERATOR - Ленивый перебор комбинаций и отбор лучших (top-K)
+# =============================================================================
+# Раньше генератор строил полный список всех комбинаций
+# (верх × низ × верхняя одежда × обувь × аксессуары), оценивал каждую
+# и сортировал весь список. На гардеробе из нескольких сотен вещей это
+# миллионы Python-списков на один запрос.
+#
+# Теперь:
+# - iter_outfit_templates() — шаблоны перебора (уровни вложенных циклов)
+# - iter_outfit_candidates() — генератор, выдаёт комбинации по одной
+#   (в том же порядке, что и старый код)
+# - select_top_outfits() — оценивает комбинации на лету и хранит только
+#   K лучших в куче (heapq), память не зависит от размера гардероба
+# - поиск с отсечениями по тем же шаблонам — см. search.py
+# =============================================================================
+
+import heapq
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Минимальный размер пула кандидатов для шага разнообразия
+MIN_POOL_SIZE = 100
+
+# Сколько кандидатов держать на каждый запрошенный образ
+POOL_SIZE_PER_OUTFIT = 20
+
+
+# =============================================================================
+# СЛОТЫ ОБРАЗА
+# =============================================================================
+# Категория вещи -> слот генератора (хранится в признаках вещи)
+SLOT_TOP = 0
+SLOT_OUTER = 1
+SLOT_BOTTOM = 2
+SLOT_FULL = 3
+SLOT_SHOES = 4
+SLOT_ACCESSORY = 5
+SLOT_OTHER = 6
+
+CATEGORY_SLOTS = {
+    "t-shirt": SLOT_TOP, "shirt": SLOT_TOP, "pullover": SLOT_TOP,
+    "coat": SLOT_OUTER,
+    "trouser": SLOT_BOTTOM,
+    "dress": SLOT_FULL,
+    "sneaker": SLOT_SHOES, "sandal": SLOT_SHOES, "ankle-boot": SLOT_SHOES,
+    "bag": SLOT_ACCESSORY,
+}
+
+
+def category_slot(category: Optional[str]) -> int:
+    """Слот генератора для категории вещи."""
+    return CATEGORY_SLOTS.get(category, SLOT_OTHER)
+
+
+def get_pool_size(count: int) -> int:
+    """Размер пула лучших кандидатов для генерации count образов."""
+    return max(MIN_POOL_SIZE, count * POOL_SIZE_PER_OUTFIT)
+
+
+# =============================================================================
+# ШАБЛОНЫ ПЕРЕБОРА
+# =============================================================================
+# Шаблон = (уровни, раскладка):
+# - уровни перебираются вложенными циклами по порядку; уровень — это
+#   (варианты, distinct), вариант None означает «слот пропущен»,
+#   distinct=True — ID вещи не должен совпадать с другими distinct-уровнями
+# - раскладка — порядок уровней в итоговом списке вещей образа
+# Полный перебор (iter_outfit_candidates) и поиск с отсечениями
+# (search.py) обходят одни и те же шаблоны в одном порядке.
+OutfitLevel = Tuple[List[Optional[Dict]], bool]
+OutfitTemplate = Tuple[List[OutfitLevel], Tuple[int, ...]]
+
+
+def _tail_levels(shoes: List[Dict], accessories: List[Dict]) -> List[OutfitLevel]:
+    """Уровни обуви и аксессуаров (если они есть)."""
+    if shoes:
+        levels = [(shoes, False)]
+        if accessories:
+            levels.append((accessories, False))
+        return levels
+    # Без обуви: сначала образ как есть, затем с каждым аксессуаром
+    return [([None] + accessories, False)]
+
+
+def _template(
+    base_levels: List[OutfitLevel],
+    base_layout: Tuple[int, ...],
+    tail: List[OutfitLevel]
+) -> OutfitTemplate:
+    """Дополняет базовый шаблон уровнями обуви/аксессуаров."""
+    levels = base_levels + tail
+    layout = base_layout + tuple(range(len(base_levels), len(levels)))
+    return levels, layout
+
+
+def _template_has_combos(levels: List[OutfitLevel], depth: int = 0, used: frozenset = frozenset()) -> bool:
+    """Есть ли у шаблона хотя бы одна допустимая комбинация."""
+    if depth == len(levels):
+        return True
+    options, distinct = levels[depth]
+    for option in options:
+        if distinct and option is not None:
+            if option["id"] in used:
+                continue
+            if _template_has_combos(levels, depth + 1, used | {option["id"]}):
+                return True
+        elif _template_has_combos(levels, depth + 1, used):
+            return True
+    return False
+
+
+def iter_template_combos(levels: List[OutfitLevel], layout: Tuple[int, ...]) -> Iterator[List[Dict]]:
+    """Перебирает все комбинации шаблона в порядке вложенных циклов."""
+    chosen = [None] * len(levels)
+
+    def visit(depth, used):
+        if depth == len(levels):
+            yield [chosen[p] for p in layout if chosen[p] is not None]
+            return
+        options, distinct = levels[depth]
+        for option in options:
+            if distinct and option is not None:
+                if option["id"] in used:
+                    continue
+                chosen[depth] = option
+                yield from visit(depth + 1, used | {option["id"]})
+            else:
+                chosen[depth] = option
+                yield from visit(depth + 1, used)
+
+    yield from visit(0, frozenset())
+
+
+def iter_outfit_templates(
+    tops: List[Dict],
+    bottoms: List[Dict],
+    fulls: List[Dict],
+    shoes: List[Dict],
+    accessories: List[Dict],
+    outerwear: List[Dict],
+    coat_candidates: List[Dict],
+    coat_candidates_cool: List[Dict],
+    weather_category: str
+) -> Iterator[OutfitTemplate]:
+    """
+    Шаблоны перебора по слотам (правила — см. iter_outfit_candidates).
+
+    Yields:
+        OutfitTemplate: (уровни, раскладка)
+    """
+    tail = _tail_levels(shoes, accessories)
+    weather_is_cold = weather_category == "cold"
+    shirts = [i for i in tops if i["category"] == "shirt"]
+
+    # Холод: верхняя одежда обязательна (если есть), плюс верх + низ
+    if weather_is_cold:
+        coat_variants = coat_candidates if coat_candidates else [None]
+        pullovers = [i for i in tops if i["category"] == "pullover"]
+
+        cold_templates = [
+            _template([(bottoms, True), (tops, True), (coat_variants, False)], (2, 1, 0), tail)
+        ]
+        if shirts and pullovers:
+            cold_templates.append(_template(
+                [(bottoms, True), (shirts, True), (pullovers, True), (coat_variants, False)],
+                (3, 1, 2, 0), tail
+            ))
+
+        yield from cold_templates
+
+        # Платья в холод — только если ничего другого не нашлось
+        if any(_template_has_combos(levels) for levels, _ in cold_templates):
+            return
+
+    # Не холодно: верх + низ, верхняя одежда опциональна
+    else:
+        coat_variants = coat_candidates_cool if weather_category == "cool" else outerwear
+        yield _template(
+            [(tops, True), (bottoms, True), ([None] + coat_variants, False)], (2, 0, 1), tail
+        )
+
+    # Платья: отдельно или с рубашкой/верхней одеждой
+    coat_variants = coat_candidates_cool if weather_category == "cool" else outerwear
+    layered = weather_category not in ["warm", "hot"]
+    for dress in fulls:
+        dress_level = ([dress], False)
+        yield _template([dress_level], (0,), tail)
+        if layered:
+            yield _template([dress_level, (shirts, False)], (0, 1), tail)
+        yield _template([dress_level, (coat_variants, False)], (0, 1), tail)
+        if layered:
+            yield _template([dress_level, (shirts, False), (coat_variants, False)], (0, 1, 2), tail)
+
+
+def iter_outfit_candidates(
+    tops: List[Dict],
+    bottoms: List[Dict],
+    fulls: List[Dict],
+    shoes: List[Dict],
+    accessories: List[Dict],
+    outerwear: List[Dict],
+    coat_candidates: List[Dict],
+    coat_candidates_cool: List[Dict],
+    weather_category: str
+) -> Iterator[List[Dict]]:
+    """
+    Лениво перебирает комбинации вещей по слотам.
+
+    Правила те же, что и раньше:
+    - cold: верхняя одежда обязательна (если есть) + верх + низ,
+      плюс вариант рубашка + свитер + низ
+    - cool/warm/hot: верх + низ, верхняя одежда опциональна
+    - платья: в холод только если других комбинаций нет
+
+    Args:
+        tops, bottoms, fulls, shoes, accessories, outerwear: Вещи по слотам
+        coat_candidates: Верхняя одежда для холода (зимняя или любая)
+        coat_candidates_cool: Верхняя одежда для прохлады (демисезонная или любая)
+        weather_category: Категория погоды (cold, cool, warm, hot)
+
+    Yields:
+        List[Dict]: Очередная комбинация вещей
+    """
+    for levels, layout in iter_outfit_templates(
+        tops, bottoms, fulls, shoes, accessories,
+        outerwear, coat_candidates, coat_candidates_cool,
+        weather_category
+    ):
+        yield from iter_template_combos(levels, layout)
+
+
+class _TopOutfits:
+    """
+    Мин-куча K лучших образов без повторов.
+
+    Ранг = (score, -seq): при равном score выигрывает комбинация,
+    сгенерированная раньше — как при стабильной сортировке полного списка.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+        self.in_heap = set()
+
+    def contains(self, combo_ids: tuple) -> bool:
+        return combo_ids in self.in_heap
+
+    def push(self, total: float, seq: int, combo_ids: tuple, payload) -> None:
+        rank = (total, -seq)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (rank, combo_ids, payload))
+            self.in_heap.add(combo_ids)
+        elif rank > self.heap[0][0]:
+            _, evicted_ids, _ = heapq.heapreplace(self.heap, (rank, combo_ids, payload))
+            self.in_heap.discard(evicted_ids)
+            self.in_heap.add(combo_ids)
+
+    def threshold(self) -> Optional[float]:
+        """total худшего образа в пуле, если пул заполнен (иначе None)."""
+        return self.heap[0][0][0] if len(self.heap) >= self.k else None
+
+    def payloads(self) -> list:
+        """Содержимое кучи от лучшего к худшему."""
+        return [entry[2] for entry in sorted(self.heap, reverse=True)]
+
+
+def select_top_outfits(
+    candidates: Iterable[List[Dict]],
+    score_fn: Callable[[List[Dict]], Dict],
+    k: int,
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Оценивает комбинации по мере поступления и оставляет K лучших.
+
+    Порядок результата совпадает со стабильной сортировкой полного
+    списка по убыванию score: при равном score выигрывает комбинация,
+    сгенерированная раньше. Повторы (тот же набор ID вещей) отбрасываются.
+
+    Args:
+        candidates: Итератор комбинаций (например, iter_outfit_candidates)
+        score_fn: Функция оценки комбинации (score_outfit)
+        k: Сколько лучших образов хранить
+        stats: Необязательный словарь, куда пишется число оценённых комбинаций
+
+    Returns:
+        List[Dict]: [{"items": [...], "scores": {...}}, ...] от лучшего к худшему
+    """
+    top = _TopOutfits(k)
+    evaluated = 0
+
+    for seq, combo in enumerate(candidates):
+        combo_ids = tuple(sorted(item["id"] for item in combo))
+        if top.contains(combo_ids):
+            continue
+
+        scores = score_fn(combo)
+        evaluated += 1
+        top.push(scores["total"], seq, combo_ids, {"items": combo, "scores": scores})
+
+    if stats is not None:
+        stats["evaluated"] = evaluated
+
+    return top.payloads()
+
+
+# Размер батча для пакетной оценки (NumPy)
+SCORE_CHUNK_SIZE = 4096
+
+
+def select_top_outfits_batched(
+    candidates: Iterable[List[Dict]],
+    score_batch_fn: Callable,
+    k: int,
+    chunk_size: int = SCORE_CHUNK_SIZE,
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    То же, что select_top_outfits, но комбинации оцениваются батчами.
+
+    Args:
+        candidates: Итератор комбинаций
+        score_batch_fn: Функция батча (outfit_scorer.make_batch_scorer):
+                        combos -> (totals, scores_at(row))
+        k: Сколько лучших образов хранить
+        chunk_size: Сколько комбинаций оценивать за один проход
+        stats: Необязательный словарь для числа оценённых комбинаций
+
+    Returns:
+        List[Dict]: [{"items": [...], "scores": {...}}, ...] от лучшего к худшему
+    """
+    top = _TopOutfits(k)
+    evaluated = 0
+    chunk = []
+    chunk_start = 0
+
+    def flush():
+        nonlocal evaluated
+        totals, scores_at = score_batch_fn(chunk)
+        evaluated += len(chunk)
+        for row, (combo, total) in enumerate(zip(chunk, totals)):
+            combo_ids = tuple(sorted(item["id"] for item in combo))
+            if not top.contains(combo_ids):
+                # Полный словарь оценок собираем только для попавших в пул
+                top.push(total, chunk_start + row, combo_ids, (combo, scores_at, row))
+
+    for seq, combo in enumerate(candidates):
+        if not chunk:
+            chunk_start = seq
+        chunk.append(combo)
+        if len(chunk) >= chunk_size:
+            flush()
+            chunk = []
+
+    if chunk:
+        flush()
+
+    if stats is not None:
+        stats["evaluated"] = evaluated
+
+    return [
+        {"items": combo, "scores": scores_at(row)}
+        for combo, scores_at, row in top.payloads()
+    ]
@@ -0,0 +1,428 @@
+# =============================================================================
+# OUTFIT SEARCH - Поиск лучших образов с отсечениями (branch-and-bound)
+# =============================================================================
+# score_outfit — взвешенная сумма средних по парам (цвет, стиль) и среднего
+# по вещам (погода). Для частично собранного образа можно оценить сверху,
+# какой score он может получить после добавления оставшихся вещей.
+# Если даже эта оценка не больше score K-го образа в пуле — всё поддерево
+# комбинаций пропускается.
+#
+# Обход идёт по тем же шаблонам и в том же порядке, что и полный перебор
+# (generator.iter_outfit_templates), поэтому результат совпадает
+# с select_top_outfits / select_top_outfits_batched.
+# =============================================================================
+
+from itertools import chain
+from math import prod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.ml.outfit_engine.generator import (
+    OutfitTemplate,
+    _TopOutfits,
+    iter_template_combos,
+    select_top_outfits_batched,
+)
+from app.ml.outfit_scorer import (
+    COLOR_MATRIX,
+    STYLE_MATRIX,
+    WEIGHT_COLOR,
+    WEIGHT_STYLE,
+    WEIGHT_WEATHER,
+    encode_item_features,
+    make_batch_scorer,
+    occasion_bit,
+    stack_item_features,
+    weather_fit_vector,
+)
+
+# Бонус стиля за вещь, подходящую поводу (как в score_outfit)
+OCCASION_BONUS = 0.05
+
+# Запас на погрешность float при сравнении оценок
+BOUND_EPSILON = 1e-6
+
+# Размер батча точной оценки: порог пула обновляется после каждого батча,
+# поэтому здесь он меньше, чем при полном переборе
+BNB_CHUNK_SIZE = 128
+
+# Режим "auto": до этого числа комбинаций полный перебор быстрее
+EXHAUSTIVE_MAX_COMBOS = 30000
+
+# Режимы поиска
+SEARCH_MODES = ("auto", "exhaustive", "branch_and_bound")
+
+# Максимально возможный total: если пул уже заполнен образами с таким
+# score, дальше искать нечего
+MAX_TOTAL = round(WEIGHT_COLOR + WEIGHT_STYLE + WEIGHT_WEATHER, 2)
+
+
+def _can_beat(bounds: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Может ли образ с total <= bounds попасть в заполненный пул.
+
+    В пул проходит только round(total, 2) > threshold, т.е.
+    total >= threshold + 0.005 (с запасом на погрешность float).
+    """
+    return bounds + BOUND_EPSILON >= threshold + 0.005
+
+
+class _Level:
+    """Уровень шаблона: признаки вариантов и сводка для верхней оценки."""
+
+    def __init__(self, options, distinct, position, color, style, occasion, fit):
+        self.options = options
+        self.distinct = distinct
+        self.optional = any(option is None for option in options)
+
+        idx = np.array(
+            [-1 if option is None else position[option["id"]] for option in options],
+            dtype=np.int64
+        )
+        present = idx >= 0
+        safe_idx = np.where(present, idx, 0)
+
+        # Признаки вариантов (None -> нет вещи)
+        self.present = present
+        self.color = np.where(present, color[safe_idx], -1)
+        self.style = np.where(present, style[safe_idx], -1)
+        self.occasion = np.where(present, occasion[safe_idx], 0)
+        self.fit = np.where(present, fit[safe_idx], 0.0)
+
+        # Какие коды может добавить уровень и обязательно ли добавит
+        colors = self.color[present]
+        styles = self.style[present]
+        self.colors = sorted(set(colors[colors >= 0].tolist()))
+        self.styles = sorted(set(styles[styles >= 0].tolist()))
+        self.color_required = bool(len(colors)) and not self.optional and bool((colors >= 0).all())
+        self.style_required = bool(len(styles)) and not self.optional and bool((styles >= 0).all())
+        self.occasion_max = int(self.occasion.max()) if len(options) else 0
+        self.fit_max = float(self.fit[present].max()) if present.any() else None
+
+
+class _Rest:
+    """Сводка по уровням, которые ещё предстоит выбрать (levels[depth:])."""
+
+    def __init__(self, levels: Sequence[_Level]):
+        self.color_sets = [(level.colors, level.color_required) for level in levels if level.colors]
+        self.style_sets = [(level.styles, level.style_required) for level in levels if level.styles]
+        self.color_cross = self._cross_max([codes for codes, _ in self.color_sets], COLOR_MATRIX)
+        self.style_cross = self._cross_max([codes for codes, _ in self.style_sets], STYLE_MATRIX)
+        self.occasion_max = sum(level.occasion_max for level in levels)
+
+        # Погода: обязательные уровни добавят свой максимум, необязательные —
+        # в порядке убывания (берём лучший префикс)
+        self.fit_required = sum(level.fit_max for level in levels if level.fit_max is not None and not level.optional)
+        self.fit_required_count = sum(1 for level in levels if level.fit_max is not None and not level.optional)
+        optional = sorted(
+            (level.fit_max for level in levels if level.fit_max is not None and level.optional),
+            reverse=True
+        )
+        self.fit_optional_prefix = np.cumsum([0.0] + optional)
+
+    @staticmethod
+    def _cross_max(code_sets: List[List[int]], matrix: np.ndarray) -> float:
+        """Максимум matrix по парам кодов из разных уровней."""
+        best = 0.0
+        for i, codes_a in enumerate(code_sets):
+            for codes_b in code_sets[i + 1:]:
+                best = max(best, float(matrix[np.ix_(codes_a, codes_b)].max()))
+        return best
+
+
+def _pair_mean_bounds(
+    codes: np.ndarray,
+    acc: np.ndarray,
+    total: float,
+    count: int,
+    matrix: np.ndarray,
+    rest_sets: List[Tuple[List[int], bool]],
+    cross_max: float
+) -> np.ndarray:
+    """
+    Верхняя оценка среднего по парам для каждого варианта уровня.
+
+    Args:
+        codes: Коды вариантов текущего уровня (-1 = не участвует в парах)
+        acc: acc[c] = сумма matrix[c, f] по уже выбранным вещам f
+        total: Сумма по парам уже выбранных вещей
+        count: Сколько выбранных вещей участвуют в парах
+        matrix: Матрица совместимости
+        rest_sets: (коды, обязателен) для оставшихся уровней
+        cross_max: Максимум пары между вещами разных оставшихся уровней
+    """
+    has = codes >= 0
+    safe = np.maximum(codes, 0)
+    total = total + np.where(has, acc[safe], 0.0)
+    count = count + has
+    child_acc = acc[None, :] + np.where(has[:, None], matrix[safe], 0.0)
+
+    # Каждая новая вещь даёт не больше max(acc) пар с выбранными
+    # и не больше cross_max на каждую пару с другими новыми вещами
+    required_gain = np.zeros(len(codes))
+    required = 0
+    optional_gains = []
+    for level_codes, level_required in rest_sets:
+        gain = child_acc[:, level_codes].max(axis=1)
+        if level_required:
+            required_gain = required_gain + gain
+            required += 1
+        else:
+            optional_gains.append(gain)
+
+    def mean_bound(new, added):
+        new_pairs = new * (new - 1) // 2
+        pairs = count * (count - 1) // 2 + new * count + new_pairs
+        return np.where(pairs > 0, (total + added + new_pairs * cross_max) / np.maximum(pairs, 1), 1.0)
+
+    best = mean_bound(required, required_gain)
+    if optional_gains:
+        optional = -np.sort(-np.stack(optional_gains, axis=1), axis=1)
+        added = required_gain
+        for extra in range(optional.shape[1]):
+            added = added + optional[:, extra]
+            best = np.maximum(best, mean_bound(required + extra + 1, added))
+    return best
+
+
+def select_top_outfits_bnb(
+    templates: Sequence[OutfitTemplate],
+    items: List[Dict],
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    k: int = 100,
+    item_features: Optional[Sequence[Dict[str, int]]] = None,
+    chunk_size: int = BNB_CHUNK_SIZE,
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    K лучших образов с отсечением заведомо слабых поддеревьев перебора.
+
+    Результат совпадает с полным перебором
+    (select_top_outfits_batched(iter_outfit_candidates(...))): обход идёт
+    в том же порядке, а отсекаются только комбинации, которые не могли
+    бы попасть в пул.
+
+    Args:
+        templates: Шаблоны перебора (generator.iter_outfit_templates)
+        items: Все вещи, которые могут встретиться в шаблонах
+        occasion: Повод
+        weather_category: Категория погоды
+        k: Сколько лучших образов хранить
+        item_features: Признаки вещей (как в make_batch_scorer)
+        chunk_size: Размер батча для точной оценки
+        stats: Необязательный словарь: evaluated — сколько комбинаций оценено
+               точно, pruned — сколько вариантов отсечено по оценке сверху
+
+    Returns:
+        List[Dict]: [{"items": [...], "scores": {...}}, ...] от лучшего к худшему
+    """
+    if item_features is None:
+        item_features = [encode_item_features(item) for item in items]
+    score_batch = make_batch_scorer(items, occasion, weather_category, item_features)
+
+    features = stack_item_features(item_features)
+    position = {item["id"]: i for i, item in enumerate(items)}
+    item_color = features["color_idx"]
+    item_style = features["style_idx"]
+    item_occasion = ((features["occasion_mask"] & occasion_bit(occasion)) != 0).astype(np.int64)
+    item_fit = weather_fit_vector(features["season_mask"], weather_category)
+
+    top = _TopOutfits(k)
+    pending = []
+    counters = {"evaluated": 0, "pruned": 0, "seq": 0}
+    level_cache = {}
+
+    def summarize(level):
+        options, distinct = level
+        key = (id(options), distinct)
+        if key not in level_cache:
+            # options храним, чтобы id() не переиспользовался
+            level_cache[key] = (
+                _Level(options, distinct, position, item_color, item_style, item_occasion, item_fit),
+                options
+            )
+        return level_cache[key][0]
+
+    def flush():
+        # Точная оценка и добавление в пул строго в порядке обхода
+        totals, scores_at = score_batch(pending)
+        counters["evaluated"] += len(pending)
+        for row, (combo, total) in enumerate(zip(pending, totals)):
+            counters["seq"] += 1
+            combo_ids = tuple(sorted(item["id"] for item in combo))
+            if not top.contains(combo_ids):
+                top.push(total, counters["seq"], combo_ids, (combo, scores_at, row))
+        pending.clear()
+
+    def add_pending(combo):
+        pending.append(combo)
+        # Пока пул не заполнен, сбрасываем чаще — раньше появится порог
+        limit = chunk_size if top.threshold() is not None else max(k - len(top.heap), 1)
+        if len(pending) >= limit:
+            flush()
+
+    def saturated():
+        threshold = top.threshold()
+        return threshold is not None and threshold >= MAX_TOTAL
+
+    def search(levels, layout):
+        level_stats = [summarize(level) for level in levels]
+        rest = [_Rest(level_stats[depth:]) for depth in range(len(levels) + 1)]
+        last = len(levels) - 1
+        chosen = [None] * len(levels)
+
+        def option_bounds(depth, state):
+            # Оценка сверху для каждого варианта уровня depth
+            color_acc, color_sum, color_count, style_acc, style_sum, style_count, bonus, fit_sum, fit_count = state
+            level = level_stats[depth]
+            after = rest[depth + 1]
+
+            color_ub = _pair_mean_bounds(
+                level.color, color_acc, color_sum, color_count,
+                COLOR_MATRIX, after.color_sets, after.color_cross
+            )
+            style_ub = _pair_mean_bounds(
+                level.style, style_acc, style_sum, style_count,
+                STYLE_MATRIX, after.style_sets, after.style_cross
+            )
+            style_ub = np.minimum(1.0, style_ub + (bonus + level.occasion + after.occasion_max) * OCCASION_BONUS)
+
+            fit_total = fit_sum + level.fit + after.fit_required
+            fit_n = fit_count + level.present + after.fit_required_count
+            weather_ub = None
+            for extra, added in enumerate(after.fit_optional_prefix):
+                n = fit_n + extra
+                value = np.where(n > 0, (fit_total + added) / np.maximum(n, 1), 0.7)
+                weather_ub = value if weather_ub is None else np.maximum(weather_ub, value)
+
+            return color_ub * WEIGHT_COLOR + style_ub * WEIGHT_STYLE + weather_ub * WEIGHT_WEATHER
+
+        def visit(depth, state, used):
+            level = level_stats[depth]
+            bounds = option_bounds(depth, state)
+
+            threshold = top.threshold()
+            if threshold is None:
+                rows = range(len(level.options))
+            else:
+                rows = np.flatnonzero(_can_beat(bounds, threshold)).tolist()
+                counters["pruned"] += len(level.options) - len(rows)
+
+            color_acc, color_sum, color_count, style_acc, style_sum, style_count, bonus, fit_sum, fit_count = state
+            for row in rows:
+                # Порог мог вырасти, пока обходили предыдущие варианты
+                threshold = top.threshold()
+                if threshold is not None and (threshold >= MAX_TOTAL or not _can_beat(bounds[row], threshold)):
+                    counters["pruned"] += 1
+                    continue
+
+                option = level.options[row]
+                next_used = used
+                if level.distinct and option is not None:
+                    if option["id"] in used:
+                        continue
+                    next_used = used | {option["id"]}
+                chosen[depth] = option
+
+                if depth == last:
+                    add_pending([chosen[p] for p in layout if chosen[p] is not None])
+                    continue
+                if option is None:
+                    visit(depth + 1, state, next_used)
+                    continue
+
+                color = int(level.color[row])
+                style = int(level.style[row])
+                next_state = (
+                    color_acc + COLOR_MATRIX[color] if color >= 0 else color_acc,
+                    color_sum + color_acc[color] if color >= 0 else color_sum,
+                    color_count + (color >= 0),
+                    style_acc + STYLE_MATRIX[style] if style >= 0 else style_acc,
+                    style_sum + style_acc[style] if style >= 0 else style_sum,
+                    style_count + (style >= 0),
+                    bonus + int(level.occasion[row]),
+                    fit_sum + float(level.fit[row]),
+                    fit_count + 1,
+                )
+                visit(depth + 1, next_state, next_used)
+
+        if levels:
+            empty_state = (
+                np.zeros(len(COLOR_MATRIX)), 0.0, 0,
+                np.zeros(len(STYLE_MATRIX)), 0.0, 0,
+                0, 0.0, 0,
+            )
+            visit(0, empty_state, frozenset())
+
+    for levels, layout in templates:
+        if saturated():
+            break
+        search(levels, layout)
+
+    if pending:
+        flush()
+
+    if stats is not None:
+        stats["evaluated"] = counters["evaluated"]
+        stats["pruned"] = counters["pruned"]
+
+    return [
+        {"items": combo, "scores": scores_at(row)}
+        for combo, scores_at, row in top.payloads()
+    ]
+
+
+def estimate_combos(templates: Sequence[OutfitTemplate]) -> int:
+    """Число комбинаций в шаблонах (сверху, без учёта повторов ID)."""
+    return sum(prod(len(options) for options, _ in levels) for levels, _ in templates)
+
+
+def search_top_outfits(
+    templates: Sequence[OutfitTemplate],
+    items: List[Dict],
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    k: int = 100,
+    item_features: Optional[Sequence[Dict[str, int]]] = None,
+    mode: str = "auto",
+    stats: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    K лучших образов выбранным способом поиска.
+
+    Args:
+        mode: "exhaustive" — полный перебор с пакетной оценкой,
+              "branch_and_bound" — перебор с отсечениями,
+              "auto" — полный перебор для небольших гардеробов
+              (до EXHAUSTIVE_MAX_COMBOS комбинаций), иначе с отсечениями
+        stats: Необязательный словарь: mode — какой способ использован,
+               evaluated — сколько комбинаций оценено
+
+    Остальные аргументы — как у select_top_outfits_bnb. Результат во всех
+    режимах одинаковый.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown outfit search mode: {mode}")
+    if mode == "auto":
+        mode = "exhaustive" if estimate_combos(templates) <= EXHAUSTIVE_MAX_COMBOS else "branch_and_bound"
+
+    if stats is not None:
+        stats["mode"] = mode
+
+    if mode == "exhaustive":
+        candidates = chain.from_iterable(
+            iter_template_combos(levels, layout) for levels, layout in templates
+        )
+        return select_top_outfits_batched(
+            candidates,
+            make_batch_scorer(items, occasion, weather_category, item_features),
+            k=k,
+            stats=stats
+        )
+
+    return select_top_outfits_bnb(
+        templates, items, occasion, weather_category, k,
+        item_features=item_features, stats=stats
+    )
@@ -7,13 +7,23 @@
 # - Соответствие погоде/сезону (20%)
 # =============================================================================
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Sequence, Tuple
 import json
 
-from app.ml.color_harmony import calculate_outfit_color_harmony
+import numpy as np
+
+from app.ml.color_harmony import (
+    calculate_outfit_color_harmony,
+    get_color_harmony,
+    COLOR_COMPATIBILITY
+)
 from app.ml.style_matcher import (
     calculate_outfit_style_compatibility,
-    get_styles_for_occasion
+    get_styles_for_occasion,
+    get_style_compatibility,
+    normalize_style,
+    STYLE_COMPATIBILITY,
+    OCCASION_STYLES
 )
 
 # =============================================================================
@@ -243,3 +253,271 @@ def filter_items_by_weather(
         return items
     
     return filtered
+
+
+# =============================================================================
+# ПАКЕТНАЯ ОЦЕНКА (NumPy) — горячий цикл генератора
+# =============================================================================
+# score_outfit() на каждую комбинацию заново парсит JSON и ходит по словарям.
+# Здесь вещи один раз кодируются в целочисленные признаки, таблицы
+# совместимости — в плотные матрицы, а весь батч комбинаций (N × слоты)
+# оценивается за один проход. Результаты совпадают с score_outfit():
+# суммы накапливаются в том же порядке, что и в Python-коде.
+
+# Словарь цветов: известные цвета + "другой" (любой цвет не из матрицы)
+COLOR_VOCAB = list(COLOR_COMPATIBILITY.keys()) + ["__other__"]
+COLOR_TO_INDEX = {name: i for i, name in enumerate(COLOR_VOCAB)}
+OTHER_COLOR_INDEX = COLOR_TO_INDEX["__other__"]
+
+# Словарь стилей (normalize_style всегда возвращает один из них)
+STYLE_VOCAB = list(STYLE_COMPATIBILITY.keys())
+STYLE_TO_INDEX = {name: i for i, name in enumerate(STYLE_VOCAB)}
+
+# Поводы: известные + "*" для неизвестного повода (get_styles_for_occasion -> ["casual"])
+OCCASION_VOCAB = list(OCCASION_STYLES.keys()) + ["*"]
+
+# Битовая маска сезонов
+SEASON_BITS = {"winter": 1, "spring": 2, "summer": 4, "autumn": 8}
+SEASON_ALL = 16         # "all" / "всесезонный"
+SEASON_DECLARED = 32    # У вещи указан хотя бы один сезон
+SEASON_WINTER_READY = 64    # Зимняя/всесезонная вещь (для верхней одежды в холод)
+SEASON_TRANSITIONAL = 128   # Демисезонная вещь (для верхней одежды в прохладу)
+
+# Подстроки сезонов, по которым вещь считается демисезонной
+TRANSITIONAL_MARKERS = ("spring", "autumn", "fall", "весна", "осень", "all", "демисезон")
+
+MISSING_INDEX = -1      # Нет цвета / стиля
+
+# Плотные матрицы совместимости, построенные теми же функциями, что и в score_outfit
+COLOR_MATRIX = np.array(
+    [[get_color_harmony(a, b) for b in COLOR_VOCAB] for a in COLOR_VOCAB],
+    dtype=np.float64
+)
+STYLE_MATRIX = np.array(
+    [[get_style_compatibility(a, b) for b in STYLE_VOCAB] for a in STYLE_VOCAB],
+    dtype=np.float64
+)
+
+
+def occasion_bit(occasion: str) -> int:
+    """Бит повода в occasion_mask (неизвестный повод -> "*")."""
+    key = occasion if occasion in OCCASION_STYLES else "*"
+    return 1 << OCCASION_VOCAB.index(key)
+
+
+def encode_item_features(item: Dict) -> Dict[str, int]:
+    """
+    Кодирует вещь в компактные целочисленные признаки для пакетной оценки.
+
+    Returns:
+        {
+            "color_idx": индекс основного цвета в COLOR_VOCAB (-1 если нет),
+            "style_idx": индекс нормализованного стиля в STYLE_VOCAB (-1 если нет),
+            "season_mask": битовая маска сезонов (SEASON_*),
+            "occasion_mask": бит i = стиль вещи подходит поводу OCCASION_VOCAB[i]
+        }
+    """
+    colors = parse_json_field(item.get("color", []))
+    color = colors[0] if colors else None
+    if color:
+        color_idx = COLOR_TO_INDEX.get(color.lower(), OTHER_COLOR_INDEX)
+    else:
+        color_idx = MISSING_INDEX
+
+    styles = parse_json_field(item.get("style", []))
+    style_idx = STYLE_TO_INDEX[normalize_style(styles[0])] if styles else MISSING_INDEX
+
+    occasion_mask = 0
+    lowered_styles = [style.lower() for style in styles]
+    for bit, occasion in enumerate(OCCASION_VOCAB):
+        target_styles = get_styles_for_occasion(occasion)
+        if any(style in target_styles for style in lowered_styles):
+            occasion_mask |= 1 << bit
+
+    seasons = {s.lower() for s in parse_json_field(item.get("season", []))}
+    season_mask = SEASON_DECLARED if seasons else 0
+    if "all" in seasons or "всесезонный" in seasons:
+        season_mask |= SEASON_ALL
+    for season, bit in SEASON_BITS.items():
+        if season in seasons:
+            season_mask |= bit
+    if seasons & {"winter", "зима", "all", "всесезонный"}:
+        season_mask |= SEASON_WINTER_READY
+    if any(marker in value for value in seasons for marker in TRANSITIONAL_MARKERS):
+        season_mask |= SEASON_TRANSITIONAL
+
+    return {
+        "color_idx": color_idx,
+        "style_idx": style_idx,
+        "season_mask": season_mask,
+        "occasion_mask": occasion_mask,
+    }
+
+
+def stack_item_features(features: Sequence[Dict[str, int]]) -> Dict[str, np.ndarray]:
+    """Собирает признаки вещей в массивы (по одному элементу на вещь)."""
+    return {
+        key: np.array([f[key] for f in features], dtype=np.int64)
+        for key in ("color_idx", "style_idx", "season_mask", "occasion_mask")
+    }
+
+
+def weather_fit_vector(season_mask: np.ndarray, weather_category: str) -> np.ndarray:
+    """Векторная версия calculate_weather_compatibility по маскам сезонов."""
+    suitable = WEATHER_TO_SEASONS.get(weather_category, ["spring", "summer"])
+    suitable_mask = 0
+    for season in suitable:
+        suitable_mask |= SEASON_BITS[season]
+
+    # Значения для 0..4 совпадений считаем так же, как в Python-версии
+    by_matches = np.array(
+        [0.3] + [0.9 + (n / len(suitable)) * 0.1 for n in range(1, 5)],
+        dtype=np.float64
+    )
+    matched = np.asarray(season_mask, dtype=np.int64) & suitable_mask
+    matches = sum((matched >> b) & 1 for b in range(4))
+
+    fit = by_matches[matches]
+    fit = np.where(season_mask & SEASON_ALL, 1.0, fit)
+    return np.where(season_mask & SEASON_DECLARED, fit, 0.7)
+
+
+def filter_items_by_season_mask(
+    items: List[Dict],
+    season_masks: Sequence[int],
+    weather_category: str,
+    min_score: float = 0.4
+) -> List[Dict]:
+    """
+    То же, что filter_items_by_weather, но по готовым маскам сезонов
+    (без разбора JSON).
+    """
+    fit = weather_fit_vector(np.array(season_masks, dtype=np.int64), weather_category)
+    filtered = [item for item, score in zip(items, fit.tolist()) if score >= min_score]
+    return filtered or items
+
+
+def _pairwise_mean(codes: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Среднее по всем парам (i < j) заданных кодов; меньше 2 кодов -> 1.0."""
+    n_slots = codes.shape[1]
+    total = np.zeros(codes.shape[0], dtype=np.float64)
+    pairs = np.zeros(codes.shape[0], dtype=np.int64)
+    # Пары перебираются в том же порядке, что и в calculate_outfit_*
+    for i in range(n_slots):
+        a = codes[:, i]
+        for j in range(i + 1, n_slots):
+            b = codes[:, j]
+            valid = (a >= 0) & (b >= 0)
+            total = total + np.where(valid, matrix[a, b], 0.0)
+            pairs = pairs + valid
+    return np.where(pairs > 0, total / np.maximum(pairs, 1), 1.0)
+
+
+def score_outfits_batch(
+    features: Dict[str, np.ndarray],
+    outfit_idx: np.ndarray,
+    occasion: str = "casual",
+    weather_category: str = "warm"
+) -> Dict[str, np.ndarray]:
+    """
+    Оценивает батч образов за один проход NumPy.
+
+    Args:
+        features: Признаки вещей (stack_item_features)
+        outfit_idx: Массив (N_образов × слоты) индексов вещей, -1 = пустой слот
+                    (пустые слоты должны идти в конце строки)
+        occasion: Повод
+        weather_category: Категория погоды
+
+    Returns:
+        Dict массивов длины N: total (округлённый, как в score_outfit),
+        total_raw, color, style, weather (неокруглённые)
+    """
+    outfit_idx = np.asarray(outfit_idx, dtype=np.int64)
+    n_outfits = outfit_idx.shape[0]
+
+    present = outfit_idx >= 0
+    safe_idx = np.where(present, outfit_idx, 0)
+
+    colors = np.where(present, features["color_idx"][safe_idx], MISSING_INDEX)
+    styles = np.where(present, features["style_idx"][safe_idx], MISSING_INDEX)
+
+    # 1. Цветовая гармония
+    color_score = _pairwise_mean(colors, COLOR_MATRIX)
+
+    # 2. Стиль + бонус за соответствие поводу (+0.05 за каждую вещь)
+    style_score = _pairwise_mean(styles, STYLE_MATRIX)
+    matches = present & ((features["occasion_mask"][safe_idx] & occasion_bit(occasion)) != 0)
+    occasion_bonus = np.zeros(n_outfits, dtype=np.float64)
+    for slot in range(outfit_idx.shape[1]):
+        occasion_bonus = occasion_bonus + np.where(matches[:, slot], 0.05, 0.0)
+    style_score = np.minimum(1.0, style_score + occasion_bonus)
+
+    # 3. Погода: среднее по вещам образа
+    item_fit = weather_fit_vector(features["season_mask"], weather_category)
+    weather_sum = np.zeros(n_outfits, dtype=np.float64)
+    for slot in range(outfit_idx.shape[1]):
+        weather_sum = weather_sum + np.where(present[:, slot], item_fit[safe_idx[:, slot]], 0.0)
+    weather_score = weather_sum / np.maximum(present.sum(axis=1), 1)
+
+    # 4. Итоговый score
+    total_raw = (
+        color_score * WEIGHT_COLOR +
+        style_score * WEIGHT_STYLE +
+        weather_score * WEIGHT_WEATHER
+    )
+    # round() поэлементно: np.round иначе округляет на границах .xx5
+    total = np.array([round(value, 2) for value in total_raw.tolist()], dtype=np.float64)
+
+    return {
+        "total": total,
+        "total_raw": total_raw,
+        "color": color_score,
+        "style": style_score,
+        "weather": weather_score,
+    }
+
+
+def batch_scores_to_dict(batch: Dict[str, np.ndarray], row: int) -> Dict[str, Any]:
+    """Превращает строку результата score_outfits_batch в формат score_outfit."""
+    color_score = float(batch["color"][row])
+    style_score = float(batch["style"][row])
+    weather_score = float(batch["weather"][row])
+    breakdown = f"Цвета {int(color_score * 100)}% | Стиль {int(style_score * 100)}% | Погода {int(weather_score * 100)}%"
+    return {
+        "total": float(batch["total"][row]),
+        "color": round(color_score, 2),
+        "style": round(style_score, 2),
+        "weather": round(weather_score, 2),
+        "breakdown": breakdown
+    }
+
+
+def make_batch_scorer(
+    items: List[Dict],
+    occasion: str = "casual",
+    weather_category: str = "warm",
+    item_features: Optional[Sequence[Dict[str, int]]] = None
+) -> Callable[[List[List[Dict]]], Tuple[List[float], Callable[[int], Dict[str, Any]]]]:
+    """
+    Готовит функцию пакетной оценки для списка вещей-словарей.
+
+    Признаки вещей берутся из item_features (например, сохранённые в БД)
+    или кодируются здесь один раз. Возвращаемая функция принимает список
+    комбинаций и отдаёт округлённые total и функцию, собирающую полный
+    словарь score_outfit для строки батча.
+    """
+    if item_features is None:
+        item_features = [encode_item_features(item) for item in items]
+    features = stack_item_features(item_features)
+    position = {item["id"]: i for i, item in enumerate(items)}
+
+    def score_batch(combos: List[List[Dict]]):
+        width = max((len(combo) for combo in combos), default=0)
+        outfit_idx = np.full((len(combos), width), -1, dtype=np.int64)
+        for row, combo in enumerate(combos):
+            outfit_idx[row, :len(combo)] = [position[item["id"]] for item in combo]
+        batch = score_outfits_batch(features, outfit_idx, occasion, weather_category)
+        return batch["total"].tolist(), lambda row: batch_scores_to_dict(batch, row)
+
+    return score_batch
@@ -1,18 +1,54 @@
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
 from rembg import remove, new_session
 from PIL import Image
 import io
 
+from app.ml.image_context import ImageContext
+
+def _create_session(model_name: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """
+    Сессия rembg с явными настройками потоков onnxruntime.
+
+    new_session() берёт число потоков только из OMP_NUM_THREADS, поэтому
+    при заданных потоках класс сессии создаётся напрямую. 0 — по умолчанию
+    onnxruntime (все ядра на каждую сессию).
+    """
+    if intra_op_threads <= 0 and inter_op_threads <= 0:
+        return new_session(model_name)
+
+    import onnxruntime as ort
+    from rembg.sessions import sessions_class
+
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads > 0:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if inter_op_threads > 0:
+        sess_opts.inter_op_num_threads = inter_op_threads
+
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class(model_name, sess_opts)
+    raise ValueError(f"Unknown rembg model: {model_name}")
+
+
 class BackgroundRemover:
     """
     Класс для автоматического удаления фона с изображений.
     Использует библиотеку rembg (модель u2net).
     """
     
-    def __init__(self, model_name: str = "u2net"):
+    def __init__(self, model_name: str = "u2net", intra_op_threads: int = 0,
+                 inter_op_threads: int = 0):
         # u2net - стандартная качественная модель
-        # u2netp - облегченная версия
-        self.session = new_session(model_name)
+        # u2netp - облегченная версия (~4.7 МБ, заметно быстрее)
+        # silueta - сжатая u2net (~43 МБ), качество близко к u2net
+        self.model_name = model_name
+        self.session = _create_session(model_name, intra_op_threads, inter_op_threads)
 
     def remove_background(self, input_path: str, output_path: str):
         """
@@ -40,16 +76,127 @@ class BackgroundRemover:
         """
         return remove(image_bytes, session=self.session)
 
-import threading
+    def remove_background_image(self, ctx: ImageContext, work_edge: int = 0,
+                                max_output_edge: int = 0) -> ImageContext:
+        """
+        Удаляет фон у уже декодированного изображения.
+
+        rembg получает PIL-изображение и возвращает PIL-изображение —
+        без повторного декодирования и PNG-кодирования между этапами.
+
+        Режим с уменьшением (work_edge > 0): U²-Net всё равно считает маску
+        в 320×320, а rembg тратит время и память на ресайз полного кадра
+        туда и обратно. Поэтому маска считается по копии с большей стороной
+        work_edge, затем растягивается до выходного изображения (большая
+        сторона не больше max_output_edge, 0 — исходный размер) и
+        применяется так же, как это делает rembg (naive cutout).
+        """
+        if work_edge <= 0:
+            output = remove(ctx.image("RGBA"), session=self.session)
+            return ImageContext.from_image(output)
+
+        out_ctx = ctx.thumbnail((max_output_edge, max_output_edge)) if max_output_edge > 0 else ctx
+        work_ctx = out_ctx.thumbnail((work_edge, work_edge))
+
+        mask = remove(work_ctx.image("RGB"), session=self.session, only_mask=True)
+        if mask.size != out_ctx.size:
+            mask = mask.resize(out_ctx.size, Image.BILINEAR)
+
+        image = out_ctx.image("RGBA")
+        empty = Image.new("RGBA", image.size, 0)
+        output = Image.composite(image, empty, mask)
+        return ImageContext.from_image(output)
+
+# =============================================================================
+# ПУЛ СЕССИЙ
+# =============================================================================
+# Одна сессия на все потоки ml_pool означала, что параллельные загрузки
+# делили один InferenceSession и потоки onnxruntime. Пул держит до size
+# сессий на модель (создаются по требованию), поток берёт свободную
+# и возвращает после сегментации; если все заняты — ждёт.
+
+class RemoverPool:
+    """Пул BackgroundRemover по именам моделей (thread-safe)."""
+
+    def __init__(self, size: int, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        self.size = max(size, 1)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._free: Dict[str, "queue.LifoQueue[BackgroundRemover]"] = {}
+        self._created: Dict[str, int] = {}
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, model_name: str) -> Iterator[BackgroundRemover]:
+        """Берёт сессию модели на время блока with."""
+        remover = self._take(model_name)
+        try:
+            yield remover
+        finally:
+            self._free[model_name].put(remover)
+
+    def _take(self, model_name: str) -> BackgroundRemover:
+        with self._lock:
+            free = self._free.setdefault(model_name, queue.LifoQueue())
+            try:
+                return free.get_nowait()
+            except queue.Empty:
+                pass
+            create = self._created.get(model_name, 0) < self.size
+            if create:
+                self._created[model_name] = self._created.get(model_name, 0) + 1
+            else:
+                self._waiting += 1
+
+        if create:
+            # Загрузка модели — вне блокировки, другие модели не ждут
+            try:
+                return BackgroundRemover(model_name, self.intra_op_threads, self.inter_op_threads)
+            except Exception:
+                with self._lock:
+                    self._created[model_name] -= 1
+                raise
+
+        try:
+            return free.get()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def warmup(self, model_name: str) -> None:
+        """Создаёт первую сессию модели заранее (при старте)."""
+        with self.acquire(model_name):
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "intra_op_threads": self.intra_op_threads,
+                "inter_op_threads": self.inter_op_threads,
+                "waiting": self._waiting,
+                "models": {
+                    name: {"created": self._created.get(name, 0), "free": free.qsize()}
+                    for name, free in self._free.items()
+                },
+            }
+
+
+_remover_pool = None
+_remover_pool_lock = threading.Lock()
+
 
-# Глобальный экземпляр для переиспользования сессии
-remover = None
-_remover_lock = threading.Lock()
-
-def get_remover():
-    global remover
-    if remover is None:
-        with _remover_lock:
-            if remover is None:
-                remover = BackgroundRemover()
-    return remover
+def get_remover_pool() -> RemoverPool:
+    """Возвращает singleton пула сессий (настройки REMBG_* из Settings)."""
+    global _remover_pool
+    if _remover_pool is None:
+        with _remover_pool_lock:
+            if _remover_pool is None:
+                from app.db.database import settings
+                _remover_pool = RemoverPool(
+                    settings.REMBG_POOL_SIZE,
+                    intra_op_threads=settings.REMBG_INTRA_OP_THREADS,
+                    inter_op_threads=settings.REMBG_INTER_OP_THREADS
+                )
+    return _remover_pool
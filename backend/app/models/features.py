@@ -0,0 +1,42 @@
+# =============================================================================
+# МОДЕЛЬ: ПРИЗНАКИ ВЕЩИ ДЛЯ ГЕНЕРАТОРА (features.py)
+# =============================================================================
+# Компактная запись с заранее вычисленными признаками вещи.
+# Заполняется при /clothing/confirm и обновлении вещи, чтобы генератор
+# образов не разбирал JSON-поля color/style/season на каждом запросе.
+# =============================================================================
+
+from sqlalchemy import Column, Integer, SmallInteger, ForeignKey, TIMESTAMP
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class ClothingItemFeatures(Base):
+    """
+    Признаки вещи (1:1 с clothing_items).
+
+    Атрибуты:
+        item_id: ID вещи (удаляется вместе с вещью)
+        owner_id: Владелец (для выборки гардероба без JOIN)
+        version: Версия кодирования (устаревшие записи пересчитываются)
+        color_idx: Индекс основного цвета (outfit_scorer.COLOR_VOCAB, -1 = нет)
+        style_idx: Индекс нормализованного стиля (outfit_scorer.STYLE_VOCAB, -1 = нет)
+        season_mask: Битовая маска сезонов (outfit_scorer.SEASON_*)
+        occasion_mask: Поводы, которым подходит стиль вещи (бит на повод)
+        category_slot: Слот генератора (outfit_engine.generator.SLOT_*)
+        temp_min, temp_max: Температурный диапазон (°C)
+    """
+    __tablename__ = "clothing_item_features"
+
+    item_id = Column(Integer, ForeignKey("clothing_items.id", ondelete="CASCADE"), primary_key=True)
+    owner_id = Column(Integer, nullable=False, index=True)
+    version = Column(SmallInteger, nullable=False, default=1)
+    color_idx = Column(SmallInteger, nullable=False)
+    style_idx = Column(SmallInteger, nullable=False)
+    season_mask = Column(SmallInteger, nullable=False)
+    occasion_mask = Column(SmallInteger, nullable=False)
+    category_slot = Column(SmallInteger, nullable=False)
+    temp_min = Column(Integer, nullable=True)
+    temp_max = Column(Integer, nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
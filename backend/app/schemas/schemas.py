@@ -11,7 +11,7 @@
 from pydantic import BaseModel, EmailStr, validator
 
 # Типизация для опциональных полей и списков
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 # Работа с датами
 from datetime import datetime, date
@@ -144,6 +144,16 @@ class ClothingItemResponse(BaseModel):
     wear_count: int = 0
     is_clean: bool = True
     created_at: datetime
+    # Уменьшенные WebP-копии {"128": путь, "256": ..., "512": ...}
+    image_variants: Optional[Dict[str, str]] = None
+    
+    @validator('image_variants', always=True)
+    def fill_image_variants(cls, v, values):
+        """Пути вариантов по image_path (app/services/image_variants.py)."""
+        if v is not None:
+            return v
+        from app.services.image_variants import image_variants_for
+        return image_variants_for(values.get('id'), values.get('image_path'))
     
     @validator('color', 'season', 'style', 'color_palette', pre=True)
     def parse_json_array(cls, v):
@@ -0,0 +1,171 @@
+# =============================================================================
+# КЭШ УДАЛЕНИЯ ФОНА (bg_cache.py)
+# =============================================================================
+# U²-Net — самый дорогой этап загрузки, а одно и то же фото приходит
+# повторно: после /clothing/cancel и повторной загрузки, одна картинка
+# из каталога у нескольких пользователей.
+#
+# Ключ — SHA-256 исходных байтов загрузки + имя модели rembg:
+#   {BG_CACHE_DIR}/{model}/{sha[:2]}/{sha}.png
+# Попадание: PNG жёстко связывается (или копируется) в итоговый путь,
+# сегментация не выполняется.
+#
+# Размер ограничен BG_CACHE_MAX_MB, вытеснение LRU по mtime (при попадании
+# mtime обновляется). Файлы пишутся атомарно (tmp + os.replace), поэтому
+# кэш можно делить между воркерами и репликами с общим uploads/.
+# =============================================================================
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Optional
+
+from app.db.database import settings
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# После вытеснения оставляем запас, чтобы не сканировать каталог на каждой записи
+EVICT_TARGET_RATIO = 0.9
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Жёсткая ссылка (без копирования данных), если ФС не умеет — копия."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class BackgroundCache:
+    """Дисковый кэш PNG без фона, адресуемый содержимым загрузки."""
+
+    def __init__(self, root: str, max_bytes: int, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled and max_bytes > 0
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def path_for(self, digest: str, model_name: str) -> str:
+        return os.path.join(self.root, model_name, digest[:2], f"{digest}.png")
+
+    def get(self, digest: str, model_name: str) -> Optional[str]:
+        """Путь к закэшированному PNG или None."""
+        path = self.path_for(digest, model_name)
+        try:
+            # Обновляем mtime — запись становится «свежей» для LRU
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def restore(self, digest: str, model_name: str, dest_path: str) -> bool:
+        """Кладёт закэшированный PNG в dest_path. False — промах."""
+        cached = self.get(digest, model_name)
+        if cached is None:
+            return False
+        try:
+            link_or_copy(cached, dest_path)
+            return True
+        except OSError as e:
+            # Запись могли вытеснить между get() и link
+            logger.warning(f"BG cache restore failed: {e}")
+            return False
+
+    def discard(self, digest: str, model_name: str) -> None:
+        """Удаляет запись (например, битый PNG). Связанные с ней файлы не трогаются."""
+        try:
+            os.remove(self.path_for(digest, model_name))
+        except FileNotFoundError:
+            pass
+
+    def put(self, digest: str, model_name: str, src_path: str) -> None:
+        """Сохраняет готовый PNG (src_path) в кэш."""
+        path = self.path_for(digest, model_name)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            link_or_copy(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._account(os.path.getsize(path))
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._scan())
+            else:
+                self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """(mtime, path, size) всех записей кэша."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        # Пересчитываем по диску: другие процессы тоже пишут в кэш
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        removed = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._total_bytes = total
+        if removed:
+            logger.info(f"BG cache: evicted {removed} entries, {total / MB:.1f} MB left")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size_mb": round((self._total_bytes or 0) / MB, 1),
+            "max_mb": round(self.max_bytes / MB, 1),
+        }
+
+
+bg_cache = BackgroundCache(
+    settings.BG_CACHE_DIR,
+    max_bytes=settings.BG_CACHE_MAX_MB * MB,
+    enabled=settings.BG_CACHE_ENABLED
+)
@@ -0,0 +1,352 @@
+# =============================================================================
+# ХРАНИЛИЩЕ ИЗОБРАЖЕНИЙ ПО СОДЕРЖИМОМУ (blob_store.py)
+# =============================================================================
+# Обработанное фото сначала лежит в uploads/{file_id}.png («ожидает»
+# /confirm или /cancel). При подтверждении оно переносится в
+#   {BLOB_STORE_DIR}/{sha[:2]}/{sha[2:4]}/{sha}.png
+# где sha — SHA-256 PNG. Одинаковые фото хранятся один раз, а каталоги
+# остаются маленькими (65536 шардов) даже при миллионах файлов.
+#
+# Счётчик ссылок — число вещей (ClothingItem.image_path) с этим путём:
+# при удалении вещи файл удаляется, только если ссылок больше нет.
+# Сборщик мусора (collect_garbage, раз в BLOB_GC_INTERVAL) удаляет:
+# - блобы без ссылок (вещи удалены вместе с аккаунтом и т.п.)
+# - неподтверждённые uploads/{uuid}.png и temp_* старше PENDING_UPLOAD_TTL
+#
+# Свежие файлы (mtime моложе BLOB_GC_GRACE_SECONDS) не удаляются: блоб
+# мог только что получить ссылку из ещё не закоммиченной транзакции
+# (при повторном использовании блоба mtime обновляется).
+#
+# Сборщик запускается в каждом воркере (main.py), но за один интервал
+# работает только один процесс на все реплики: он держит аренду в MongoDB
+# (коллекция blob_gc_lease), остальные пропускают проход. Если владелец
+# умер, аренду через 2 × BLOB_GC_INTERVAL забирает другой процесс.
+#
+# Рядом с оригиналом лежат его WebP-варианты ({sha}_{size}.webp,
+# image_variants.py) — они удаляются вместе с оригиналом.
+#
+# Удаление тоже через переименование (_remove_if_old_sync), поэтому
+# одновременный /confirm того же фото не останется без файла.
+#
+# Блобы неизменяемы (пишутся только переименованием), поэтому могут быть
+# жёсткими ссылками на записи кэша удаления фона (bg_cache): удаление
+# блоба не трогает кэш и наоборот. Общий inode означает и общий mtime —
+# попадание в кэш продлевает «свежесть» блоба, это безопасно.
+# =============================================================================
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+import aiofiles
+import aiofiles.os
+from pymongo.errors import DuplicateKeyError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_session_maker, settings
+from app.db.mongo import get_app_mongo_db
+from app.models import models
+from app.services.image_variants import remove_variants
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 1024 * 1024
+
+# Сколько путей проверять одним запросом к БД
+GC_QUERY_BATCH = 1000
+
+# Неподтверждённые загрузки: uploads/{uuid}.png и временные temp_*
+PENDING_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.png$")
+TEMP_PREFIX = "temp_"
+
+GC_LEASE_ID = "blob_gc"
+
+_utime = aiofiles.os.wrap(os.utime)
+
+
+async def file_digest(path: str) -> str:
+    """SHA-256 файла (чтение кусками через aiofiles)."""
+    digest = hashlib.sha256()
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _posix(path: str) -> str:
+    # Пути хранятся в БД и отдаются фронтенду как URL — всегда через "/"
+    return path.replace(os.sep, "/")
+
+
+def is_pending_path(path: str) -> bool:
+    """Путь неподтверждённой загрузки (uploads/{uuid}.png)?"""
+    directory, _, name = _posix(path).rpartition("/")
+    return directory == UPLOAD_DIR and bool(PENDING_RE.match(name))
+
+
+class BlobStore:
+    """Хранилище PNG по SHA-256 с шардированием по префиксу хэша."""
+
+    def __init__(self, root: str, grace_seconds: int, pending_ttl: int):
+        self.root = _posix(root).rstrip("/")
+        self.grace_seconds = grace_seconds
+        self.pending_ttl = pending_ttl
+        self._gc_task: Optional[asyncio.Task] = None
+        # Владелец аренды сборщика — этот процесс
+        self._gc_owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+
+    def path_for(self, digest: str, ext: str = "png") -> str:
+        return f"{self.root}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+    def is_blob(self, path: Optional[str]) -> bool:
+        return bool(path) and _posix(path).startswith(self.root + "/")
+
+    # ─── Запись и освобождение ───────────────────────────────────────────
+
+    async def put_pending(self, path: str) -> str:
+        """
+        Переносит неподтверждённую загрузку в хранилище.
+
+        Returns:
+            str: путь блоба (его и записываем в ClothingItem.image_path).
+                 Пути не из uploads/{uuid}.png (старые вещи, уже блобы)
+                 возвращаются как есть.
+        """
+        if not is_pending_path(path):
+            return path
+
+        digest = await file_digest(path)
+        blob_path = self.path_for(digest)
+        await aiofiles.os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        # Всегда переименованием, даже если такой блоб уже есть (содержимое
+        # то же): путь блоба указывает на свежий файл, а не на inode,
+        # который сборщик мог как раз удалять. mtime обновляется и до, и
+        # после — сборщик не удалит блоб до коммита новой ссылки
+        await _utime(path)
+        await aiofiles.os.replace(path, blob_path)
+        try:
+            await _utime(blob_path)
+        except FileNotFoundError:
+            # Сборщик на мгновение отложил файл и вернёт его (_remove_if_old_sync)
+            pass
+        return blob_path
+
+    async def reference_count(self, db: AsyncSession, path: str) -> int:
+        return await db.scalar(
+            select(func.count(models.ClothingItem.id)).filter(
+                models.ClothingItem.image_path == path
+            )
+        )
+
+    async def release(self, db: AsyncSession, path: str) -> bool:
+        """
+        Вызывается после удаления (и коммита) вещи: удаляет блоб, если
+        на него больше никто не ссылается. Свежий блоб оставляется
+        сборщику мусора.
+
+        Returns:
+            bool: файл удалён
+        """
+        if not self.is_blob(path):
+            return False
+        if await self.reference_count(db, path) > 0:
+            return False
+        return bool(await self._remove_blob(path, time.time() - self.grace_seconds))
+
+    async def _remove_blob(self, path: str, older_than: float) -> int:
+        removed = await _remove_if_old(path, older_than)
+        if removed:
+            await remove_variants(path)
+        return removed
+
+    # ─── Сборка мусора ───────────────────────────────────────────────────
+
+    async def collect_garbage(self) -> Dict[str, int]:
+        """
+        Удаляет блобы без ссылок и брошенные неподтверждённые загрузки.
+
+        Каталоги обходятся в пуле потоков по одному шарду верхнего уровня —
+        память не растёт с числом файлов.
+        """
+        loop = asyncio.get_running_loop()
+        stats = {"blobs_checked": 0, "blobs_removed": 0, "pending_removed": 0}
+        now = time.time()
+
+        # 1. Блобы
+        shards = await loop.run_in_executor(None, _list_dirs, self.root)
+        for shard in shards:
+            candidates = await loop.run_in_executor(None, _old_files, shard, now - self.grace_seconds)
+            stats["blobs_checked"] += len(candidates)
+            stats["blobs_removed"] += await self._remove_unreferenced(candidates, now - self.grace_seconds)
+
+        # 2. Неподтверждённые загрузки (плоский uploads/)
+        pending, temp = await loop.run_in_executor(None, _pending_files, UPLOAD_DIR, now - self.pending_ttl)
+        # uploads/{uuid}.png — ещё и пути старых вещей (до хранилища),
+        # поэтому тоже проверяем ссылки
+        stats["pending_removed"] += await self._remove_unreferenced(pending, now - self.pending_ttl)
+        for path in temp:
+            stats["pending_removed"] += await _remove_if_old(path, now - self.pending_ttl)
+
+        logger.info(f"Blob GC: {stats}")
+        return stats
+
+    async def _remove_unreferenced(self, paths: List[str], older_than: float) -> int:
+        removed = 0
+        for start in range(0, len(paths), GC_QUERY_BATCH):
+            batch = paths[start:start + GC_QUERY_BATCH]
+            async with async_session_maker() as db:
+                referenced = await _referenced(db, batch)
+            for path in batch:
+                if path not in referenced:
+                    removed += await self._remove_blob(path, older_than)
+        return removed
+
+    async def _acquire_gc_lease(self, interval: int) -> bool:
+        """
+        Берёт (или продлевает свою) аренду сборщика на 2 × interval.
+
+        Returns:
+            bool: этот процесс — сборщик на текущий интервал
+        """
+        now = time.time()
+        try:
+            await get_app_mongo_db().blob_gc_lease.find_one_and_update(
+                {
+                    "_id": GC_LEASE_ID,
+                    "$or": [{"owner": self._gc_owner}, {"expires_at": {"$lt": now}}],
+                },
+                {"$set": {"owner": self._gc_owner, "expires_at": now + 2 * interval}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Аренда есть и держит её другой процесс
+            return False
+        return True
+
+    async def _gc_loop(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self._acquire_gc_lease(interval):
+                    continue
+                await self.collect_garbage()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Blob GC failed: {e}")
+
+    def start_gc(self, interval: int) -> None:
+        """
+        Запускает периодическую сборку мусора (interval <= 0 — выключена).
+
+        Можно вызывать в каждом процессе: проход выполняет только
+        держатель аренды (_acquire_gc_lease).
+        """
+        if interval > 0 and self._gc_task is None:
+            self._gc_task = asyncio.get_running_loop().create_task(self._gc_loop(interval))
+
+    def close(self) -> None:
+        if self._gc_task is not None:
+            self._gc_task.cancel()
+            self._gc_task = None
+
+
+async def _referenced(db: AsyncSession, paths: List[str]) -> Set[str]:
+    result = await db.execute(
+        select(models.ClothingItem.image_path).filter(
+            models.ClothingItem.image_path.in_(paths)
+        ).distinct()
+    )
+    return set(result.scalars().all())
+
+
+async def _remove_if_old(path: str, older_than: float) -> int:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _remove_if_old_sync, path, older_than)
+
+
+def _remove_if_old_sync(path: str, older_than: float) -> int:
+    """
+    Удаляет файл, если он старше older_than.
+
+    mtime перепроверяется: пока шёл запрос к БД, блоб могли использовать
+    повторно (put_pending обновляет mtime). Чтобы между проверкой и
+    удалением не вклинился put_pending, файл сначала атомарно
+    переименовывается: новый блоб, положенный put_pending после этого,
+    — уже другой файл и не удаляется; свежий файл возвращается на место.
+    """
+    doomed = f"{path}.{uuid.uuid4().hex}.gc"
+    try:
+        os.rename(path, doomed)
+    except FileNotFoundError:
+        return 0
+    if os.stat(doomed).st_mtime >= older_than:
+        # Содержимое по пути то же (ключ — хэш), перезапись безопасна
+        os.replace(doomed, path)
+        return 0
+    os.remove(doomed)
+    return 1
+
+
+# ─── Обход каталогов (выполняется в пуле потоков) ───────────────────────────
+
+def _list_dirs(root: str) -> List[str]:
+    try:
+        with os.scandir(root) as entries:
+            return [entry.path for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def _old_files(root: str, older_than: float) -> List[str]:
+    """Оригиналы (*.png, без вариантов) под root с mtime старше older_than."""
+    old = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime < older_than:
+                    old.append(_posix(path))
+            except FileNotFoundError:
+                continue
+    return old
+
+
+def _pending_files(upload_dir: str, older_than: float) -> Tuple[List[str], List[str]]:
+    """(старые uploads/{uuid}.png, старые uploads/temp_*) — только верхний уровень."""
+    pending, temp = [], []
+    try:
+        with os.scandir(upload_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                is_pending = PENDING_RE.match(entry.name)
+                if not is_pending and not entry.name.startswith(TEMP_PREFIX):
+                    continue
+                if entry.stat().st_mtime >= older_than:
+                    continue
+                path = f"{upload_dir}/{entry.name}"
+                (pending if is_pending else temp).append(path)
+    except FileNotFoundError:
+        pass
+    return pending, temp
+
+
+blob_store = BlobStore(
+    settings.BLOB_STORE_DIR,
+    grace_seconds=settings.BLOB_GC_GRACE_SECONDS,
+    pending_ttl=settings.PENDING_UPLOAD_TTL
+)
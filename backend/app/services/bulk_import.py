@@ -0,0 +1,318 @@
+# =============================================================================
+# МАССОВЫЙ ИМПОРТ ГАРДЕРОБА (bulk_import.py)
+# =============================================================================
+# Новый пользователь загружает десятки фото сразу — несколько файлов
+# multipart или один zip. Вместо десятков пар /upload + /confirm:
+#
+#   POST /clothing/bulk ──> NDJSON-поток, по строке на фото по мере готовности
+#
+# Фото обрабатываются тем же пайплайном (analyze_upload), но до
+# BULK_IMPORT_CONCURRENCY одновременно: все сессии пула rembg заняты,
+# а запросы к классификатору попадают в один батч микро-батчера
+# (inference_batcher) — один прогон модели на несколько фото.
+# При auto_confirm все вещи сохраняются одним INSERT (и признаки — вторым).
+# =============================================================================
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import aiofiles
+import aiofiles.os
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from app.db.database import async_session_maker, settings
+from app.models import models
+from app.models.features import ClothingItemFeatures
+from app.services.blob_store import TEMP_PREFIX, UPLOAD_DIR, blob_store
+from app.services.generation_cache import bump_wardrobe_version
+from app.services.image_variants import generate_variants
+from app.services.item_features import ITEM_FEATURES_VERSION, compute_item_features
+from app.services.upload_jobs import analyze_upload
+from app.services.upload_storage import save_upload
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# Сколько раз повторять фото, получившее 429 от пулов
+MAX_RETRIES = 3
+
+MB = 1024 * 1024
+
+
+@dataclass
+class BulkFile:
+    """
+    Фото из запроса; read() — байты (читаются с диска при вызове).
+
+    path — временный файл запроса, из которого читается фото (для zip —
+    общий архив); удаляется remove_temp_files после обработки.
+    """
+    index: int
+    filename: str
+    read: Callable[[], Awaitable[bytes]]
+    path: str
+    sha256: Optional[str] = None
+
+
+# UploadFile закрываются до отправки тела StreamingResponse, поэтому
+# файлы запроса до начала потока переписываются во временные
+# uploads/temp_bulk_* (через upload_storage: тип и размер проверяются
+# сразу) — в памяти держатся только фото, которые обрабатываются сейчас.
+# Файлы удаляются в конце потока, брошенные — сборщиком (blob_store, temp_*).
+
+def _temp_name() -> str:
+    return f"{TEMP_PREFIX}bulk_{uuid.uuid4().hex}"
+
+
+def _check_size(filename: str, size: int) -> None:
+    if size > settings.BULK_IMPORT_MAX_FILE_MB * MB:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{filename}: файл больше {settings.BULK_IMPORT_MAX_FILE_MB} МБ"
+        )
+
+
+async def _read_file(path: str) -> bytes:
+    async with aiofiles.open(path, "rb") as f:
+        return await f.read()
+
+
+async def _remove_paths(paths) -> None:
+    for path in set(paths):
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def remove_temp_files(files: List[BulkFile]) -> None:
+    """Удаляет временные файлы запроса (вызывается в finally потока)."""
+    await _remove_paths(file.path for file in files)
+
+
+async def files_from_uploads(uploads) -> List[BulkFile]:
+    """
+    Файлы multipart (UploadFile) — в порядке запроса.
+
+    Raises:
+        HTTPException 400/413/415: Пустой файл, больше BULK_IMPORT_MAX_FILE_MB, не изображение
+    """
+    files = []
+    try:
+        for index, upload in enumerate(uploads):
+            filename = upload.filename or f"image_{index}"
+            stored = await save_upload(upload, UPLOAD_DIR, _temp_name(),
+                                       settings.BULK_IMPORT_MAX_FILE_MB * MB)
+
+            async def read(path=stored.path) -> bytes:
+                return await _read_file(path)
+
+            files.append(BulkFile(index, filename, read, stored.path, stored.sha256))
+    except BaseException:
+        await remove_temp_files(files)
+        raise
+    return files
+
+
+def _list_images(zip_path: str) -> List[zipfile.ZipInfo]:
+    """Изображения в архиве (служебные каталоги и не-картинки пропускаются)."""
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Файл не является zip-архивом")
+
+    images = []
+    for info in infos:
+        name = info.filename
+        base = os.path.basename(name)
+        if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+            continue
+        if not base.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        _check_size(name, info.file_size)
+        images.append(info)
+    return images
+
+
+def _read_member(zip_path: str, info: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    # Своё открытие архива на вызов: читается из нескольких потоков.
+    # Заявленный размер мог быть подделан — распаковываем не больше лимита
+    with zipfile.ZipFile(zip_path) as archive, archive.open(info) as member:
+        data = member.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail="Файл в архиве больше лимита")
+    return data
+
+
+async def files_from_zip(upload) -> List[BulkFile]:
+    """
+    Изображения из zip-архива.
+
+    Архив пишется во временный файл с общим лимитом
+    BULK_IMPORT_MAX_FILES × BULK_IMPORT_MAX_FILE_MB; число фото проверяется
+    по оглавлению (check_file_count).
+
+    Raises:
+        HTTPException 400: Не zip-архив / нет изображений
+        HTTPException 413: Архив или файл в нём больше лимита, слишком много фото
+    """
+    max_bytes = settings.BULK_IMPORT_MAX_FILE_MB * MB
+    stored = await save_upload(upload, UPLOAD_DIR, f"{_temp_name()}.zip",
+                               settings.BULK_IMPORT_MAX_FILES * max_bytes, sniff=False)
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await loop.run_in_executor(None, _list_images, stored.path)
+        check_file_count(len(infos))
+    except BaseException:
+        await _remove_paths([stored.path])
+        raise
+
+    files = []
+    for info in infos:
+        async def read(info=info) -> bytes:
+            # Распаковка до BULK_IMPORT_MAX_FILE_MB — не в потоке event loop
+            return await loop.run_in_executor(None, _read_member, stored.path, info, max_bytes)
+
+        files.append(BulkFile(len(files), os.path.basename(info.filename), read, stored.path))
+    return files
+
+
+def check_file_count(count: int) -> None:
+    """
+    Проверяется до чтения файлов (multipart) / по оглавлению архива (zip).
+
+    Raises:
+        HTTPException 400: Нет изображений
+        HTTPException 413: Больше BULK_IMPORT_MAX_FILES фото
+    """
+    if count == 0:
+        raise HTTPException(status_code=400, detail="Нет изображений для импорта")
+    if count > settings.BULK_IMPORT_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Не больше {settings.BULK_IMPORT_MAX_FILES} фото за один импорт"
+        )
+
+
+async def _process_file(file: BulkFile, plan: str, semaphore: asyncio.Semaphore) -> Dict:
+    """Одно фото -> событие item (или error)."""
+    async with semaphore:
+        try:
+            data = await file.read()
+            if not data:
+                raise HTTPException(status_code=400, detail="Пустой файл")
+
+            file_id = str(uuid.uuid4())
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    analysis = await analyze_upload(data, file_id, plan, digest=file.sha256)
+                    break
+                except HTTPException as e:
+                    # Пулы заняты (в т.ч. чужими загрузками) — ждём и повторяем
+                    if e.status_code != 429 or attempt == MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(settings.POOL_RETRY_AFTER)
+        except HTTPException as e:
+            return {"type": "error", "index": file.index, "filename": file.filename,
+                    "status_code": e.status_code, "detail": e.detail}
+        except Exception as e:
+            logger.error(f"Bulk import {file.filename} failed: {e}")
+            return {"type": "error", "index": file.index, "filename": file.filename,
+                    "status_code": 500, "detail": str(e)}
+
+    return {
+        "type": "item",
+        "index": file.index,
+        "result": {"file_id": file_id, "filename": file.filename, **analysis, "pending": True},
+    }
+
+
+async def iter_bulk_results(files: List[BulkFile], plan: str) -> AsyncIterator[Dict]:
+    """
+    Обрабатывает фото и отдаёт события в порядке готовности.
+
+    Если клиент отключился (генератор закрыт), незапущенные фото отменяются.
+    """
+    semaphore = asyncio.Semaphore(max(settings.BULK_IMPORT_CONCURRENCY, 1))
+    tasks = [asyncio.ensure_future(_process_file(file, plan, semaphore)) for file in files]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _item_row(user_id: int, result: Dict, image_path: str) -> Dict:
+    """Результат пайплайна -> строка clothing_items (как в /confirm)."""
+    return {
+        "owner_id": user_id,
+        "filename": result["filename"],
+        "name": None,
+        "image_path": image_path,
+        "category": result["category"],
+        "color": json.dumps([result["color"]]),
+        "season": json.dumps(result["seasons"]),
+        "style": json.dumps([result["style"]]),
+        "temp_min": result["temp_min"],
+        "temp_max": result["temp_max"],
+        "waterproof_level": result["waterproof_level"] or 0,
+        "is_multicolor": result["is_multicolor"],
+        "color_palette": json.dumps(result["color_palette"]) if result["color_palette"] else None,
+        "is_favorite": False,
+    }
+
+
+async def save_bulk_items(user_id: int, results: List[Dict]) -> List[int]:
+    """
+    Сохраняет вещи одним INSERT ... RETURNING, признаки — вторым.
+
+    Своя сессия: зависимость get_db закрывается до начала потока ответа.
+
+    Returns:
+        List[int]: ID вещей в порядке results
+    """
+    # Фото — в хранилище по SHA-256 (+ WebP-варианты), как в /confirm
+    image_paths = [await blob_store.put_pending(result["image_path"]) for result in results]
+    for path in image_paths:
+        if blob_store.is_blob(path):
+            try:
+                await generate_variants(path)
+            except Exception as e:
+                logger.warning(f"Variants for {path} failed: {e}")
+
+    async with async_session_maker() as db:
+        items = (await db.scalars(
+            insert(models.ClothingItem).returning(models.ClothingItem, sort_by_parameter_order=True),
+            [_item_row(user_id, result, path) for result, path in zip(results, image_paths)]
+        )).all()
+
+        await db.execute(insert(ClothingItemFeatures), [
+            {
+                "item_id": item.id,
+                "owner_id": item.owner_id,
+                "version": ITEM_FEATURES_VERSION,
+                **compute_item_features(item),
+            }
+            for item in items
+        ])
+
+        db.add(models.AuditLog(
+            user_id=user_id,
+            action="bulk_import",
+            details=f"Imported {len(items)} items"
+        ))
+        await db.commit()
+
+    await bump_wardrobe_version(user_id)
+    return [item.id for item in items]
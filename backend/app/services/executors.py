@@ -0,0 +1,168 @@
+# =============================================================================
+# ПУЛЫ ИСПОЛНИТЕЛЕЙ ДЛЯ ТЯЖЁЛЫХ ЗАДАЧ (executors.py)
+# =============================================================================
+# Раньше всё тяжёлое шло в общий run_in_executor(None, ...) — один пул
+# потоков на всё, упирающийся в GIL. Теперь пулы именованные:
+#
+# - cpu_pool: процессы (spawn) для чистых CPU-задач на Python/NumPy —
+#   генерация образов, K-means, агрегация статистики
+# - ml_pool:  потоки для torch/onnxruntime — они отпускают GIL, а модели
+#   (синглтоны) должны жить в этом же процессе
+#
+# У каждого пула ограничена очередь: если занято workers + max_queue задач,
+# новая задача сразу получает 429 с Retry-After, а не ждёт бесконечно.
+# =============================================================================
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.db.database import settings
+
+
+class BoundedExecutor:
+    """
+    Именованный пул с ограниченной очередью.
+
+    Счётчик задач меняется только из event loop, поэтому без блокировок.
+    Задача считается занятой, пока реально не завершилась в пуле
+    (даже если клиент уже отключился).
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int, retry_after: int):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        """Сколько задач может быть одновременно (в работе + в очереди)."""
+        return max(self.max_workers, 1) + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process" and self.max_workers > 0:
+                # spawn: не наследуем потоки и состояние torch/asyncio родителя
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                # max_workers = 0 для процессного пула — выполнять в потоках
+                # (удобно для разработки и отладки)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(self.max_workers, 1),
+                    thread_name_prefix=f"{self.name}-pool"
+                )
+        return self._executor
+
+    def check_capacity(self) -> None:
+        """Бросает 429, если пул переполнен."""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "message": "Сервер перегружен, повторите попытку позже",
+                    "pool": self.name,
+                    "retry_after": self.retry_after,
+                },
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Выполняет fn(*args, **kwargs) в пуле.
+
+        Для процессного пула fn и аргументы должны сериализоваться (pickle):
+        функция уровня модуля, простые данные.
+
+        Raises:
+            HTTPException 429: Пул переполнен
+        """
+        self.check_capacity()
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            future = self._get_executor().submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self.in_flight -= 1
+            raise
+
+        def release(_):
+            loop.call_soon_threadsafe(self._release)
+
+        future.add_done_callback(release)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # Процесс-воркер упал (например, OOM) — пересоздадим пул
+            self._reset()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    def _reset(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Чистые CPU-задачи (генерация образов, K-means, статистика)
+cpu_pool = BoundedExecutor(
+    "cpu", "process",
+    max_workers=settings.CPU_POOL_WORKERS,
+    max_queue=settings.CPU_POOL_MAX_QUEUE,
+    retry_after=settings.POOL_RETRY_AFTER
+)
+
+# Инференс torch/onnxruntime (отпускает GIL, модели — в этом процессе)
+ml_pool = BoundedExecutor(
+    "ml", "thread",
+    max_workers=settings.ML_POOL_WORKERS,
+    max_queue=settings.ML_POOL_MAX_QUEUE,
+    retry_after=settings.POOL_RETRY_AFTER
+)
+
+POOLS: Dict[str, BoundedExecutor] = {pool.name: pool for pool in (cpu_pool, ml_pool)}
+
+
+def get_pool(name: str) -> BoundedExecutor:
+    """Пул по имени ("cpu" / "ml")."""
+    return POOLS[name]
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    """Останавливает все пулы (при остановке приложения)."""
+    for pool in POOLS.values():
+        pool.shutdown(wait=wait)
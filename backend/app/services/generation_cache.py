@@ -0,0 +1,86 @@
+# =============================================================================
+# КЭШ ГЕНЕРАЦИИ ОБРАЗОВ (generation_cache.py)
+# =============================================================================
+# Пользователи часто повторяют /outfits/generate с теми же occasion/weather,
+# листая варианты. Пул лучших образов при этом не меняется — меняется
+# только случайный шаг разнообразия.
+#
+# - Версия гардероба: счётчик в MongoDB (wardrobe_versions), увеличивается
+#   при добавлении, изменении и удалении вещи. Общий для всех реплик бэкенда.
+# - Кэш пулов: в памяти процесса, ключ (пользователь, версия гардероба,
+#   повод, погода, размер пула), вытеснение LRU + TTL.
+#   После изменения гардероба ключ меняется, старые записи просто устаревают.
+# =============================================================================
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.db.database import settings
+from app.db.mongo import get_app_mongo_db
+
+
+class TTLLRUCache:
+    """
+    Простой LRU-кэш с временем жизни записей.
+
+    Не потокобезопасен — рассчитан на использование из event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Пулы ранжированных образов: (user_id, version, occasion, weather, pool_size) -> List[Dict]
+outfit_pool_cache = TTLLRUCache(
+    maxsize=settings.GENERATION_CACHE_SIZE,
+    ttl=settings.GENERATION_CACHE_TTL
+)
+
+
+# ─── Версия гардероба (MongoDB) ──────────────────────────────────────────────
+
+async def get_wardrobe_version(user_id: int) -> int:
+    """Текущая версия гардероба пользователя (0, если ещё не менялся)."""
+    db = get_app_mongo_db()
+    doc = await db.wardrobe_versions.find_one({"user_id": user_id})
+    return doc["version"] if doc else 0
+
+
+async def bump_wardrobe_version(user_id: int) -> int:
+    """Увеличивает версию гардероба (вызывать после commit). Возвращает новую версию."""
+    db = get_app_mongo_db()
+    result = await db.wardrobe_versions.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=True
+    )
+    return result["version"]
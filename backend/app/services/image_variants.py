@@ -0,0 +1,132 @@
+# =============================================================================
+# УМЕНЬШЕННЫЕ КОПИИ ФОТО ВЕЩЕЙ (image_variants.py)
+# =============================================================================
+# Сетка гардероба и ответы /outfits/generate ссылались на полноразмерный
+# PNG без фона (до 2048 px, сотни КБ — мегабайты на вещь). При подтверждении
+# вещи рядом с PNG-оригиналом (lossless, остаётся как есть) создаются
+# WebP с альфа-каналом по IMAGE_VARIANT_SIZES (большая сторона):
+#
+#   uploads/blobs/ab/cd/{sha}.png        — оригинал
+#   uploads/blobs/ab/cd/{sha}_256.webp   — вариант 256 px
+#
+# Схема URL:
+# - блобы: варианты лежат рядом и раздаются статикой /uploads как есть
+# - старые вещи (uploads/{uuid}.png): GET /api/clothing/{id}/image?size=N
+#   создаёт вариант при первом запросе
+# В ответах API — поле image_variants {"128": путь, ...}; путь дописывается
+# к адресу сервера так же, как image_path.
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional
+
+import aiofiles.os
+from fastapi import HTTPException
+from PIL import Image
+
+from app.db.database import settings
+from app.services.executors import cpu_pool
+
+logger = logging.getLogger(__name__)
+
+VARIANT_EXT = "webp"
+
+
+def variant_path(image_path: str, size: int) -> str:
+    """Путь варианта size рядом с оригиналом."""
+    stem, _ = os.path.splitext(image_path)
+    return f"{stem}_{size}.{VARIANT_EXT}"
+
+
+def pick_size(requested: int) -> int:
+    """Наименьший настроенный размер не меньше requested (иначе наибольший)."""
+    sizes = sorted(settings.IMAGE_VARIANT_SIZES)
+    for size in sizes:
+        if size >= requested:
+            return size
+    return sizes[-1]
+
+
+def image_variants_for(item_id: Optional[int], image_path: Optional[str]) -> Optional[Dict[str, str]]:
+    """Поле image_variants ответа API (None — у вещи нет фото)."""
+    if not image_path:
+        return None
+    from app.services.blob_store import blob_store
+
+    if blob_store.is_blob(image_path):
+        return {str(size): variant_path(image_path, size) for size in settings.IMAGE_VARIANT_SIZES}
+    if item_id is None:
+        return None
+    return {
+        str(size): f"api/clothing/{item_id}/image?size={size}"
+        for size in settings.IMAGE_VARIANT_SIZES
+    }
+
+
+def make_variants(image_path: str, sizes: List[int], quality: int) -> List[str]:
+    """
+    Создаёт WebP-варианты оригинала (выполняется в cpu_pool).
+
+    Оригинал декодируется один раз; каждый размер уменьшается из
+    предыдущего (большего) — быстрее, чем каждый раз из полного кадра.
+    Файлы пишутся атомарно (tmp + os.replace).
+    """
+    paths = []
+    with Image.open(image_path) as img:
+        current = img.convert("RGBA")
+
+    for size in sorted(sizes, reverse=True):
+        if max(current.size) > size:
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+
+        path = variant_path(image_path, size)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            current.save(tmp_path, "WEBP", quality=quality, method=4)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        paths.append(path)
+    return paths
+
+
+async def generate_variants(image_path: str, sizes: Optional[List[int]] = None) -> List[str]:
+    """
+    Создаёт варианты (по умолчанию все IMAGE_VARIANT_SIZES), которых ещё нет.
+
+    Подтверждение вещи не должно получать 429: если cpu_pool переполнен,
+    варианты считаются в пуле потоков по умолчанию.
+    """
+    sizes = [
+        size for size in (sizes or settings.IMAGE_VARIANT_SIZES)
+        if not os.path.exists(variant_path(image_path, size))
+    ]
+    if not sizes:
+        return []
+
+    args = (image_path, sizes, settings.IMAGE_VARIANT_QUALITY)
+    try:
+        return await cpu_pool.run(make_variants, *args)
+    except HTTPException:
+        return await asyncio.get_running_loop().run_in_executor(None, make_variants, *args)
+
+
+async def remove_variants(image_path: str) -> None:
+    """Удаляет варианты оригинала (любых размеров, в т.ч. уже не настроенных)."""
+    directory, name = os.path.split(image_path)
+    prefix = os.path.splitext(name)[0] + "_"
+    try:
+        names = await aiofiles.os.listdir(directory or ".")
+    except FileNotFoundError:
+        return
+    for other in names:
+        if other.startswith(prefix) and other.endswith(f".{VARIANT_EXT}"):
+            try:
+                await aiofiles.os.remove(os.path.join(directory, other))
+            except FileNotFoundError:
+                pass
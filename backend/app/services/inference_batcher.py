@@ -0,0 +1,194 @@
+# =============================================================================
+# МИКРО-БАТЧИНГ ИНФЕРЕНСА (inference_batcher.py)
+# =============================================================================
+# При одновременных загрузках каждая вызывала ResNet-50 на тензоре 1×3×224×224
+# и платила полные накладные расходы прогона. Здесь запросы копятся
+# в очереди и уходят в модель пачкой:
+#
+#   submit(x) ──> очередь ──> сборщик: до max_batch элементов или max_wait_ms
+#                                 │   с момента первого элемента
+#                                 ▼
+#                   ml_pool.run(batch_fn, [x1, x2, ...])
+#                                 │
+#   await <── результат i ────────┘   (каждый вызывающий получает свой)
+#
+# Пока пачка считается, следующие запросы уже копятся — под нагрузкой
+# батчи растут сами, а одиночный запрос ждёт не дольше max_wait_ms.
+# =============================================================================
+
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from app.db.database import settings
+from app.services.executors import BoundedExecutor, ml_pool
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Собирает одиночные запросы в батчи для batch_fn(items) -> results.
+
+    batch_fn выполняется в пуле executor и должна вернуть список
+    результатов той же длины и в том же порядке. Если батч упал,
+    элементы пересчитываются по одному — ошибку получает только
+    «плохой» запрос.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch: int,
+        max_wait_ms: float,
+        max_pending: int,
+        executor: BoundedExecutor
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.executor = executor
+        self.batches = 0
+        self.items = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_worker(self) -> None:
+        # Очередь и задача привязаны к event loop — создаём при первом запросе
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._has_items = self._has_items or asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Ставит item в очередь и ждёт его результат.
+
+        Raises:
+            HTTPException 429: Очередь переполнена
+        """
+        self._ensure_worker()
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "message": "Сервер перегружен, повторите попытку позже",
+                    "pool": self.name,
+                    "retry_after": self.executor.retry_after,
+                },
+                headers={"Retry-After": str(self.executor.retry_after)}
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self._has_items.set()
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        """Первый элемент ждём сколько угодно, остальные — до дедлайна."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            # Ждём сигнал о новом элементе, а не сам get(): отмена get()
+            # по таймауту могла бы потерять уже снятый из очереди элемент
+            self._has_items.clear()
+            try:
+                await asyncio.wait_for(self._has_items.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Клиент мог отключиться, пока запрос ждал в очереди
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                await self._run_batch(batch)
+            except HTTPException as e:
+                # Пул переполнен — пересчитывать по одному бессмысленно
+                self._fail(batch, e)
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch, e)
+                    continue
+                logger.warning(f"{self.name}: batch of {len(batch)} failed ({e}), retrying one by one")
+                for entry in batch:
+                    try:
+                        await self._run_batch([entry])
+                    except Exception as item_error:
+                        self._fail([entry], item_error)
+
+    async def _run_batch(self, batch: List[tuple]) -> None:
+        items = [item for item, _ in batch]
+        results = await self.executor.run(self.batch_fn, items)
+        if len(results) != len(items):
+            raise RuntimeError(
+                f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+            )
+
+        self.batches += 1
+        self.items += len(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[tuple], error: Exception) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": self.pending,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+
+# ─── Классификатор одежды ────────────────────────────────────────────────────
+
+def classify_images(images: list) -> List[dict]:
+    """Батч RGB-изображений -> результаты классификатора (в ml_pool)."""
+    from app.ml.classifier_backend import get_classifier
+    return get_classifier().predict_batch(images)
+
+
+classifier_batcher = MicroBatcher(
+    "classifier",
+    classify_images,
+    max_batch=settings.CLASSIFIER_BATCH_SIZE,
+    max_wait_ms=settings.CLASSIFIER_BATCH_WAIT_MS,
+    max_pending=settings.CLASSIFIER_BATCH_MAX_PENDING,
+    executor=ml_pool
+)
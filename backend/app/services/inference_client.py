@@ -0,0 +1,125 @@
+# =============================================================================
+# КЛИЕНТ СЕРВИСА ИНФЕРЕНСА (inference_client.py)
+# =============================================================================
+# Если задан INFERENCE_SERVICE_URL или INFERENCE_SERVICE_UDS, загрузки
+# обрабатывает отдельный процесс (backend/inference_service.py), а веб-воркер
+# только пересылает байты файла. Один httpx.AsyncClient на процесс держит
+# пул keep-alive соединений (TCP или Unix socket).
+#
+# Ошибки сервиса переводятся в HTTPException для клиента API:
+#   400/413/429 — пробрасываются как есть (с Retry-After для 429)
+#   недоступен / 5xx — 503
+# =============================================================================
+
+import logging
+from typing import Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.db.database import settings
+
+logger = logging.getLogger(__name__)
+
+# Коды сервиса, которые имеют смысл для клиента API
+PASSTHROUGH_STATUSES = {400, 413, 429}
+
+
+class InferenceClient:
+    """Асинхронный клиент сервиса инференса с пулом соединений."""
+
+    def __init__(
+        self,
+        base_url: str,
+        uds: str = "",
+        timeout: float = 60.0,
+        max_connections: int = 32
+    ):
+        # Для Unix socket хост в URL не важен, но httpx нужен абсолютный URL
+        self.base_url = base_url or "http://inference"
+        self.uds = uds
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.enabled = bool(base_url or uds)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Клиент привязан к event loop — создаём при первом запросе
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+            transport = httpx.AsyncHTTPTransport(uds=self.uds, limits=limits) if self.uds else None
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=limits,
+                transport=transport
+            )
+        return self._client
+
+    async def process_upload(self, data: bytes, file_id: str, plan: Optional[str] = None) -> Dict:
+        """
+        Отправляет фото на обработку (фон, категория, стиль, цвет).
+
+        plan — тарифный план пользователя (модель удаления фона).
+
+        Returns:
+            Dict: поля ответа /clothing/upload (как у upload_pipeline.process_upload)
+
+        Raises:
+            HTTPException 400/413/429: Ошибка от сервиса
+            HTTPException 503: Сервис недоступен
+        """
+        try:
+            response = await self._get_client().post(
+                "/v1/process",
+                params={"file_id": file_id, "plan": plan or "free"},
+                content=data,
+                headers={"Content-Type": "application/octet-stream"}
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"Inference service unavailable: {e!r}")
+            raise HTTPException(status_code=503, detail="Сервис распознавания недоступен")
+
+        if response.status_code in PASSTHROUGH_STATUSES:
+            headers = None
+            if "Retry-After" in response.headers:
+                headers = {"Retry-After": response.headers["Retry-After"]}
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=_error_detail(response),
+                headers=headers
+            )
+        if response.status_code != 200:
+            logger.error(f"Inference service error {response.status_code}: {response.text[:500]}")
+            raise HTTPException(status_code=503, detail="Сервис распознавания недоступен")
+
+        return response.json()
+
+    async def health(self) -> Dict:
+        """Состояние сервиса (модели, пулы) — для админки/мониторинга."""
+        response = await self._get_client().get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _error_detail(response: httpx.Response):
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
+
+
+inference_client = InferenceClient(
+    settings.INFERENCE_SERVICE_URL,
+    uds=settings.INFERENCE_SERVICE_UDS,
+    timeout=settings.INFERENCE_SERVICE_TIMEOUT,
+    max_connections=settings.INFERENCE_SERVICE_MAX_CONNECTIONS
+)
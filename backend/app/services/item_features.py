@@ -0,0 +1,131 @@
+# =============================================================================
+# СЕРВИС ПРИЗНАКОВ ВЕЩЕЙ (item_features.py)
+# =============================================================================
+# Вычисляет и сохраняет компактные признаки вещи (ClothingItemFeatures):
+# индекс цвета, индекс стиля, маску сезонов, слот категории, температуру.
+# Генератор образов читает их напрямую, без разбора JSON-полей.
+# =============================================================================
+
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+from app.models.features import ClothingItemFeatures
+from app.ml.outfit_scorer import encode_item_features
+from app.ml.outfit_engine import category_slot
+
+# Версия кодирования признаков. При изменении правил кодирования
+# увеличиваем — устаревшие записи пересчитаются при следующей загрузке.
+ITEM_FEATURES_VERSION = 1
+
+# Признаки, которые получает генератор (features_to_dict)
+FEATURE_KEYS = (
+    "color_idx", "style_idx", "season_mask", "occasion_mask",
+    "category_slot", "temp_min", "temp_max",
+)
+
+
+def compute_item_features(item: models.ClothingItem) -> Dict[str, Optional[int]]:
+    """Вычисляет признаки вещи из её полей (color/style/season — JSON-строки)."""
+    encoded = encode_item_features({
+        "color": item.color,
+        "style": item.style,
+        "season": item.season,
+    })
+    return {
+        **encoded,
+        "category_slot": category_slot(item.category),
+        "temp_min": item.temp_min,
+        "temp_max": item.temp_max,
+    }
+
+
+def feature_row(item: models.ClothingItem) -> Dict[str, Optional[int]]:
+    """Строка clothing_item_features для вещи (для INSERT)."""
+    return {
+        "item_id": item.id,
+        "owner_id": item.owner_id,
+        "version": ITEM_FEATURES_VERSION,
+        **compute_item_features(item),
+    }
+
+
+def features_to_dict(features: ClothingItemFeatures) -> Dict[str, Optional[int]]:
+    """Признаки из БД в формате, который принимает генератор/скорер."""
+    return {key: getattr(features, key) for key in FEATURE_KEYS}
+
+
+async def save_item_features(
+    db: AsyncSession,
+    item: models.ClothingItem,
+    features: Optional[ClothingItemFeatures] = None
+) -> ClothingItemFeatures:
+    """
+    Создаёт или обновляет признаки вещи в сессии (commit — за вызывающим).
+
+    Args:
+        db: Сессия базы данных
+        item: Вещь (должна иметь id)
+        features: Уже загруженная запись признаков (чтобы не делать лишний SELECT)
+    """
+    if features is None:
+        features = await db.get(ClothingItemFeatures, item.id)
+    if features is None:
+        features = ClothingItemFeatures(item_id=item.id)
+        db.add(features)
+
+    features.owner_id = item.owner_id
+    features.version = ITEM_FEATURES_VERSION
+    for key, value in compute_item_features(item).items():
+        setattr(features, key, value)
+
+    return features
+
+
+async def load_wardrobe_features(
+    db: AsyncSession,
+    owner_id: int
+) -> List[Tuple[models.ClothingItem, Dict[str, Optional[int]]]]:
+    """
+    Загружает вещи пользователя вместе с признаками одним запросом.
+
+    Вещи без признаков (созданные до появления таблицы, seed и т.п.) или
+    с устаревшей версией кодирования пересчитываются и сохраняются одним
+    INSERT ... ON CONFLICT DO UPDATE: параллельные генерации того же
+    пользователя пересчитывают одни и те же вещи, и обычный INSERT
+    проигравшей падал бы на первичном ключе.
+
+    Returns:
+        List[(ClothingItem, признаки)]
+    """
+    result = await db.execute(
+        select(models.ClothingItem, ClothingItemFeatures)
+        .outerjoin(ClothingItemFeatures, ClothingItemFeatures.item_id == models.ClothingItem.id)
+        .filter(models.ClothingItem.owner_id == owner_id)
+    )
+
+    wardrobe = []
+    backfill = []
+    for item, features in result.all():
+        if features is None or features.version != ITEM_FEATURES_VERSION:
+            row = feature_row(item)
+            backfill.append(row)
+            wardrobe.append((item, {key: row[key] for key in FEATURE_KEYS}))
+        else:
+            wardrobe.append((item, features_to_dict(features)))
+
+    if backfill:
+        stmt = insert(ClothingItemFeatures).values(backfill)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[ClothingItemFeatures.item_id],
+            set_={
+                key: stmt.excluded[key]
+                for key in ("owner_id", "version", *FEATURE_KEYS)
+            },
+        ))
+        await db.commit()
+
+    return wardrobe
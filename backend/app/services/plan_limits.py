@@ -6,8 +6,8 @@
 # =============================================================================
 
 from datetime import datetime, timezone
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+
+from app.db.mongo import get_app_mongo_db
 
 # ─── Конфигурация планов ─────────────────────────────────────────────────────
 PLAN_LIMITS = {
@@ -15,6 +15,7 @@ PLAN_LIMITS = {
         "max_outfits": 5,          # Максимум образов за генерацию
         "daily_generations": 10,    # Лимит генераций в день
         "has_stats": False,         # Доступ к статистике
+        "rembg_model": "u2net",     # Модель удаления фона (u2net | silueta | u2netp)
         "label": "Free",
         "label_ru": "Бесплатный",
     },
@@ -22,6 +23,7 @@ PLAN_LIMITS = {
         "max_outfits": 8,
         "daily_generations": None,  # Безлимитно
         "has_stats": False,
+        "rembg_model": "u2net",
         "label": "Basic",
         "label_ru": "Базовый",
     },
@@ -29,6 +31,7 @@ PLAN_LIMITS = {
         "max_outfits": 10,
         "daily_generations": None,
         "has_stats": True,
+        "rembg_model": "u2net",
         "label": "Premium",
         "label_ru": "Премиум",
     },
@@ -48,19 +51,9 @@ def get_max_outfits(plan: str) -> int:
 
 # ─── MongoDB счётчик дневных генераций ───────────────────────────────────────
 
-_mongo_client = None
-
-def _get_mongo_db():
-    global _mongo_client
-    if _mongo_client is None:
-        mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-        _mongo_client = AsyncIOMotorClient(mongo_url)
-    return _mongo_client["wardrobe_ai"]
-
-
 async def get_daily_generation_count(user_id: int) -> int:
     """Получает количество генераций пользователя за сегодня."""
-    db = _get_mongo_db()
+    db = get_app_mongo_db()
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
     doc = await db.generation_counters.find_one({
@@ -73,7 +66,7 @@ async def get_daily_generation_count(user_id: int) -> int:
 
 async def increment_generation_count(user_id: int) -> int:
     """Инкрементирует счётчик генераций. Возвращает новое значение."""
-    db = _get_mongo_db()
+    db = get_app_mongo_db()
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
     result = await db.generation_counters.find_one_and_update(
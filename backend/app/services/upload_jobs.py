@@ -0,0 +1,328 @@
+# =============================================================================
+# ФОНОВАЯ ОБРАБОТКА ЗАГРУЗОК (upload_jobs.py)
+# =============================================================================
+# Синхронный POST /clothing/upload держит соединение всё время удаления фона,
+# классификации и анализа цвета (nginx: proxy_read_timeout 300s). Асинхронный
+# режим:
+#
+#   POST /clothing/upload/async ──> 202 {file_id}  (байты — в локальную очередь)
+#                                        │
+#        воркеры процесса (asyncio) ─────┘── analyze_upload() по этапам
+#                                        │
+#   GET /clothing/upload/{file_id}/status <── статус, этап, тайминги, результат
+#
+# Статус хранится в MongoDB (upload_jobs) — его видит любая реплика
+# бекенда, а не только та, что приняла файл. Сами байты и очередь — в памяти
+# принявшего процесса; задачи, «зависшие» после его перезапуска, отдаются
+# как failed (UPLOAD_JOB_STALE_SECONDS без обновлений).
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.db.database import settings
+from app.services.inference_client import inference_client
+from app.db.mongo import get_app_mongo_db
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+
+# Статусы задачи
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+# Как часто перечитывать статус при долгом опросе (?wait=)
+POLL_INTERVAL = 0.5
+
+
+async def analyze_upload(data: bytes, file_id: str, plan: str,
+                         stats: Optional[Dict] = None, on_stage=None,
+                         digest: Optional[str] = None) -> Dict:
+    """
+    Пайплайн загрузки: локально или в сервисе инференса.
+
+    digest — SHA-256 data из upload_storage (сервис инференса считает его сам).
+
+    Returns:
+        Dict: поля ответа /clothing/upload (без file_id/filename/pending)
+    """
+    if inference_client.enabled:
+        # Модели в отдельном сервисе (inference_service.py), PNG он
+        # пишет в общий каталог uploads/; этапы там не видны
+        if on_stage is not None:
+            await on_stage("inference_service")
+        start = time.perf_counter()
+        analysis = await inference_client.process_upload(data, file_id, plan)
+        if stats is not None:
+            stats["stages_ms"] = {"inference_service": round((time.perf_counter() - start) * 1000, 1)}
+        return analysis
+
+    from app.services.upload_pipeline import process_upload
+    return await process_upload(data, file_id, UPLOAD_DIR, plan, stats=stats,
+                                on_stage=on_stage, digest=digest)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class UploadJobQueue:
+    """
+    Очередь фоновых загрузок процесса + статусы в MongoDB.
+
+    Очередь и воркеры привязаны к event loop — создаются при первой задаче.
+    """
+
+    def __init__(self, workers: int, max_queue: int, stale_seconds: int, ttl_seconds: int):
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.stale_seconds = stale_seconds
+        self.ttl_seconds = ttl_seconds
+        self.running = 0
+        self.counters = {DONE: 0, FAILED: 0, CANCELLED: 0}
+        self._stage_totals: Dict[str, float] = {}
+        self._stage_counts: Dict[str, int] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._index_ready = False
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._worker()))
+
+    async def _collection(self):
+        collection = get_app_mongo_db().upload_jobs
+        if not self._index_ready:
+            # Записи о задачах удаляются сами через ttl_seconds
+            await collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+            self._index_ready = True
+        return collection
+
+    # ─── Постановка и статус ─────────────────────────────────────────────
+
+    async def enqueue(self, user_id: int, filename: str, data: bytes, plan: str,
+                      digest: Optional[str] = None) -> Dict:
+        """
+        Ставит загрузку в очередь и возвращает её статус.
+
+        Raises:
+            HTTPException 429: Очередь переполнена
+        """
+        self._ensure_workers()
+        if self.queued >= self.max_queue:
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "message": "Сервер перегружен, повторите попытку позже",
+                    "pool": "upload_jobs",
+                    "retry_after": settings.POOL_RETRY_AFTER,
+                },
+                headers={"Retry-After": str(settings.POOL_RETRY_AFTER)}
+            )
+
+        file_id = str(uuid.uuid4())
+        now = _now()
+        doc = {
+            "_id": file_id,
+            "user_id": user_id,
+            "filename": filename,
+            "status": QUEUED,
+            "stage": None,
+            "stages_ms": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        collection = await self._collection()
+        await collection.insert_one(doc)
+
+        self._queue.put_nowait((file_id, filename, data, plan, digest))
+        doc["position"] = self.queued
+        return _public(doc)
+
+    async def get_status(self, file_id: str, user_id: int, wait: float = 0) -> Dict:
+        """
+        Статус задачи пользователя.
+
+        wait > 0 — долгий опрос: ответ приходит, как только сменится
+        статус или этап (или по истечении wait секунд).
+
+        Raises:
+            HTTPException 404: Задачи нет (или она чужая)
+        """
+        collection = await self._collection()
+        doc = await self._find(collection, file_id, user_id)
+        deadline = time.monotonic() + min(max(wait, 0), settings.UPLOAD_JOB_MAX_WAIT)
+        initial = (doc["status"], doc.get("stage"))
+
+        while doc["status"] not in FINISHED_STATUSES and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            doc = await self._find(collection, file_id, user_id)
+            if (doc["status"], doc.get("stage")) != initial:
+                break
+
+        return _public(doc)
+
+    async def _find(self, collection, file_id: str, user_id: int) -> Dict:
+        doc = await collection.find_one({"_id": file_id, "user_id": user_id})
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Upload job not found")
+
+        # Процесс, принявший файл, перезапустился — задача уже не выполнится
+        stale_before = _now() - timedelta(seconds=self.stale_seconds)
+        updated_at = doc["updated_at"]
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if doc["status"] in (QUEUED, PROCESSING) and updated_at < stale_before:
+            doc["status"] = FAILED
+            doc["error"] = "Обработка прервана, загрузите фото ещё раз"
+        return doc
+
+    async def cancel(self, file_id: str, user_id: int) -> bool:
+        """Отменяет незавершённую задачу. False — задачи нет или она завершена."""
+        collection = await self._collection()
+        result = await collection.update_one(
+            {"_id": file_id, "user_id": user_id, "status": {"$in": [QUEUED, PROCESSING]}},
+            {"$set": {"status": CANCELLED, "updated_at": _now()}}
+        )
+        return result.modified_count > 0
+
+    # ─── Воркеры ─────────────────────────────────────────────────────────
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self.running += 1
+            try:
+                await self._process(*job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Upload job {job[0]} crashed: {e}")
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _process(self, file_id: str, filename: str, data: bytes, plan: str,
+                       digest: Optional[str]) -> None:
+        collection = await self._collection()
+
+        # Отменена, пока ждала в очереди (отмена могла прийти на другую реплику)
+        started = await collection.update_one(
+            {"_id": file_id, "status": QUEUED},
+            {"$set": {"status": PROCESSING, "updated_at": _now()}}
+        )
+        if started.modified_count == 0:
+            self.counters[CANCELLED] += 1
+            return
+
+        stats: Dict = {}
+
+        async def on_stage(stage: str) -> None:
+            await collection.update_one(
+                {"_id": file_id, "status": PROCESSING},
+                {"$set": {"stage": stage, "stages_ms": stats.get("stages_ms", {}), "updated_at": _now()}}
+            )
+
+        try:
+            analysis = await analyze_upload(data, file_id, plan, stats=stats,
+                                            on_stage=on_stage, digest=digest)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.warning(f"Upload job {file_id} failed: {detail}")
+            await collection.update_one(
+                {"_id": file_id, "status": PROCESSING},
+                {"$set": {"status": FAILED, "error": detail,
+                          "stages_ms": stats.get("stages_ms", {}), "updated_at": _now()}}
+            )
+            self.counters[FAILED] += 1
+            return
+
+        result = {"file_id": file_id, "filename": filename, **analysis, "pending": True}
+        finished = await collection.update_one(
+            {"_id": file_id, "status": PROCESSING},
+            {"$set": {"status": DONE, "stage": None, "result": result,
+                      "stages_ms": stats.get("stages_ms", {}), "updated_at": _now()}}
+        )
+        if finished.modified_count == 0:
+            # Отменили во время обработки — результат никому не нужен
+            path = f"{UPLOAD_DIR}/{file_id}.png"
+            if os.path.exists(path):
+                os.remove(path)
+            self.counters[CANCELLED] += 1
+            return
+
+        self.counters[DONE] += 1
+        for stage, ms in stats.get("stages_ms", {}).items():
+            self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + ms
+            self._stage_counts[stage] = self._stage_counts.get(stage, 0) + 1
+
+    # ─── Метрики ─────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": self.running,
+            "done": self.counters[DONE],
+            "failed": self.counters[FAILED],
+            "cancelled": self.counters[CANCELLED],
+            "avg_stage_ms": {
+                stage: round(total / self._stage_counts[stage], 1)
+                for stage, total in self._stage_totals.items()
+            },
+        }
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+def _public(doc: Dict) -> Dict:
+    """Документ MongoDB -> ответ API."""
+    public = {
+        "file_id": doc["_id"],
+        "status": doc["status"],
+        "stage": doc.get("stage"),
+        "stages_ms": doc.get("stages_ms", {}),
+        "created_at": doc["created_at"],
+        "updated_at": doc["updated_at"],
+    }
+    if "position" in doc:
+        public["position"] = doc["position"]
+    if doc["status"] == DONE:
+        public["result"] = doc["result"]
+    if doc.get("error"):
+        public["error"] = doc["error"]
+    return public
+
+
+upload_jobs = UploadJobQueue(
+    workers=settings.UPLOAD_JOB_WORKERS,
+    max_queue=settings.UPLOAD_JOB_MAX_QUEUE,
+    stale_seconds=settings.UPLOAD_JOB_STALE_SECONDS,
+    ttl_seconds=settings.UPLOAD_JOB_TTL
+)
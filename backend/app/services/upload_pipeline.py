@@ -0,0 +1,336 @@
+# =============================================================================
+# ПАЙПЛАЙН ОБРАБОТКИ ЗАГРУЖЕННОГО ФОТО (upload_pipeline.py)
+# =============================================================================
+# Этапы для POST /clothing/upload:
+# 1. Декодирование байтов загрузки — один раз (ImageContext)
+# 2. Удаление фона (rembg, пул сессий; модель по плану, под нагрузкой —
+#    лёгкая) и сохранение PNG; повторные фото — из кэша по SHA-256 (bg_cache)
+# 3. Классификация (категория + стиль) и анализ цвета (одна кластеризация
+#    на цвет, палитру и многоцветность) — параллельно: классификатор
+#    через микро-батчинг в ml_pool (inference_batcher), кластеризация
+#    в cpu_pool
+#
+# Этапы передают друг другу ImageContext, а не пути к файлам: файл
+# пишется на диск один раз (итоговый PNG), повторных декодирований нет.
+# Каждый этап при ошибке подставляет значение по умолчанию, кроме 429
+# от пулов — он пробрасывается наружу.
+# =============================================================================
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.db.database import settings
+from app.ml.image_context import ImageContext
+from app.services.bg_cache import bg_cache
+from app.services.executors import cpu_pool, ml_pool
+from app.services.inference_batcher import classifier_batcher
+from app.services.plan_limits import PLAN_LIMITS, get_plan_limits
+
+logger = logging.getLogger(__name__)
+
+# Результат классификатора, если модель недоступна
+FALLBACK_PREDICTION = {
+    'id': 'tee', 'name': 'Футболка', 'confidence': 0.0,
+    'style': 'casual', 'style_confidence': 0.0,
+    'seasons': ['spring', 'summer', 'fall'],
+    'temp_min': 15, 'temp_max': 35, 'waterproof_level': 0
+}
+
+FALLBACK_COLOR = {'name_en': 'gray', 'hex': '#808080'}
+
+# on_stage(name) — уведомление о начале этапа
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+# ─── Этапы (выполняются в пулах) ─────────────────────────────────────────────
+
+def decode_upload(data: bytes) -> ImageContext:
+    """
+    Декодирует загруженный файл.
+
+    В режиме REMBG_DOWNSCALE сразу ограничивает размер до
+    REMBG_MAX_OUTPUT_EDGE — больше в итоговый PNG всё равно не попадёт.
+    """
+    max_edge = settings.REMBG_MAX_OUTPUT_EDGE if settings.REMBG_DOWNSCALE else 0
+    return ImageContext.from_bytes(data, max_edge=max_edge)
+
+
+def choose_rembg_model(plan: Optional[str]) -> str:
+    """
+    Модель удаления фона: по плану пользователя, а при очереди в ml_pool
+    не меньше REMBG_FALLBACK_QUEUE_DEPTH — лёгкая REMBG_LIGHT_MODEL.
+    """
+    depth = settings.REMBG_FALLBACK_QUEUE_DEPTH
+    if depth > 0 and ml_pool.in_flight >= depth:
+        return settings.REMBG_LIGHT_MODEL
+    return get_plan_limits(plan or "free")["rembg_model"]
+
+
+def rembg_models_in_use() -> List[str]:
+    """Модели удаления фона, которые стоит загрузить при старте."""
+    models = {limits["rembg_model"] for limits in PLAN_LIMITS.values()}
+    if settings.REMBG_FALLBACK_QUEUE_DEPTH > 0:
+        models.add(settings.REMBG_LIGHT_MODEL)
+    return sorted(models)
+
+
+def _rembg_params(model_name: str) -> Tuple[Dict, str]:
+    """Параметры удаления фона и вариант модели для ключа кэша."""
+    if not settings.REMBG_DOWNSCALE:
+        return {}, model_name
+    params = {
+        "work_edge": settings.REMBG_WORK_EDGE,
+        "max_output_edge": settings.REMBG_MAX_OUTPUT_EDGE,
+    }
+    # Результаты разных режимов не взаимозаменяемы — разные записи в кэше
+    return params, f"{model_name}-w{params['work_edge']}-m{params['max_output_edge']}"
+
+
+def _write_file(path: str, data: bytes) -> None:
+    # tmp + os.replace: path мог оказаться жёсткой ссылкой на запись кэша
+    # (а через неё — на блобы); запись в него на месте испортила бы их
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _restore_cached(digest: str, cache_variant: str, final_path: str) -> Optional[ImageContext]:
+    """
+    PNG из кэша в final_path (жёсткая ссылка) -> контекст; None — промах.
+
+    Битая запись удаляется из кэша, а фон удаляется заново.
+    """
+    if not bg_cache.restore(digest, cache_variant, final_path):
+        return None
+    try:
+        return ImageContext.from_path(final_path)
+    except Exception as cache_error:
+        logger.warning(f'BG cache entry {digest[:12]} is corrupt, dropping: {cache_error}')
+        bg_cache.discard(digest, cache_variant)
+        # Только ссылку: сам inode могут разделять блобы
+        os.unlink(final_path)
+        return None
+
+
+def remove_background_and_save(ctx: ImageContext, final_path: str, model_name: str,
+                               digest: Optional[str] = None) -> Tuple[ImageContext, bool]:
+    """
+    Удаляет фон моделью model_name и сохраняет PNG в final_path.
+
+    Повторно загруженное фото берётся из кэша (bg_cache) без сегментации.
+    digest — SHA-256 загрузки, если уже посчитан при приёме (upload_storage).
+    Если RemBG не готов/недоступен — сохраняет исходный файл как есть.
+
+    Returns:
+        (контекст итогового изображения, удалён ли фон)
+    """
+    from app.ml.remover import get_remover_pool
+
+    params, cache_variant = _rembg_params(model_name)
+    if not bg_cache.enabled or not ctx.source_bytes:
+        digest = None
+    elif digest is None:
+        digest = bg_cache.digest(ctx.source_bytes)
+
+    # Вне try с фолбэком ниже: final_path здесь — ссылка на запись кэша
+    if digest:
+        cached = _restore_cached(digest, cache_variant, final_path)
+        if cached is not None:
+            logger.info(f'BG cache hit: {digest[:12]}')
+            return cached, True
+
+    try:
+        with get_remover_pool().acquire(model_name) as remover:
+            result = remover.remove_background_image(ctx, **params)
+        result.save_png(final_path)
+
+        if digest:
+            try:
+                bg_cache.put(digest, cache_variant, final_path)
+            except OSError as cache_error:
+                logger.warning(f'BG cache write failed: {cache_error}')
+        return result, True
+    except Exception as bg_error:
+        logger.warning(f'RemBG fallback, using original file: {bg_error}')
+        print(f'[UPLOAD] RemBG fallback: {bg_error}', file=sys.stderr)
+        _write_file(final_path, ctx.source_bytes)
+        return ctx, False
+
+
+# ─── Пайплайн ────────────────────────────────────────────────────────────────
+
+async def _classify(ctx: ImageContext) -> Dict:
+    """Категория и стиль вещи (одним батчем с соседними загрузками)."""
+    try:
+        return await classifier_batcher.submit(ctx.image("RGB"))
+    except HTTPException:
+        raise
+    except Exception as clf_error:
+        logger.warning(f'Classifier fallback: {clf_error}')
+        print(f'[UPLOAD] Classifier fallback: {clf_error}', file=sys.stderr)
+        return dict(FALLBACK_PREDICTION)
+
+
+async def _analyze_colors(thumb: ImageContext) -> Optional[Dict]:
+    """Доминирующий цвет + палитра (None — анализ не удался)."""
+    from app.ml.color_extractor import analyze_colors
+
+    try:
+        return await cpu_pool.run(
+            analyze_colors, thumb, k=4, backend=settings.COLOR_ANALYSIS_BACKEND
+        )
+    except HTTPException:
+        raise
+    except Exception as color_error:
+        logger.warning(f'Color extraction fallback: {color_error}')
+        print(f'[UPLOAD] Color fallback: {color_error}', file=sys.stderr)
+        return None
+
+
+@asynccontextmanager
+async def _stage(name: str, stats: Optional[Dict], on_stage: Optional[StageCallback]):
+    """Отмечает начало этапа и записывает его длительность в stats["stages_ms"]."""
+    if stats is not None:
+        stats["stage"] = name
+    if on_stage is not None:
+        await on_stage(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.setdefault("stages_ms", {})[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _timed(coro: Awaitable, name: str, stats: Optional[Dict]):
+    """Длительность одного из параллельных подэтапов."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        if stats is not None:
+            stats.setdefault("stages_ms", {})[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def process_upload(data: bytes, file_id: str, upload_dir: str,
+                         plan: Optional[str] = None, stats: Optional[Dict] = None,
+                         on_stage: Optional[StageCallback] = None,
+                         digest: Optional[str] = None) -> Dict:
+    """
+    Обрабатывает загруженное фото: фон, категория, стиль, цвет, палитра.
+
+    Итоговый PNG сохраняется в {upload_dir}/{file_id}.png.
+    plan — тарифный план пользователя (модель удаления фона),
+    digest — SHA-256 data, если уже посчитан (ключ кэша удаления фона).
+
+    Если передан stats, заполняет stats["stage"] (текущий этап) и
+    stats["stages_ms"] (длительность этапов); on_stage(name) вызывается
+    в начале каждого этапа (прогресс фоновых загрузок, upload_jobs.py).
+
+    Returns:
+        Dict: поля ответа /clothing/upload (без file_id/filename/pending)
+
+    Raises:
+        HTTPException 400: Файл не является изображением
+        HTTPException 429: Пулы переполнены
+    """
+    from app.ml.color_extractor import suggest_color_variants
+
+    # Шаг 1: Декодируем один раз
+    try:
+        async with _stage("decode", stats, on_stage):
+            ctx = await ml_pool.run(decode_upload, data)
+    except HTTPException:
+        raise
+    except Exception as decode_error:
+        raise HTTPException(status_code=400, detail=f"Не удалось прочитать изображение: {decode_error}")
+
+    final_path = f"{upload_dir}/{file_id}.png"  # Всегда PNG для прозрачности
+
+    try:
+        # Шаг 2: Удаление фона через RemBG (делаем СНАЧАЛА!)
+        logger.info("🖼️ Удаление фона...")
+        print("🖼️ [UPLOAD] Удаление фона...", file=sys.stderr)
+
+        # Модель выбираем до постановки в очередь — по её текущей длине
+        rembg_model = choose_rembg_model(plan)
+        async with _stage("remove_background", stats, on_stage):
+            ctx, removed = await ml_pool.run(remove_background_and_save, ctx, final_path, rembg_model, digest)
+        if removed:
+            logger.info(f'BG removed ({rembg_model}): {final_path}')
+            print(f'[UPLOAD] BG removed ({rembg_model}): {final_path}', file=sys.stderr)
+
+        # Шаг 3: Классификация и цвет — параллельно, в разных пулах.
+        # В пул процессов отправляем только уменьшенную копию
+        logger.info("🤖 Классификация и извлечение цвета...")
+        print("🤖 [UPLOAD] Классификация и извлечение цвета...", file=sys.stderr)
+
+        thumb = ctx.thumbnail()
+        async with _stage("analyze", stats, on_stage):
+            prediction, colors = await asyncio.gather(
+                _timed(_classify(ctx), "classify", stats),
+                _timed(_analyze_colors(thumb), "colors", stats)
+            )
+    except HTTPException:
+        # Пул переполнен посреди обработки — результат неполный, удаляем его
+        if os.path.exists(final_path):
+            os.remove(final_path)
+        raise
+
+    category = prediction.get("id", "tee")
+    confidence = prediction.get("confidence", 0.0)
+
+    logger.info(f"🎯 Классификация: {prediction.get('name')} ({category}) - {confidence*100:.1f}%")
+    print(f"🎯 [UPLOAD] Классификация: {prediction.get('name')} ({category}) - {confidence*100:.1f}%", file=sys.stderr)
+
+    color_info = colors["dominant"] if colors else dict(FALLBACK_COLOR)
+    color_id = color_info.get("name_en", "gray")
+    color_hex = color_info.get("hex", "#808080")
+
+    if colors:
+        palette_hexes = [c.get('hex', '#808080') for c in colors["palette"]]
+        is_multicolor = colors["is_multicolor"]
+    else:
+        palette_hexes = [color_hex]
+        is_multicolor = False
+
+    logger.info(f"🎨 Цвет: {color_id} ({color_hex}), палитра: {palette_hexes}")
+    print(f"🎨 [UPLOAD] Цвет: {color_id} ({color_hex})", file=sys.stderr)
+
+    # Шаг 4: Генерация 5 вариантов цвета для выбора пользователем
+    # (несколько HSL-преобразований — дешевле, чем пересылка в пул)
+    try:
+        async with _stage("suggestions", stats, on_stage):
+            color_rgb = tuple(color_info.get("rgb", [128, 128, 128]))
+            color_suggestions = suggest_color_variants(color_rgb, count=5)
+    except Exception:
+        color_suggestions = [{"id": color_id, "name_ru": color_id, "name_en": color_id, "label": "Определённый", "hex": color_hex, "rgb": [128, 128, 128]}]
+
+    return {
+        "image_path": final_path,
+        "category": category,
+        "color": color_id,
+        "confidence": confidence,
+        "style": prediction.get("style", "casual"),
+        "style_confidence": prediction.get("style_confidence", 0.0),
+        "seasons": prediction.get("seasons", []),
+        "temp_min": prediction.get("temp_min"),
+        "temp_max": prediction.get("temp_max"),
+        "waterproof_level": prediction.get("waterproof_level", 0),
+        "is_multicolor": is_multicolor,
+        "color_palette": palette_hexes,
+        "color_suggestions": color_suggestions,
+    }
@@ -0,0 +1,182 @@
+# =============================================================================
+# ПРИЁМ ЗАГРУЖЕННЫХ ФАЙЛОВ (upload_storage.py)
+# =============================================================================
+# Общий слой для эндпоинтов, принимающих изображения (вещи, аватарки):
+# - файл читается из UploadFile кусками по CHUNK_SIZE, без блокирующих
+#   open()/shutil.copyfileobj в потоке event loop (запись — aiofiles)
+# - тип определяется по первым байтам (сигнатуре), а не по имени файла —
+#   не-изображение отклоняется до чтения остального файла (415)
+# - превышение лимита размера обрывает чтение сразу (413)
+# - SHA-256 считается по ходу чтения — кэш удаления фона (bg_cache)
+#   не хэширует байты повторно
+# =============================================================================
+
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+# Сигнатуры поддерживаемых форматов: (смещение, байты) -> MIME
+IMAGE_SIGNATURES = (
+    ((0, b"\xff\xd8\xff"), "image/jpeg"),
+    ((0, b"\x89PNG\r\n\x1a\n"), "image/png"),
+    ((0, b"GIF87a"), "image/gif"),
+    ((0, b"GIF89a"), "image/gif"),
+    ((0, b"BM"), "image/bmp"),
+    ((8, b"WEBP"), "image/webp"),  # RIFF....WEBP
+)
+
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/bmp": "bmp",
+    "image/webp": "webp",
+}
+
+# Байт, достаточных для sniff_image_type
+SNIFF_BYTES = 12
+
+
+@dataclass
+class UploadedBytes:
+    """Загрузка, прочитанная в память."""
+    data: bytes
+    sha256: str
+    content_type: Optional[str]
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+@dataclass
+class StoredUpload:
+    """Загрузка, записанная на диск."""
+    path: str
+    size: int
+    sha256: str
+    content_type: Optional[str]
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME-тип изображения по первым байтам файла (None — не изображение)."""
+    for (offset, signature), content_type in IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type
+    return None
+
+
+def _require_image(head: bytes) -> str:
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Файл не является изображением (JPEG, PNG, WebP, GIF, BMP)"
+        )
+    return content_type
+
+
+async def _iter_chunks(file: UploadFile, max_bytes: int, sniff: bool = True):
+    """
+    (тип, кусок) файла; тип проверяется по первым байтам, размер — на каждом куске.
+
+    sniff=False — только лимит размера (не изображения, например zip), тип None.
+
+    Raises:
+        HTTPException 400: Пустой файл
+        HTTPException 413: Больше max_bytes
+        HTTPException 415: Не изображение
+    """
+    size = 0
+    head = b""
+    content_type = None
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Файл больше {max_bytes // MB} МБ")
+
+        if sniff and content_type is None:
+            # read() может вернуть меньше сигнатуры — копим заголовок
+            head += chunk
+            if len(head) < SNIFF_BYTES:
+                continue
+            content_type = _require_image(head)
+            chunk, head = head, b""
+        yield content_type, chunk
+
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Пустой файл")
+    if sniff and content_type is None:
+        # Файл короче SNIFF_BYTES
+        yield _require_image(head), head
+
+
+async def read_upload(file: UploadFile, max_bytes: int, sniff: bool = True) -> UploadedBytes:
+    """
+    Читает загрузку в память (для пайплайна, который работает с байтами).
+
+    sniff=False — без проверки типа (content_type будет None).
+
+    Raises:
+        HTTPException 400/413/415: см. _iter_chunks
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    content_type = None
+    async for content_type, chunk in _iter_chunks(file, max_bytes, sniff):
+        digest.update(chunk)
+        chunks.append(chunk)
+    return UploadedBytes(b"".join(chunks), digest.hexdigest(), content_type)
+
+
+async def save_upload(file: UploadFile, dest_dir: str, name: str, max_bytes: int,
+                      sniff: bool = True) -> StoredUpload:
+    """
+    Пишет загрузку в {dest_dir}/{name}.{ext}; ext — по реальному типу файла.
+
+    sniff=False — без проверки типа: файл пишется в {dest_dir}/{name}
+    (name с расширением), content_type будет None.
+
+    Файл пишется во временный *.part и переименовывается после проверок —
+    оборванная или отклонённая загрузка не оставляет полуфайлов.
+
+    Raises:
+        HTTPException 400/413/415: см. _iter_chunks
+    """
+    await aiofiles.os.makedirs(dest_dir, exist_ok=True)
+    part_path = os.path.join(dest_dir, f".{name}.{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    try:
+        async with aiofiles.open(part_path, "wb") as out:
+            async for content_type, chunk in _iter_chunks(file, max_bytes, sniff):
+                digest.update(chunk)
+                size += len(chunk)
+                await out.write(chunk)
+        if content_type is not None:
+            name = f"{name}.{IMAGE_EXTENSIONS[content_type]}"
+        path = os.path.join(dest_dir, name)
+        await aiofiles.os.replace(part_path, path)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+    return StoredUpload(path, size, digest.hexdigest(), content_type)
+
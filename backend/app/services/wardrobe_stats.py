@@ -0,0 +1,60 @@
+# =============================================================================
+# АГРЕГАЦИЯ СТАТИСТИКИ ГАРДЕРОБА (wardrobe_stats.py)
+# =============================================================================
+# Подсчёт распределений для /stats/overview вынесен в чистую функцию
+# без БД и FastAPI: для больших гардеробов её можно отправить в cpu_pool
+# (app/services/executors.py), не блокируя event loop разбором JSON.
+# =============================================================================
+
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+# (category, color, style, price) — по одной строке на вещь
+ItemStatsRow = Tuple[Optional[str], Optional[str], Optional[str], Optional[float]]
+
+
+def aggregate_wardrobe_items(rows: Iterable[ItemStatsRow]) -> Dict:
+    """
+    Распределение вещей по категориям/цветам/стилям и суммарная стоимость.
+
+    Args:
+        rows: Кортежи (category, color, style, price); style — JSON-массив или строка
+
+    Returns:
+        Dict: categories, colors, styles, total_price, items_with_price
+    """
+    category_counts = {}
+    color_counts = {}
+    style_counts = {}
+    total_price = 0.0
+    items_with_price = 0
+
+    for category, color, style, price in rows:
+        # Категории
+        cat = category or "unknown"
+        category_counts[cat] = category_counts.get(cat, 0) + 1
+
+        # Цвета
+        color = color or "unknown"
+        color_counts[color] = color_counts.get(color, 0) + 1
+
+        # Стили (JSON массив)
+        try:
+            styles = json.loads(style) if style else []
+        except (json.JSONDecodeError, TypeError):
+            styles = [style] if style else []
+        for s in styles:
+            style_counts[s] = style_counts.get(s, 0) + 1
+
+        # Стоимость
+        if price is not None:
+            total_price += price
+            items_with_price += 1
+
+    return {
+        "categories": category_counts,
+        "colors": color_counts,
+        "styles": style_counts,
+        "total_price": total_price,
+        "items_with_price": items_with_price,
+    }
@@ -0,0 +1,137 @@
+"""
+Проверка точности и скорости analyze_colors() против прежних функций.
+
+Для каждого изображения считает эталон прежним способом
+(extract_dominant_color k=3 + extract_color_palette k=4 — две кластеризации)
+и сравнивает с analyze_colors() на каждом бэкенде:
+- dominant_name_match — совпадение названия доминирующего цвета
+- dominant_rgb_delta  — расстояние в RGB между доминирующими цветами
+- multicolor_match    — совпадение is_multicolor
+- palette_names_jaccard — сходство множеств названий в палитре
+- время на изображение (эталон — обе прежние функции вместе)
+
+Запуск (из backend/):
+    python benchmark_colors.py                      # все картинки из uploads/
+    python benchmark_colors.py img1.png img2.jpg --output colors.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from app.ml.color_extractor import (
+    COLOR_BACKENDS,
+    MULTICOLOR_MIN_NAMES,
+    analyze_colors,
+    extract_color_palette,
+    extract_dominant_color,
+)
+from app.ml.image_context import ImageContext
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
+
+
+def legacy_analysis(ctx):
+    """Прежний путь загрузки: две независимые кластеризации."""
+    dominant = extract_dominant_color(ctx)
+    palette = extract_color_palette(ctx, k=4)
+    return {
+        "dominant": dominant,
+        "palette": palette,
+        "is_multicolor": len({c["name_en"] for c in palette}) >= MULTICOLOR_MIN_NAMES,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def compare(reference, candidate):
+    ref_rgb = np.asarray(reference["dominant"]["rgb"], dtype=np.float64)
+    cand_rgb = np.asarray(candidate["dominant"]["rgb"], dtype=np.float64)
+    ref_names = {c["name_en"] for c in reference["palette"]}
+    cand_names = {c["name_en"] for c in candidate["palette"]}
+    union = ref_names | cand_names
+    return {
+        "dominant_name_match": reference["dominant"]["name_en"] == candidate["dominant"]["name_en"],
+        "dominant_rgb_delta": float(np.linalg.norm(ref_rgb - cand_rgb)),
+        "multicolor_match": reference["is_multicolor"] == candidate["is_multicolor"],
+        "palette_names_jaccard": len(ref_names & cand_names) / len(union) if union else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Точность и скорость analyze_colors()")
+    parser.add_argument("images", nargs="*", help="Изображения (по умолчанию uploads/)")
+    parser.add_argument("--backends", nargs="+", default=list(COLOR_BACKENDS), choices=COLOR_BACKENDS)
+    parser.add_argument("--output", default="benchmark_colors.json")
+    args = parser.parse_args()
+
+    paths = args.images or sorted(
+        path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join("uploads", pattern))
+    )
+    if not paths:
+        parser.error("Нет изображений: передайте пути или положите файлы в uploads/")
+
+    legacy_ms = []
+    per_backend = {backend: {"ms": [], "checks": []} for backend in args.backends}
+    mismatches = []
+
+    for path in paths:
+        # Как в пайплайне загрузки: декодируем один раз, считаем по уменьшенной копии
+        thumb = ImageContext.from_path(path).thumbnail()
+        reference, ms = timed(legacy_analysis, thumb)
+        legacy_ms.append(ms)
+
+        for backend in args.backends:
+            result, ms = timed(analyze_colors, thumb, k=4, backend=backend)
+            check = compare(reference, result)
+            per_backend[backend]["ms"].append(ms)
+            per_backend[backend]["checks"].append(check)
+            if not check["dominant_name_match"]:
+                mismatches.append({
+                    "image": os.path.basename(path),
+                    "backend": backend,
+                    "legacy": reference["dominant"]["name_en"],
+                    "unified": result["dominant"]["name_en"],
+                })
+
+    report = {
+        "images": len(paths),
+        "legacy_ms_per_image": round(float(np.mean(legacy_ms)), 2),
+        "backends": {},
+        "dominant_mismatches": mismatches,
+    }
+    print(f"Изображений: {len(paths)}, прежний способ: {report['legacy_ms_per_image']:.1f} ms/фото")
+    for backend, data in per_backend.items():
+        checks = data["checks"]
+        summary = {
+            "ms_per_image": round(float(np.mean(data["ms"])), 2),
+            "speedup": round(float(np.mean(legacy_ms) / np.mean(data["ms"])), 2),
+            "dominant_name_match": round(float(np.mean([c["dominant_name_match"] for c in checks])), 3),
+            "dominant_rgb_delta_mean": round(float(np.mean([c["dominant_rgb_delta"] for c in checks])), 2),
+            "multicolor_match": round(float(np.mean([c["multicolor_match"] for c in checks])), 3),
+            "palette_names_jaccard": round(float(np.mean([c["palette_names_jaccard"] for c in checks])), 3),
+        }
+        report["backends"][backend] = summary
+        print(
+            f"  {backend:<10} {summary['ms_per_image']:>7.1f} ms (x{summary['speedup']}), "
+            f"доминирующий {summary['dominant_name_match']:.1%}, "
+            f"ΔRGB {summary['dominant_rgb_delta_mean']:.1f}, "
+            f"многоцветность {summary['multicolor_match']:.1%}, "
+            f"палитра {summary['palette_names_jaccard']:.2f}"
+        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
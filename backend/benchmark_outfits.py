@@ -0,0 +1,284 @@
+"""
+Бенчмарк генератора образов.
+
+Синтезирует гардеробы разного размера (категории из app/ml/attribute_mappings.py),
+прогоняет генерацию для каждого повода × категории погоды и пишет JSON:
+перцентили задержки, пиковый RSS, число оценённых комбинаций.
+Отдельно меряется score_outfit() и пакетная оценка на одних и тех же комбинациях.
+
+Каждый размер гардероба считается в отдельном процессе, чтобы пиковый RSS
+относился только к нему.
+
+Запуск (из backend/):
+    python benchmark_outfits.py
+    python benchmark_outfits.py --sizes 10 100 --repeat 5 --output bench.json
+    python benchmark_outfits.py --compare bench_main.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.ml.attribute_mappings import CATEGORY_GROUPS, get_attributes_for_category
+from app.ml.outfit_engine import build_outfit_pool, category_slot, select_diverse_outfits
+from app.ml.outfit_engine.search import estimate_combos
+from app.ml.outfit_engine.engine import group_items_by_slot
+from app.ml.outfit_engine.generator import iter_outfit_templates
+from app.ml.outfit_scorer import (
+    COLOR_VOCAB,
+    STYLE_VOCAB,
+    encode_item_features,
+    make_batch_scorer,
+    score_outfit,
+)
+from app.ml.style_matcher import OCCASION_STYLES
+
+BENCHMARK_VERSION = 1
+
+DEFAULT_SIZES = [10, 100, 500, 2000]
+OCCASIONS = list(OCCASION_STYLES.keys())
+WEATHER_CATEGORIES = ["cold", "cool", "warm", "hot"]
+PERCENTILES = [50, 90, 95, 99]
+
+# Доля групп категорий в типичном гардеробе
+GROUP_WEIGHTS = {
+    "Верх": 0.30,
+    "Свитеры и кардиганы": 0.12,
+    "Верхняя одежда": 0.08,
+    "Низ": 0.25,
+    "Платья и комбинезоны": 0.10,
+    "Обувь": 0.15,
+}
+
+# Нейтральные цвета встречаются чаще
+NEUTRAL_COLORS = {"black", "white", "gray", "beige", "brown", "navy"}
+
+
+def synthesize_wardrobe(size, seed=0):
+    """Гардероб из size вещей в формате строк БД (color/style/season — JSON)."""
+    rng = random.Random(seed)
+    groups = [g for g in CATEGORY_GROUPS if g["group"] in GROUP_WEIGHTS]
+    group_weights = [GROUP_WEIGHTS[g["group"]] for g in groups]
+    colors = [c for c in COLOR_VOCAB if c != "__other__"]
+    color_weights = [3 if c in NEUTRAL_COLORS else 1 for c in colors]
+
+    items = []
+    for i in range(size):
+        group = rng.choices(groups, weights=group_weights)[0]
+        category = rng.choice(group["categories"])
+        attrs = get_attributes_for_category(category)
+
+        item_colors = rng.choices(colors, weights=color_weights, k=rng.choice([1, 1, 1, 2]))
+        item_styles = rng.sample(STYLE_VOCAB, rng.choice([1, 1, 2]))
+
+        items.append({
+            "id": i + 1,
+            "filename": f"bench_{i}.png",
+            "image_path": f"uploads/bench_{i}.png",
+            "category": category,
+            "color": json.dumps(sorted(set(item_colors))),
+            "style": json.dumps(item_styles),
+            "season": json.dumps(attrs["seasons"]),
+            "temp_min": attrs["temp_min"],
+            "temp_max": attrs["temp_max"],
+        })
+    return items
+
+
+def compute_features(items):
+    """То же, что app/services/item_features.compute_item_features, без ORM."""
+    return [
+        {
+            **encode_item_features(item),
+            "category_slot": category_slot(item["category"]),
+            "temp_min": item["temp_min"],
+            "temp_max": item["temp_max"],
+        }
+        for item in items
+    ]
+
+
+def summarize(samples_ms):
+    values = np.asarray(samples_ms, dtype=np.float64)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 3)
+    summary["max"] = round(float(values.max()), 3)
+    summary["n"] = int(values.size)
+    return summary
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса (ru_maxrss: КБ в Linux, байты в macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def bench_scorer(items, features, samples, seed):
+    """score_outfit() по одной комбинации против пакетной оценки."""
+    rng = random.Random(seed)
+    combos = [rng.sample(items, min(len(items), rng.randint(2, 5))) for _ in range(samples)]
+
+    start = time.perf_counter()
+    for combo in combos:
+        score_outfit(combo, "casual", "warm")
+    python_s = time.perf_counter() - start
+
+    scorer = make_batch_scorer(items, "casual", "warm", features)
+    start = time.perf_counter()
+    scorer(combos)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "combos": samples,
+        "score_outfit_us": round(python_s / samples * 1e6, 3),
+        "batch_us": round(batch_s / samples * 1e6, 3),
+    }
+
+
+def bench_size(size, repeat, warmup, count, search_mode, seed, scorer_samples):
+    """Все поводы × погода для одного размера гардероба (запускается в отдельном процессе)."""
+    items = synthesize_wardrobe(size, seed)
+    features = compute_features(items)
+    rng = random.Random(seed)
+
+    cases = []
+    all_total_ms = []
+    for occasion in OCCASIONS:
+        for weather in WEATHER_CATEGORIES:
+            groups = group_items_by_slot(items, features, weather)
+            combos = estimate_combos(list(iter_outfit_templates(*groups, weather)))
+
+            pool_ms, total_ms = [], []
+            stats = {}
+            for run in range(warmup + repeat):
+                stats = {}
+                start = time.perf_counter()
+                pool = build_outfit_pool(items, features, occasion, weather, count, search_mode, stats)
+                pool_done = time.perf_counter()
+                select_diverse_outfits(pool, count, rng=rng)
+                done = time.perf_counter()
+                if run >= warmup:
+                    pool_ms.append((pool_done - start) * 1000)
+                    total_ms.append((done - start) * 1000)
+
+            all_total_ms.extend(total_ms)
+            cases.append({
+                "occasion": occasion,
+                "weather": weather,
+                "search_mode": stats.get("mode"),
+                "combos_total": combos,
+                "combos_evaluated": stats.get("evaluated"),
+                "pruned": stats.get("pruned"),
+                "pool_size": len(pool),
+                "pool_ms": summarize(pool_ms),
+                "total_ms": summarize(total_ms),
+            })
+
+    return {
+        "size": size,
+        "latency_ms": summarize(all_total_ms),
+        "combos_evaluated": sum(c["combos_evaluated"] or 0 for c in cases),
+        "scorer": bench_scorer(items, features, scorer_samples, seed),
+        "peak_rss_mb": peak_rss_mb(),
+        "cases": cases,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Печатает изменение p50/p95 относительно прошлого прогона."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["size"]: r for r in json.load(f)["results"]}
+
+    print(f"\nСравнение с {baseline_path}:")
+    for result in results:
+        base = baseline.get(result["size"])
+        if base is None:
+            continue
+        parts = []
+        for key in ("p50", "p95"):
+            old, new = base["latency_ms"][key], result["latency_ms"][key]
+            delta = (new - old) / old * 100 if old else 0.0
+            parts.append(f"{key} {old:.1f} -> {new:.1f} ms ({delta:+.1f}%)")
+        print(f"  {result['size']:>5} вещей: " + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк генератора образов")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="Замеров на каждый повод × погоду")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--count", type=int, default=5, help="Сколько образов генерировать")
+    parser.add_argument("--search-mode", default="auto", choices=["auto", "exhaustive", "branch_and_bound"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scorer-samples", type=int, default=2000)
+    parser.add_argument("--output", default="benchmark_outfits.json")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        # Новый процесс на каждый размер — чистый пиковый RSS
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result = pool.submit(
+                bench_size, size, args.repeat, args.warmup, args.count,
+                args.search_mode, args.seed, args.scorer_samples
+            ).result()
+        results.append(result)
+        latency = result["latency_ms"]
+        print(
+            f"{size:>5} вещей: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+            f"max {latency['max']:.1f} ms, комбинаций {result['combos_evaluated']}, "
+            f"RSS {result['peak_rss_mb']} MB"
+        )
+
+    report = {
+        "benchmark": "outfit_generator",
+        "version": BENCHMARK_VERSION,
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "count": args.count,
+            "search_mode": args.search_mode,
+            "seed": args.seed,
+            "occasions": OCCASIONS,
+            "weather_categories": WEATHER_CATEGORIES,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
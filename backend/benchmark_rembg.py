@@ -0,0 +1,196 @@
+"""
+Удаление фона: прежний режим (rembg на полном кадре) vs режим с уменьшением.
+
+Для каждого режима в отдельном процессе (чтобы пиковая память не
+смешивалась) декодирует и обрабатывает все изображения так же, как
+пайплайн загрузки, и измеряет:
+- время на изображение (декодирование + удаление фона)
+- RSS после загрузки модели и пиковый RSS (VmHWM), прирост пика над моделью
+- расхождение маски с прежним режимом: средняя |Δalpha| и IoU непрозрачной
+  области (маски сравниваются в одном масштабе)
+
+Телефонные фото можно имитировать: --megapixels 12 пересохраняет входные
+картинки в JPEG нужного размера.
+
+Запуск (из backend/):
+    python benchmark_rembg.py                              # uploads/
+    python benchmark_rembg.py img1.jpg --megapixels 12 --output rembg.json
+    python benchmark_rembg.py --work-edge 768 --max-output-edge 1600
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
+
+# Маски сравниваются в этом масштабе (большая сторона)
+COMPARE_EDGE = 512
+
+
+def read_status_mb(field: str) -> float:
+    """VmRSS / VmHWM текущего процесса из /proc (Linux), МБ."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_phone_photos(paths, megapixels: float, out_dir: str):
+    """Пересохраняет картинки в JPEG ~megapixels Мп (как фото с телефона)."""
+    result = []
+    for path in paths:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            scale = (megapixels * 1e6 / (img.width * img.height)) ** 0.5
+            img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+            out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".jpg")
+            img.save(out_path, "JPEG", quality=92)
+            result.append(out_path)
+    return result
+
+
+def run_mode(mode, paths, model_name, work_edge, max_output_edge, alpha_dir, queue):
+    """Дочерний процесс: один режим на всех изображениях."""
+    from app.ml.image_context import ImageContext
+    from app.ml.remover import BackgroundRemover
+
+    remover = BackgroundRemover(model_name)
+    rss_model = read_status_mb("VmRSS")
+
+    downscale = mode == "downscale"
+    params = {"work_edge": work_edge, "max_output_edge": max_output_edge} if downscale else {}
+
+    timings = []
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            data = f.read()
+        start = time.perf_counter()
+        ctx = ImageContext.from_bytes(data, max_edge=max_output_edge if downscale else 0)
+        result = remover.remove_background_image(ctx, **params)
+        timings.append((time.perf_counter() - start) * 1000)
+
+        alpha = result.image("RGBA").getchannel("A")
+        alpha.thumbnail((COMPARE_EDGE, COMPARE_EDGE))
+        np.save(os.path.join(alpha_dir, f"{mode}_{i}.npy"), np.asarray(alpha))
+        queue.put(("size", mode, i, result.size))
+
+    queue.put(("done", mode, {
+        "ms": timings,
+        "rss_model_mb": rss_model,
+        "peak_rss_mb": read_status_mb("VmHWM"),
+    }))
+
+
+def run_in_process(mode, paths, args, alpha_dir):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=run_mode,
+        args=(mode, paths, args.model, args.work_edge, args.max_output_edge, alpha_dir, queue),
+    )
+    proc.start()
+    sizes, stats = {}, None
+    while stats is None:
+        kind, _, *payload = queue.get()
+        if kind == "size":
+            sizes[payload[0]] = payload[1]
+        else:
+            stats = payload[0]
+    proc.join()
+    stats["output_sizes"] = [sizes[i] for i in range(len(paths))]
+    return stats
+
+
+def compare_alpha(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    if candidate.shape != reference.shape:
+        candidate = np.asarray(Image.fromarray(candidate).resize(reference.shape[::-1], Image.BILINEAR))
+    ref_mask, cand_mask = reference > 128, candidate > 128
+    union = np.logical_or(ref_mask, cand_mask).sum()
+    return {
+        "alpha_mae": float(np.abs(reference.astype(np.int16) - candidate.astype(np.int16)).mean()),
+        "iou": float(np.logical_and(ref_mask, cand_mask).sum() / union) if union else 1.0,
+    }
+
+
+def summarize(stats):
+    return {
+        "ms_per_image": round(float(np.mean(stats["ms"])), 1),
+        "ms_p95": round(float(np.percentile(stats["ms"], 95)), 1),
+        "rss_model_mb": round(stats["rss_model_mb"], 1),
+        "peak_rss_mb": round(stats["peak_rss_mb"], 1),
+        "peak_over_model_mb": round(stats["peak_rss_mb"] - stats["rss_model_mb"], 1),
+        "max_output_size": max(stats["output_sizes"], key=lambda s: s[0] * s[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rembg: полный кадр vs уменьшение перед сегментацией")
+    parser.add_argument("images", nargs="*", help="Изображения (по умолчанию uploads/)")
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--work-edge", type=int, default=1024)
+    parser.add_argument("--max-output-edge", type=int, default=2048)
+    parser.add_argument("--megapixels", type=float, default=0, help="Пересохранить входы в JPEG N Мп")
+    parser.add_argument("--output", default="benchmark_rembg.json")
+    args = parser.parse_args()
+
+    paths = args.images or sorted(
+        path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join("uploads", pattern))
+    )
+    if not paths:
+        parser.error("Нет изображений: передайте пути или положите файлы в uploads/")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.megapixels > 0:
+            paths = make_phone_photos(paths, args.megapixels, tmp)
+
+        per_mode = {mode: run_in_process(mode, paths, args, tmp) for mode in ("full", "downscale")}
+
+        checks = [
+            compare_alpha(np.load(os.path.join(tmp, f"full_{i}.npy")), np.load(os.path.join(tmp, f"downscale_{i}.npy")))
+            for i in range(len(paths))
+        ]
+
+    report = {
+        "images": len(paths),
+        "megapixels": args.megapixels or None,
+        "model": args.model,
+        "work_edge": args.work_edge,
+        "max_output_edge": args.max_output_edge,
+        "modes": {mode: summarize(stats) for mode, stats in per_mode.items()},
+        "mask": {
+            "alpha_mae_mean": round(float(np.mean([c["alpha_mae"] for c in checks])), 2),
+            "iou_mean": round(float(np.mean([c["iou"] for c in checks])), 4),
+            "iou_min": round(float(np.min([c["iou"] for c in checks])), 4),
+        },
+    }
+
+    full, down = report["modes"]["full"], report["modes"]["downscale"]
+    print(f"Изображений: {len(paths)}, модель {args.model}, work_edge={args.work_edge}, max_output_edge={args.max_output_edge}")
+    for mode, summary in report["modes"].items():
+        print(
+            f"  {mode:<10} {summary['ms_per_image']:>8.1f} ms (p95 {summary['ms_p95']:.1f}), "
+            f"пик RSS {summary['peak_rss_mb']:.0f} MB (+{summary['peak_over_model_mb']:.0f} над моделью), "
+            f"выход до {summary['max_output_size'][0]}x{summary['max_output_size'][1]}"
+        )
+    print(
+        f"Ускорение x{full['ms_per_image'] / down['ms_per_image']:.2f}, "
+        f"маска: |Δalpha| {report['mask']['alpha_mae_mean']:.2f}, IoU {report['mask']['iou_mean']:.4f} "
+        f"(мин. {report['mask']['iou_min']:.4f})"
+    )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# =============================================================================
+# СЕРВИС ИНФЕРЕНСА (inference_service.py)
+# =============================================================================
+# Отдельный процесс, в котором живут модели: классификатор (ResNet-50,
+# torch или onnx), удаление фона (rembg / U²-Net) и анализ цвета.
+# Веб-воркеры (main.py) ходят сюда через app/services/inference_client.py
+# и сами torch/rembg не импортируют — стартуют быстро и занимают мало
+# памяти, а модели загружаются один раз на хост.
+#
+# Запуск (из backend/), ОДИН воркер — модели общие на процесс:
+#   uvicorn inference_service:app --host 127.0.0.1 --port 8001
+#   uvicorn inference_service:app --uds /tmp/wardrobe-inference.sock
+#
+# Веб-процессу в .env:
+#   INFERENCE_SERVICE_URL=http://127.0.0.1:8001
+#   или INFERENCE_SERVICE_UDS=/tmp/wardrobe-inference.sock
+#
+# Итоговый PNG пишется в uploads/ — каталог должен быть общим
+# с веб-процессом (в docker-compose — один и тот же том).
+# =============================================================================
+
+import asyncio
+import os
+import uuid
+
+from fastapi import FastAPI, HTTPException, Query, Request
+
+from app.services.bg_cache import bg_cache
+from app.services.executors import POOLS, cpu_pool, ml_pool, shutdown_pools
+from app.services.inference_batcher import classifier_batcher
+from app.services.upload_pipeline import process_upload
+
+app = FastAPI(
+    title="Wardrobe AI Inference",
+    description="Классификация, удаление фона и анализ цвета для загрузок",
+    version="1.0.0"
+)
+
+UPLOAD_DIR = "uploads"
+
+_models_ready = False
+
+
+def _load_models_sync():
+    """Загружает модели до первого запроса."""
+    global _models_ready
+    print("⏳ [INFERENCE] Loading models...", flush=True)
+    try:
+        from app.ml.classifier_backend import get_classifier
+        from app.ml.remover import get_remover_pool
+        from app.services.upload_pipeline import rembg_models_in_use
+
+        get_classifier()
+        print("✅ [INFERENCE] Fashion classifier loaded!", flush=True)
+
+        # Модели планов и лёгкая модель для отката под нагрузкой
+        models = rembg_models_in_use()
+        for model_name in models:
+            get_remover_pool().warmup(model_name)
+        print(f"✅ [INFERENCE] Background remover loaded: {', '.join(models)}", flush=True)
+        _models_ready = True
+    except Exception as e:
+        print(f"❌ [INFERENCE] Error loading models: {e}", flush=True)
+
+
+@app.on_event("startup")
+async def startup_event():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, _load_models_sync)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    classifier_batcher.close()
+    shutdown_pools(wait=False)
+
+
+@app.get("/health")
+async def health():
+    """Готовность моделей и загрузка пулов."""
+    from app.ml.remover import get_remover_pool
+
+    return {
+        "status": "ok",
+        "models_ready": _models_ready,
+        "pools": {name: pool.stats() for name, pool in POOLS.items()},
+        "classifier_batcher": classifier_batcher.stats(),
+        "bg_cache": bg_cache.stats(),
+        "rembg_sessions": get_remover_pool().stats(),
+    }
+
+
+@app.post("/v1/process")
+async def process(request: Request, file_id: str = Query(...), plan: str = Query("free")):
+    """
+    Обрабатывает загруженное фото (тело запроса — байты файла).
+
+    Сохраняет {UPLOAD_DIR}/{file_id}.png и возвращает поля ответа
+    /clothing/upload (см. process_upload).
+
+    Raises:
+        HTTPException 400: Некорректный file_id или файл не изображение
+        HTTPException 429: Пулы переполнены
+    """
+    try:
+        file_id = str(uuid.UUID(file_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный file_id")
+
+    # Пулы переполнены — отвечаем 429 сразу, до чтения тела
+    ml_pool.check_capacity()
+    cpu_pool.check_capacity()
+
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Пустой файл")
+
+    return await process_upload(data, file_id, UPLOAD_DIR, plan)
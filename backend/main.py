@@ -149,12 +149,42 @@ async def startup_event():
     # Запускаем фоновую загрузку ML моделей
     import asyncio
     asyncio.create_task(load_ml_models())
+    
+    # Периодическая очистка хранилища фото (блобы без ссылок, брошенные загрузки).
+    # Запускается в каждом воркере, но проход делает один процесс (аренда в MongoDB)
+    from app.db.database import settings
+    from app.services.blob_store import blob_store
+    blob_store.start_gc(settings.BLOB_GC_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Останавливаем пулы процессов/потоков для тяжёлых задач
+    from app.services.executors import shutdown_pools
+    from app.services.inference_batcher import classifier_batcher
+    from app.services.inference_client import inference_client
+    from app.services.upload_jobs import upload_jobs
+    from app.services.blob_store import blob_store
+    blob_store.close()
+    upload_jobs.close()
+    classifier_batcher.close()
+    shutdown_pools(wait=False)
+    await inference_client.close()
 
 async def load_ml_models():
     """
     Фоновая загрузка тяжелых ML моделей.
     Позволяет серверу запуститься быстро, а модели подгрузить асинхронно.
+    
+    Если задан сервис инференса (INFERENCE_SERVICE_URL / _UDS), модели
+    живут там, и веб-процесс их не загружает (torch не импортируется).
     """
+    import asyncio
+    from app.services.inference_client import inference_client
+    
+    if inference_client.enabled:
+        print(f"ℹ️ [ML] Models are served by inference service: {inference_client.uds or inference_client.base_url}", flush=True)
+        return
+    
     loop = asyncio.get_running_loop()
     # Запускаем ВСЮ загрузку (включая импорты) в отдельном потоке
     loop.run_in_executor(None, _load_models_sync)
@@ -164,14 +194,17 @@ def _load_models_sync():
     print("⏳ [ML] Starting background model loading...", flush=True)
     try:
         # Import here to avoid top-level blocking
-        from app.ml.fashion_classifier import get_fashion_classifier
-        from app.ml.remover import get_remover
+        from app.ml.classifier_backend import get_classifier
+        from app.ml.remover import get_remover_pool
+        from app.services.upload_pipeline import rembg_models_in_use
         
-        # Trigger model loading
-        get_fashion_classifier()
+        # Trigger model loading (torch или onnx — см. CLASSIFIER_BACKEND)
+        get_classifier()
         print("✅ [ML] Fashion classifier loaded!", flush=True)
         
-        get_remover()
+        # Модели планов и лёгкая модель для отката под нагрузкой
+        for model_name in rembg_models_in_use():
+            get_remover_pool().warmup(model_name)
         print("✅ [ML] Background remover loaded!", flush=True)
         
     except Exception as e:
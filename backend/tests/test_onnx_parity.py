@@ -0,0 +1,70 @@
+# =============================================================================
+# ПАРИТЕТ TORCH vs ONNX (test_onnx_parity.py)
+# =============================================================================
+# Экспортирует текущие веса в ONNX (во временный каталог) и сравнивает
+# top-1 категории/стиля с PyTorch на фиксированных изображениях.
+# Пропускается, если нет весов (weights/fashion_resnet50.pth) или не
+# установлены torch / onnx / onnxruntime.
+#
+# Запуск (из backend/): python -m pytest tests/test_onnx_parity.py
+# =============================================================================
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.ml.classifier_backend import DEFAULT_ONNX_PATH
+from app.ml.classifier_labels import INPUT_SIZE
+
+WEIGHTS_PATH = os.path.join(os.path.dirname(DEFAULT_ONNX_PATH), "fashion_resnet50.pth")
+
+# Фиксированный вход: шум с одним зерном + однотонные фото
+SEED = 0
+NOISE_IMAGES = 4
+SOLID_COLORS = [(20, 20, 20), (200, 30, 40), (240, 240, 235), (40, 70, 150)]
+
+
+@pytest.fixture(scope="module")
+def parity_images(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("parity_images")
+    rng = np.random.default_rng(SEED)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8))
+        for _ in range(NOISE_IMAGES)
+    ]
+    images += [Image.new("RGB", (INPUT_SIZE, INPUT_SIZE), color) for color in SOLID_COLORS]
+
+    paths = []
+    for index, image in enumerate(images):
+        path = str(directory / f"{index}.png")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture(scope="module")
+def onnx_model(tmp_path_factory):
+    if not os.path.exists(WEIGHTS_PATH):
+        pytest.skip(f"Нет весов {WEIGHTS_PATH}")
+    pytest.importorskip("torch")
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+
+    from app.ml.onnx_export import export_onnx
+
+    onnx_path = str(tmp_path_factory.mktemp("onnx") / "fashion_resnet50.onnx")
+    export_onnx(WEIGHTS_PATH, onnx_path)
+    return onnx_path
+
+
+def test_onnx_top1_matches_torch(onnx_model, parity_images):
+    from app.ml.onnx_export import check_parity
+
+    report = check_parity(WEIGHTS_PATH, onnx_model, parity_images, batch_size=4)
+
+    assert report["images"] == len(parity_images)
+    assert report["mismatches"] == []
+    assert report["category_top1_match"] == 1.0
+    assert report["style_top1_match"] == 1.0
@@ -0,0 +1,65 @@
+# =============================================================================
+# ПАКЕТНАЯ ОЦЕНКА vs score_outfit (test_outfit_scorer.py)
+# =============================================================================
+# make_batch_scorer / score_outfits_batch должны давать те же оценки, что
+# score_outfit по одной комбинации. Проверяется на случайных (с фиксированным
+# зерном) комбинациях из 2-5 вещей для всех поводов и погоды — в т.ч. с
+# вещами без цвета/стиля/сезонов и с неизвестными значениями.
+#
+# Запуск (из backend/): python -m pytest tests/test_outfit_scorer.py
+# =============================================================================
+
+import json
+import random
+
+import pytest
+
+from benchmark_outfits import OCCASIONS, WEATHER_CATEGORIES, synthesize_wardrobe
+from app.ml.outfit_scorer import make_batch_scorer, score_outfit
+
+SEED = 0
+WARDROBE_SIZE = 60
+COMBOS = 300
+
+
+def _wardrobe():
+    items = synthesize_wardrobe(WARDROBE_SIZE, SEED)
+    next_id = len(items) + 1
+    # Пустые и неизвестные признаки — отдельные ветки кодирования
+    for color, style, season in [
+        ([], [], []),
+        (["ultraviolet"], ["unknown-style"], ["monsoon"]),
+        (["black", "white", "red"], ["casual", "sport"], ["winter", "summer"]),
+    ]:
+        items.append({
+            "id": next_id,
+            "filename": f"edge_{next_id}.png",
+            "image_path": f"uploads/edge_{next_id}.png",
+            "category": "tee",
+            "color": json.dumps(color),
+            "style": json.dumps(style),
+            "season": json.dumps(season),
+            "temp_min": None,
+            "temp_max": None,
+        })
+        next_id += 1
+    return items
+
+
+def _combos(items):
+    rng = random.Random(SEED)
+    return [rng.sample(items, rng.randint(2, 5)) for _ in range(COMBOS)]
+
+
+@pytest.mark.parametrize("occasion", OCCASIONS)
+@pytest.mark.parametrize("weather", WEATHER_CATEGORIES)
+def test_batch_scorer_matches_score_outfit(occasion, weather):
+    items = _wardrobe()
+    combos = _combos(items)
+
+    totals, scores_at = make_batch_scorer(items, occasion, weather)(combos)
+
+    for row, combo in enumerate(combos):
+        expected = score_outfit(combo, occasion, weather)
+        assert totals[row] == pytest.approx(expected["total"])
+        assert scores_at(row) == pytest.approx(expected)
@@ -0,0 +1,56 @@
+# =============================================================================
+# BRANCH-AND-BOUND vs ПОЛНЫЙ ПЕРЕБОР (test_outfit_search.py)
+# =============================================================================
+# select_top_outfits_bnb обещает тот же top-K (те же образы в том же порядке,
+# те же оценки), что и полный перебор. Проверяется на синтетических
+# гардеробах benchmark_outfits.synthesize_wardrobe для всех поводов и погоды,
+# включая гардеробы меньше K и гардеробы с одинаковыми вещами (равные оценки).
+#
+# Запуск (из backend/): python -m pytest tests/test_outfit_search.py
+# =============================================================================
+
+import pytest
+
+from benchmark_outfits import OCCASIONS, WEATHER_CATEGORIES, compute_features, synthesize_wardrobe
+from app.ml.outfit_engine import group_items_by_slot, iter_outfit_templates, search_top_outfits
+
+SEEDS = range(5)
+SIZES = [6, 12, 40]
+TOP_K = [5, 100]
+
+
+def _with_duplicates(items):
+    """Каждая вещь дважды (новые ID) — много образов с равной оценкой."""
+    return items + [{**item, "id": item["id"] + len(items)} for item in items]
+
+
+def _search(items, features, occasion, weather, k, mode):
+    templates = list(iter_outfit_templates(*group_items_by_slot(items, features, weather), weather))
+    return search_top_outfits(templates, items, occasion, weather, k, item_features=features, mode=mode)
+
+
+def _assert_same_top(items, occasion, weather, k):
+    features = compute_features(items)
+    exhaustive = _search(items, features, occasion, weather, k, "exhaustive")
+    bnb = _search(items, features, occasion, weather, k, "branch_and_bound")
+
+    assert [[item["id"] for item in outfit["items"]] for outfit in bnb] == \
+        [[item["id"] for item in outfit["items"]] for outfit in exhaustive]
+    for ref, cand in zip(exhaustive, bnb):
+        assert cand["scores"] == pytest.approx(ref["scores"])
+
+
+@pytest.mark.parametrize("occasion", OCCASIONS)
+@pytest.mark.parametrize("weather", WEATHER_CATEGORIES)
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("k", TOP_K)
+def test_bnb_matches_exhaustive(occasion, weather, size, k):
+    for seed in SEEDS:
+        _assert_same_top(synthesize_wardrobe(size, seed), occasion, weather, k)
+
+
+@pytest.mark.parametrize("occasion", OCCASIONS)
+@pytest.mark.parametrize("weather", WEATHER_CATEGORIES)
+def test_bnb_matches_exhaustive_with_ties(occasion, weather):
+    for seed in SEEDS:
+        _assert_same_top(_with_duplicates(synthesize_wardrobe(10, seed)), occasion, weather, 20)
@@ -35,6 +35,12 @@ Start-NewWindow -Title "Backend (FastAPI)" `
     -Path "$RootPath\backend" `
     -Command ".\venv\Scripts\activate; uvicorn main:app --host 0.0.0.0 --port 8000 --reload"
 
+# 2.1 Сервис инференса (модели для загрузок). Чтобы backend ходил в него,
+#     а не грузил модели сам, в backend/.env: INFERENCE_SERVICE_URL=http://127.0.0.1:8001
+Start-NewWindow -Title "Inference" `
+    -Path "$RootPath\backend" `
+    -Command ".\venv\Scripts\activate; uvicorn inference_service:app --host 127.0.0.1 --port 8001"
+
 # 3. Запуск ML Worker
 Start-NewWindow -Title "ML Worker" `
     -Path "$RootPath\backend" `
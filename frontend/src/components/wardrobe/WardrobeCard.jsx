@@ -8,7 +8,7 @@
 
 import { useState } from 'react'
 import Icon from '../common/Icon'
-import api from '../../api/axios'
+import { itemImageSrcSet, itemImageUrl } from '../../utils/images'
 
 // Категории одежды для отображения русских названий
 import clothingCategories from '../../data/clothing-categories.json'
@@ -35,10 +35,9 @@ export default function WardrobeCard({ item, onDelete, onEdit }) {
         return cat?.name || categoryId || 'Одежда'
     }
 
-    // URL изображения - baseURL содержит /api, но uploads монтирован без /api
-    const imageUrl = item.image_path
-        ? `${api.defaults.baseURL.replace('/api', '')}/${item.image_path}`
-        : item.image || 'https://via.placeholder.com/300x400?text=No+Image'
+    // URL изображения: в сетке — уменьшенная копия 256 px (512 px на retina)
+    const imageUrl = itemImageUrl(item, 256)
+        || item.image || 'https://via.placeholder.com/300x400?text=No+Image'
 
     // Название вещи
     const itemName = item.name || item.filename || 'Без названия'
@@ -71,6 +70,7 @@ export default function WardrobeCard({ item, onDelete, onEdit }) {
                     )}
                     <img
                         src={imageUrl}
+                        srcSet={itemImageSrcSet(item, 256)}
                         alt={itemName}
                         className={`w-full h-full object-cover transition-all duration-500 group-hover:scale-105 ${imageLoaded ? 'opacity-100' : 'opacity-0'}`}
                         onLoad={() => setImageLoaded(true)}
@@ -4,6 +4,7 @@ import MobileNav from '../components/layout/MobileNav'
 import { useAuth } from '../context/AuthContext'
 import api from '../api/axios'
 import Icon from '../components/common/Icon'
+import { itemImageSrcSet, itemImageUrl } from '../utils/images'
 import UpgradeModal from '../components/common/UpgradeModal'
 
 /**
@@ -41,8 +42,6 @@ const GeneratorPage = () => {
     const [planInfo, setPlanInfo] = useState(null)
     const [showUpgradeModal, setShowUpgradeModal] = useState(false)
 
-    const mediaBaseUrl = api.defaults.baseURL.replace('/api', '')
-
     // Загрузка погоды и плана при монтировании
     useEffect(() => {
         fetchWeather()
@@ -420,7 +419,8 @@ const GeneratorPage = () => {
                                         {outfits[currentIndex]?.items.map((item, idx) => (
                                             <div key={idx} className="aspect-square md:aspect-[4/3] bg-gray-100 rounded-xl overflow-hidden">
                                                 <img
-                                                    src={`${mediaBaseUrl}/${item.image_path}`}
+                                                    src={itemImageUrl(item, 256)}
+                                                    srcSet={itemImageSrcSet(item, 256)}
                                                     alt={item.filename}
                                                     className="w-full h-full object-contain"
                                                 />
@@ -566,7 +566,8 @@ const GeneratorPage = () => {
                                                                 return (
                                                                     <div key={itemIdx} className="relative aspect-square md:aspect-[4/3] bg-gray-100 rounded-xl overflow-hidden">
                                                                         <img
-                                                                            src={`${mediaBaseUrl}/${item.image_path}`}
+                                                                            src={itemImageUrl(item, 256)}
+                                                                            srcSet={itemImageSrcSet(item, 256)}
                                                                             alt={item.filename}
                                                                             className="w-full h-full object-contain"
                                                                         />
@@ -0,0 +1,37 @@
+// =============================================================================
+// URL ИЗОБРАЖЕНИЙ ВЕЩЕЙ (images.js)
+// =============================================================================
+// Бэкенд отдаёт рядом с image_path (полноразмерный PNG) поле image_variants:
+// уменьшенные WebP {"128": путь, "256": ..., "512": ...}. Пути, как и
+// image_path, относительны адреса сервера (uploads/... или api/...).
+// =============================================================================
+
+import api from '../api/axios'
+
+export const mediaBaseUrl = api.defaults.baseURL.replace('/api', '')
+
+/**
+ * URL фото вещи подходящего размера.
+ *
+ * @param {Object} item - Вещь (image_path, image_variants)
+ * @param {number} [size] - Нужная большая сторона, px; без него — оригинал
+ * @returns {string|null}
+ */
+export const itemImageUrl = (item, size) => {
+  if (!item?.image_path) return null
+  const variants = item.image_variants
+  if (size && variants) {
+    const sizes = Object.keys(variants).map(Number).sort((a, b) => a - b)
+    const best = sizes.find((s) => s >= size) ?? sizes[sizes.length - 1]
+    if (best) return `${mediaBaseUrl}/${variants[best]}`
+  }
+  return `${mediaBaseUrl}/${item.image_path}`
+}
+
+/**
+ * srcSet для плотных экранов: size и 2×size.
+ */
+export const itemImageSrcSet = (item, size) => {
+  if (!item?.image_variants) return undefined
+  return `${itemImageUrl(item, size)} 1x, ${itemImageUrl(item, size * 2)} 2x`
+}